@@ -0,0 +1,3 @@
+"""
+Benchmarks that measure how fast mwsql parses synthetic dump files.
+"""
@@ -0,0 +1,369 @@
+"""
+Deterministic generator of synthetic MediaWiki SQL dump files, shaped
+like the page, pagelinks and categorylinks tables of a Wikimedia dump.
+
+Usage: python -m benchmarks.generate TABLE N_ROWS FILE_PATH
+"""
+
+import argparse
+import gzip
+import random
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+# Custom type
+PathObject = Union[str, Path]
+
+# Approximate maximum size of an INSERT INTO statement, in bytes. mysqldump
+# starts a new statement when the current one reaches about 1 MB.
+STATEMENT_SIZE = 1024 * 1024
+
+_HEADER = """-- MySQL dump 10.19  Distrib 10.3.38-MariaDB, for debian-linux-gnu (x86_64)
+--
+-- Host: 127.0.0.1    Database: {db}
+-- ------------------------------------------------------
+-- Server version\t10.6.16-MariaDB-log
+
+/*!40101 SET NAMES utf8mb4 */;
+/*!40103 SET TIME_ZONE='+00:00' */;
+
+--
+-- Table structure for table `{table}`
+--
+
+DROP TABLE IF EXISTS `{table}`;
+CREATE TABLE `{table}` (
+{columns},
+  PRIMARY KEY ({primary_key})
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+
+--
+-- Dumping data for table `{table}`
+--
+
+/*!40000 ALTER TABLE `{table}` DISABLE KEYS */;
+"""
+
+_FOOTER = """/*!40000 ALTER TABLE `{table}` ENABLE KEYS */;
+/*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
+
+-- Dump completed on 2024-03-01  0:00:00
+"""
+
+# Column definitions and primary key of each table, as in the dumps
+_SCHEMAS: Dict[str, Tuple[List[Tuple[str, str]], List[str]]] = {
+    "page": (
+        [
+            ("page_id", "int(10) unsigned NOT NULL AUTO_INCREMENT"),
+            ("page_namespace", "int(11) NOT NULL DEFAULT 0"),
+            ("page_title", "varbinary(255) NOT NULL DEFAULT ''"),
+            ("page_is_redirect", "tinyint(3) unsigned NOT NULL DEFAULT 0"),
+            ("page_is_new", "tinyint(3) unsigned NOT NULL DEFAULT 0"),
+            ("page_random", "double unsigned NOT NULL DEFAULT 0"),
+            ("page_touched", "binary(14) NOT NULL"),
+            ("page_links_updated", "varbinary(14) DEFAULT NULL"),
+            ("page_latest", "int(10) unsigned NOT NULL DEFAULT 0"),
+            ("page_len", "int(10) unsigned NOT NULL DEFAULT 0"),
+            ("page_content_model", "varbinary(32) DEFAULT NULL"),
+            ("page_lang", "varbinary(35) DEFAULT NULL"),
+        ],
+        ["page_id"],
+    ),
+    "pagelinks": (
+        [
+            ("pl_from", "int(10) unsigned NOT NULL DEFAULT 0"),
+            ("pl_namespace", "int(11) NOT NULL DEFAULT 0"),
+            ("pl_title", "varbinary(255) NOT NULL DEFAULT ''"),
+            ("pl_from_namespace", "int(11) NOT NULL DEFAULT 0"),
+        ],
+        ["pl_from", "pl_namespace", "pl_title"],
+    ),
+    "categorylinks": (
+        [
+            ("cl_from", "int(10) unsigned NOT NULL DEFAULT 0"),
+            ("cl_to", "varbinary(255) NOT NULL DEFAULT ''"),
+            ("cl_sortkey", "varbinary(230) NOT NULL DEFAULT ''"),
+            ("cl_sortkey_prefix", "varbinary(255) NOT NULL DEFAULT ''"),
+            (
+                "cl_timestamp",
+                "timestamp NOT NULL DEFAULT current_timestamp() "
+                "ON UPDATE current_timestamp()",
+            ),
+            ("cl_collation", "varbinary(32) NOT NULL DEFAULT ''"),
+            ("cl_type", "enum('page','subcat','file') NOT NULL DEFAULT 'page'"),
+        ],
+        ["cl_from", "cl_to"],
+    ),
+}
+
+TABLES = tuple(_SCHEMAS)
+
+_WORDS = (
+    "Anarchism Albedo Autism Alabama Algeria Achilles Abraham Atom Amsterdam "
+    "Battle History List Station River Church School Album Football Club "
+    "County District Village Party Election Season Film Novel Song Species "
+    "of the in and at by for United States Kingdom National University"
+).split()
+
+# Words with characters that take 2, 3 and 4 bytes in UTF-8
+_MULTIBYTE_WORDS = "Zürich Straße Москва Ελλάδα 東京 القاهرة 서울 Ñandú 𝄞Musik".split()
+
+# Characters that mysqldump escapes with a backslash
+_ESCAPED = ["'", '"', "\\", "\n"]
+
+_NAMESPACES = [0, 0, 0, 0, 0, 0, 1, 2, 3, 4, 6, 10, 14, 118]
+_CONTENT_MODELS = ["wikitext"] * 20 + ["javascript", "css", "json", "Scribunto"]
+_ESCAPES = {"\\": "\\\\", "'": "\\'", '"': '\\"', "\n": "\\n", "\r": "\\r"}
+
+
+class _Values:
+    """
+    Random values with the shape of MediaWiki data, drawn from a seeded
+    random number generator.
+    """
+
+    def __init__(
+        self, seed: int, escape_ratio: float, null_ratio: float, multibyte_ratio: float
+    ) -> None:
+        self.rng = random.Random(seed)
+        self.escape_ratio = escape_ratio
+        self.null_ratio = null_ratio
+        self.multibyte_ratio = multibyte_ratio
+
+    def title(self) -> str:
+        rng = self.rng
+        words = [rng.choice(_WORDS) for _ in range(rng.randint(1, 4))]
+        if rng.random() < self.multibyte_ratio:
+            words[rng.randrange(len(words))] = rng.choice(_MULTIBYTE_WORDS)
+        title = "_".join(words)
+        if rng.random() < self.escape_ratio:
+            pos = rng.randint(0, len(title))
+            title = title[:pos] + rng.choice(_ESCAPED) + title[pos:]
+        return title[0].upper() + title[1:]
+
+    def nullable(self, value: Any) -> Any:
+        return None if self.rng.random() < self.null_ratio else value
+
+    def timestamp(self) -> str:
+        rng = self.rng
+        return (
+            f"20{rng.randint(10, 24)}{rng.randint(1, 12):02}{rng.randint(1, 28):02}"
+            f"{rng.randint(0, 23):02}{rng.randint(0, 59):02}{rng.randint(0, 59):02}"
+        )
+
+
+def _page_row(values: _Values, i: int) -> List[Any]:
+    rng = values.rng
+    return [
+        i + 1,
+        rng.choice(_NAMESPACES),
+        values.title(),
+        int(rng.random() < 0.1),
+        int(rng.random() < 0.05),
+        rng.random(),
+        values.timestamp(),
+        values.nullable(values.timestamp()),
+        rng.randint(1, 1_200_000_000),
+        rng.randint(0, 300_000),
+        values.nullable(rng.choice(_CONTENT_MODELS)),
+        values.nullable("en"),
+    ]
+
+
+def _pagelinks_row(values: _Values, i: int) -> List[Any]:
+    rng = values.rng
+    return [
+        i // 20 + 1,
+        rng.choice(_NAMESPACES),
+        values.title(),
+        rng.choice(_NAMESPACES),
+    ]
+
+
+def _categorylinks_row(values: _Values, i: int) -> List[Any]:
+    rng = values.rng
+    title = values.title()
+    prefix = "" if rng.random() < 0.8 else values.title()
+    timestamp = values.timestamp()
+    return [
+        i // 5 + 1,
+        values.title(),
+        f"{(prefix or title).upper()}\n{title.upper()}",
+        prefix,
+        f"{timestamp[:4]}-{timestamp[4:6]}-{timestamp[6:8]} "
+        f"{timestamp[8:10]}:{timestamp[10:12]}:{timestamp[12:]}",
+        "uca-default-u-kn",
+        rng.choice(["page"] * 8 + ["subcat", "file"]),
+    ]
+
+
+_ROW_FACTORIES: Dict[str, Callable[[_Values, int], List[Any]]] = {
+    "page": _page_row,
+    "pagelinks": _pagelinks_row,
+    "categorylinks": _categorylinks_row,
+}
+
+
+def generate_rows(
+    table: str,
+    n_rows: int,
+    escape_ratio: float = 0.01,
+    null_ratio: float = 0.1,
+    multibyte_ratio: float = 0.1,
+    seed: int = 0,
+) -> Iterator[List[Any]]:
+    """
+    Generate the rows of a synthetic table. The same arguments always
+    give the same rows.
+
+    :param table: "page", "pagelinks" or "categorylinks"
+    :type table: str
+    :param n_rows: Number of rows
+    :type n_rows: int
+    :param escape_ratio: Share of titles that contain a character which
+        is escaped in the dump, e.g. a quote. Defaults to 0.01.
+    :type escape_ratio: float, optional
+    :param null_ratio: Share of NULL values in the columns that can be
+        NULL. Only the page table has such columns. Defaults to 0.1.
+    :type null_ratio: float, optional
+    :param multibyte_ratio: Share of titles that contain characters
+        outside of ASCII, defaults to 0.1
+    :type multibyte_ratio: float, optional
+    :param seed: Seed of the random number generator, defaults to 0
+    :type seed: int, optional
+    :raises ValueError: If `table` is not a known table
+    :yield: The rows, with Python values and None for NULL
+    :rtype: Iterator[List[Any]]
+    """
+
+    if table not in _ROW_FACTORIES:
+        raise ValueError(f"unknown table: {table!r}, choose from {TABLES}")
+    make_row = _ROW_FACTORIES[table]
+    values = _Values(seed, escape_ratio, null_ratio, multibyte_ratio)
+    for i in range(n_rows):
+        yield make_row(values, i)
+
+
+def _sql_value(value: Any) -> str:
+    """
+    Write a value the way mysqldump does.
+
+    :param value: An int, float, str or None for NULL
+    :type value: Any
+    :return: The SQL literal
+    :rtype: str
+    """
+
+    if value is None:
+        return "NULL"
+    if isinstance(value, str):
+        if any(char in value for char in _ESCAPES):
+            value = "".join(_ESCAPES.get(char, char) for char in value)
+        return f"'{value}'"
+    return repr(value)
+
+
+def write_dump(
+    file_path: PathObject,
+    table: str,
+    rows: Iterator[List[Any]],
+    statement_size: int = STATEMENT_SIZE,
+    db: str = "benchwiki",
+) -> Path:
+    """
+    Write rows to a dump file in the format of mysqldump. Files whose
+    name ends in ".gz" are gzip compressed, without a timestamp, so that
+    the same rows always give the same file.
+
+    :param file_path: The path to the dump file
+    :type file_path: PathObject
+    :param table: "page", "pagelinks" or "categorylinks"
+    :type table: str
+    :param rows: The rows, see :func:`generate_rows`
+    :type rows: Iterator[List[Any]]
+    :param statement_size: Approximate maximum size of each INSERT INTO
+        statement in bytes, defaults to STATEMENT_SIZE
+    :type statement_size: int, optional
+    :param db: The database name, defaults to "benchwiki"
+    :type db: str, optional
+    :return: The path to the dump file
+    :rtype: Path
+    """
+
+    columns, primary_key = _SCHEMAS[table]
+    header = _HEADER.format(
+        db=db,
+        table=table,
+        columns=",\n".join(f"  `{name}` {sql_type}" for name, sql_type in columns),
+        primary_key=",".join(f"`{name}`" for name in primary_key),
+    )
+    prefix = f"INSERT INTO `{table}` VALUES "
+
+    file_path = Path(file_path)
+    with open(file_path, "wb") as raw:
+        outfile: Any = raw
+        if file_path.suffix == ".gz":
+            outfile = gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0)
+        outfile.write(header.encode())
+        records: List[str] = []
+        size = 0
+        for row in rows:
+            record = f"({','.join(map(_sql_value, row))})"
+            if records and size + len(record) > statement_size:
+                outfile.write(f"{prefix}{','.join(records)};\n".encode())
+                records, size = [], 0
+            records.append(record)
+            size += len(record) + 1
+        if records:
+            outfile.write(f"{prefix}{','.join(records)};\n".encode())
+        outfile.write(_FOOTER.format(table=table).encode())
+        if outfile is not raw:
+            outfile.close()
+    return file_path
+
+
+def generate_dump(
+    file_path: PathObject,
+    table: str,
+    n_rows: int,
+    escape_ratio: float = 0.01,
+    null_ratio: float = 0.1,
+    multibyte_ratio: float = 0.1,
+    seed: int = 0,
+    statement_size: int = STATEMENT_SIZE,
+) -> Path:
+    """
+    Write a synthetic dump file, see :func:`generate_rows` and
+    :func:`write_dump`.
+
+    :return: The path to the dump file
+    :rtype: Path
+    """
+
+    rows = generate_rows(table, n_rows, escape_ratio, null_ratio, multibyte_ratio, seed)
+    return write_dump(file_path, table, rows, statement_size)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("table", choices=TABLES)
+    parser.add_argument("n_rows", type=int)
+    parser.add_argument("file_path", help="ends in .gz for a compressed file")
+    parser.add_argument("--escape-ratio", type=float, default=0.01)
+    parser.add_argument("--null-ratio", type=float, default=0.1)
+    parser.add_argument("--multibyte-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    generate_dump(
+        args.file_path,
+        args.table,
+        args.n_rows,
+        args.escape_ratio,
+        args.null_ratio,
+        args.multibyte_ratio,
+        args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
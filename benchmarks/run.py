@@ -0,0 +1,282 @@
+"""
+Measure how fast mwsql reads synthetic dump files, and compare the
+results with a saved baseline.
+
+Usage: python -m benchmarks.run [--rows N] [--save NAME] [--compare NAME]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from mwsql import Dump
+from mwsql.utils import _gzip_module
+
+from .generate import TABLES, generate_dump
+
+# Directory of the saved baselines
+BASELINES_DIR = Path(__file__).parent / "baselines"
+
+# Default number of rows of each generated table
+N_ROWS = 100_000
+
+# Default number of times each benchmark is run. The fastest run counts.
+REPEAT = 3
+
+# Slowdown relative to the baseline above which a benchmark is reported
+# as a regression, e.g. 0.2 for taking 20% longer
+TOLERANCE = 0.2
+
+# Formats in which each table is generated
+SUFFIXES = (".sql", ".sql.gz")
+
+# Columns read by the rows_columns benchmark and conditions tested by
+# the rows_where benchmark, by table
+_COLUMNS = {
+    "page": ["page_namespace", "page_title"],
+    "pagelinks": ["pl_namespace", "pl_title"],
+    "categorylinks": ["cl_to", "cl_type"],
+}
+_WHERE = {
+    "page": {"page_namespace": 0},
+    "pagelinks": {"pl_namespace": 0},
+    "categorylinks": {"cl_type": "subcat"},
+}
+
+
+def _iterate(**kwargs: Any) -> Callable[[Path, Path], None]:
+    def run(file_path: Path, tmp_dir: Path) -> None:
+        for _ in Dump.from_file(file_path).rows(**kwargs):
+            pass
+
+    return run
+
+
+def _from_file(file_path: Path, tmp_dir: Path) -> None:
+    Dump.from_file(file_path)
+
+
+def _to_csv(file_path: Path, tmp_dir: Path) -> None:
+    Dump.from_file(file_path).to_csv(tmp_dir / "out.csv")
+
+
+def _select(table: str, option: str) -> Callable[[Path, Path], None]:
+    if option == "columns":
+        return _iterate(columns=_COLUMNS[table])
+    return _iterate(where=_WHERE[table])
+
+
+# The benchmarks, by name. Each takes a table name and returns a function
+# that reads a dump file of that table, given a scratch directory.
+CASES: Dict[str, Callable[[str], Callable[[Path, Path], None]]] = {
+    "from_file": lambda table: _from_file,
+    "rows": lambda table: _iterate(),
+    "rows_convert_dtypes": lambda table: _iterate(convert_dtypes=True),
+    "rows_csv_engine": lambda table: _iterate(engine="csv"),
+    "rows_raw": lambda table: _iterate(raw=True),
+    "rows_columns": lambda table: _select(table, "columns"),
+    "rows_where": lambda table: _select(table, "where"),
+    "to_csv": lambda table: _to_csv,
+}
+
+
+def _metadata(n_rows: int, repeat: int) -> Dict[str, Any]:
+    try:
+        mwsql_version = version("mwsql")
+    except PackageNotFoundError:
+        mwsql_version = "unknown"
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "mwsql": mwsql_version,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "gzip_module": _gzip_module().__name__,
+        "rows": n_rows,
+        "repeat": repeat,
+    }
+
+
+def _measure(
+    run: Callable[[Path, Path], None], file_path: Path, tmp_dir: Path, repeat: int
+) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(file_path, tmp_dir)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmarks(
+    data_dir: Path,
+    n_rows: int = N_ROWS,
+    repeat: int = REPEAT,
+    tables: Optional[List[str]] = None,
+    select: Optional[str] = None,
+    report: Callable[[str, Dict[str, Any]], None] = lambda name, result: None,
+) -> Dict[str, Any]:
+    """
+    Generate a dump file of each table in each format and run the
+    benchmarks on them.
+
+    :param data_dir: Directory in which to generate the dump files
+    :type data_dir: Path
+    :param n_rows: Number of rows of each table, defaults to N_ROWS
+    :type n_rows: int, optional
+    :param repeat: Number of times each benchmark is run, defaults to REPEAT
+    :type repeat: int, optional
+    :param tables: Names of the tables, defaults to None for all tables
+    :type tables: Optional[List[str]], optional
+    :param select: Only run the benchmarks whose name contains this
+        string, e.g. "page.sql.gz" or "convert". Defaults to None.
+    :type select: Optional[str], optional
+    :param report: Function called with the name and result of each
+        benchmark as soon as it is done, defaults to doing nothing
+    :type report: Callable[[str, Dict[str, Any]], None], optional
+    :return: The metadata of the run and the result of each benchmark:
+        its best time in seconds, and the rows and MB of uncompressed SQL
+        read per second, which are None for from_file
+    :rtype: Dict[str, Any]
+    """
+
+    results: Dict[str, Any] = {}
+    for table in tables or TABLES:
+        names = {
+            (suffix, case): f"{table}{suffix} {case}"
+            for suffix in SUFFIXES
+            for case in CASES
+        }
+        if select is not None:
+            names = {key: name for key, name in names.items() if select in name}
+        if not names:
+            continue
+        # MB/s are measured in uncompressed SQL for all formats
+        sql_size = (
+            generate_dump(data_dir / f"{table}.sql", table, n_rows).stat().st_size
+        )
+        for suffix in SUFFIXES:
+            file_path = data_dir / f"{table}{suffix}"
+            if suffix != ".sql":
+                generate_dump(file_path, table, n_rows)
+            for case in CASES:
+                name = names.get((suffix, case))
+                if name is None:
+                    continue
+                seconds = _measure(CASES[case](table), file_path, data_dir, repeat)
+                per_second = case != "from_file"
+                results[name] = {
+                    "seconds": round(seconds, 6),
+                    "rows_per_sec": round(n_rows / seconds) if per_second else None,
+                    "mb_per_sec": (
+                        round(sql_size / seconds / 1e6, 2) if per_second else None
+                    ),
+                }
+                report(name, results[name])
+    return {"meta": _metadata(n_rows, repeat), "results": results}
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = TOLERANCE
+) -> List[str]:
+    """
+    Compare the results of a run with a baseline.
+
+    :param results: The results of a run, see :func:`run_benchmarks`
+    :type results: Dict[str, Any]
+    :param baseline: The results of an earlier run
+    :type baseline: Dict[str, Any]
+    :param tolerance: Slowdown above which a benchmark is reported as a
+        regression, defaults to TOLERANCE
+    :type tolerance: float, optional
+    :return: The names of the benchmarks that regressed
+    :rtype: List[str]
+    """
+
+    regressions = []
+    for name, result in results["results"].items():
+        before = baseline["results"].get(name)
+        if before is not None and result["seconds"] > before["seconds"] * (
+            1 + tolerance
+        ):
+            regressions.append(name)
+    return regressions
+
+
+def _format(name: str, result: Dict[str, Any], before: Optional[Dict[str, Any]]) -> str:
+    line = f"{name:<40} {result['seconds']:>9.3f} s"
+    if result["rows_per_sec"] is not None:
+        line += (
+            f" {result['rows_per_sec']:>11,} rows/s {result['mb_per_sec']:>7.1f} MB/s"
+        )
+    if before is not None:
+        change = before["seconds"] / result["seconds"] - 1
+        line += f"  {change:+7.1%} vs baseline"
+    return line
+
+
+def _baseline_path(name: str) -> Path:
+    path = Path(name)
+    if path.suffix == ".json" or path.parent != Path("."):
+        return path
+    return BASELINES_DIR / f"{name}.json"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--rows", type=int, default=N_ROWS, help="rows per table")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--tables", nargs="+", choices=TABLES)
+    parser.add_argument("--select", help="only run benchmarks with this in the name")
+    parser.add_argument("--save", metavar="NAME", help="save the results as a baseline")
+    parser.add_argument("--compare", metavar="NAME", help="baseline to compare with")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        baseline = json.loads(_baseline_path(args.compare).read_text())
+        if baseline["meta"]["rows"] != args.rows:
+            print(
+                f"warning: the baseline was measured with {baseline['meta']['rows']} "
+                "rows per table, pass the same --rows to compare like with like"
+            )
+
+    def report(name: str, result: Dict[str, Any]) -> None:
+        before = baseline["results"].get(name) if baseline else None
+        print(_format(name, result, before), flush=True)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        results = run_benchmarks(
+            Path(data_dir), args.rows, args.repeat, args.tables, args.select, report
+        )
+
+    if args.save:
+        path = _baseline_path(args.save)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"saved the results to {path}")
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(
+                f"{len(regressions)} benchmarks are more than "
+                f"{args.tolerance:.0%} slower than the baseline:"
+            )
+            for name in regressions:
+                print(f"  {name}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
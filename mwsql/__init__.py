@@ -1,8 +1,13 @@
+from .batch import Batch, Column
 from .dump import Dump
+from .dumpset import DumpSet
 from .utils import head, load
 
 __all__ = [
     "head",
     "load",
     "Dump",
+    "DumpSet",
+    "Batch",
+    "Column",
 ]
@@ -0,0 +1,390 @@
+"""
+Column-oriented batches of rows from a SQL dump file.
+"""
+
+import importlib
+import warnings
+from array import array
+from itertools import accumulate
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+# Typecodes of the arrays that hold the values of each Python dtype
+_TYPECODES = {int: "q", float: "d"}
+
+_BITS = bytes.maketrans(b"\x00\x01", b"01")
+
+
+class Column:
+    """
+    A column of values stored in contiguous buffers.
+
+    Numerical values are stored in an int64 or float64 array. Strings are
+    stored UTF-8 encoded in a single buffer, together with an array of
+    n + 1 offsets such that the i-th string is data[offsets[i]:offsets[i + 1]].
+    Both layouts support the buffer protocol, so they can be wrapped by
+    NumPy or Arrow without copying.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        dtype: type,
+        data: Union[array, bytes],
+        offsets: Optional[array] = None,
+        validity: Optional[bytearray] = None,
+    ) -> None:
+        """
+        Column class constructor.
+
+        :param name: The column name
+        :type name: str
+        :param dtype: The Python data type of the values: int, float or str
+        :type dtype: type
+        :param data: An array of numbers or a buffer of encoded strings
+        :type data: Union[array, bytes]
+        :param offsets: Start offsets of the strings in `data`, followed
+            by the end offset of the last string. None for numbers.
+        :type offsets: Optional[array]
+        :param validity: One byte per value, 1 if the value is valid and 0
+            if it is NULL. None if all values are valid.
+        :type validity: Optional[bytearray]
+        """
+
+        self.name = name
+        self.dtype = dtype
+        self.data = data
+        self.offsets = offsets
+        self.validity = validity
+
+    def __str__(self) -> str:
+        return (
+            f"Column(name={self.name}, dtype={self.dtype.__name__}, length={len(self)})"
+        )
+
+    def __repr__(self) -> str:
+        return str(self)
+
+    def __len__(self) -> int:
+        if self.offsets is not None:
+            return len(self.offsets) - 1
+        return len(self.data)
+
+    @property
+    def null_count(self) -> int:
+        """
+        Number of NULL values in the column.
+
+        :return: Number of NULL values
+        :rtype: int
+        """
+
+        if self.validity is None:
+            return 0
+        return len(self.validity) - sum(self.validity)
+
+    def to_pylist(self) -> List[Any]:
+        """
+        Convert the column to a list of Python objects, with None for NULL.
+
+        :return: The values in the column
+        :rtype: List[Any]
+        """
+
+        if self.offsets is None:
+            values: List[Any] = self.data.tolist()  # type: ignore
+        else:
+            data: bytes = self.data  # type: ignore
+            offsets = self.offsets
+            values = [
+                data[offsets[i] : offsets[i + 1]].decode("utf-8")
+                for i in range(len(offsets) - 1)
+            ]
+        if self.validity is not None:
+            values = [
+                val if valid else None for val, valid in zip(values, self.validity)
+            ]
+        return values
+
+    def to_arrow(self) -> Any:
+        """
+        Convert the column to a pyarrow.Array without copying the values.
+        Requires the optional pyarrow package.
+
+        :raises ImportError: If pyarrow is not installed
+        :return: A pyarrow.Array of type int64, float64 or large_string
+        :rtype: pyarrow.Array
+        """
+
+        pa = _import_pyarrow()
+
+        bitmap = None
+        if self.validity is not None:
+            bitmap = pa.py_buffer(_pack_bits(self.validity))
+        if self.offsets is None:
+            buffers = [bitmap, pa.py_buffer(self.data)]
+        else:
+            buffers = [bitmap, pa.py_buffer(self.offsets), pa.py_buffer(self.data)]
+        return pa.Array.from_buffers(
+            _arrow_type(self.dtype), len(self), buffers, null_count=self.null_count
+        )
+
+
+class Batch:
+    """
+    A batch of consecutive rows from a SQL table, stored column by column.
+    """
+
+    def __init__(self, columns: List[Column]) -> None:
+        """
+        Batch class constructor.
+
+        :param columns: The columns of the batch, all of the same length
+        :type columns: List[Column]
+        """
+
+        self.columns = columns
+
+    def __str__(self) -> str:
+        return f"Batch(num_columns={len(self.columns)}, num_rows={self.num_rows})"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def __getitem__(self, name: str) -> Column:
+        for column in self.columns:
+            if column.name == name:
+                return column
+        raise KeyError(name)
+
+    def __iter__(self) -> Iterator[Column]:
+        return iter(self.columns)
+
+    @property
+    def col_names(self) -> List[str]:
+        """
+        The column names, in table order.
+
+        :return: The column names
+        :rtype: List[str]
+        """
+
+        return [column.name for column in self.columns]
+
+    @property
+    def num_rows(self) -> int:
+        """
+        Number of rows in the batch.
+
+        :return: Number of rows
+        :rtype: int
+        """
+
+        return len(self.columns[0]) if self.columns else 0
+
+    def to_pydict(self) -> Dict[str, List[Any]]:
+        """
+        Convert the batch to a mapping from column names to lists of
+        Python objects, with None for NULL.
+
+        :return: The values in each column
+        :rtype: Dict[str, List[Any]]
+        """
+
+        return {column.name: column.to_pylist() for column in self.columns}
+
+    def to_arrow(self) -> Any:
+        """
+        Convert the batch to a pyarrow.RecordBatch without copying the
+        values. Requires the optional pyarrow package.
+
+        :raises ImportError: If pyarrow is not installed
+        :return: A pyarrow.RecordBatch
+        :rtype: pyarrow.RecordBatch
+        """
+
+        pa = _import_pyarrow()
+        return pa.RecordBatch.from_arrays(
+            [column.to_arrow() for column in self.columns], names=self.col_names
+        )
+
+
+def _import_pyarrow(module: str = "pyarrow") -> Any:
+    """
+    Import the optional pyarrow package or one of its modules.
+
+    :param module: The module to import, e.g. "pyarrow.parquet",
+        defaults to "pyarrow"
+    :type module: str, optional
+    :raises ImportError: If pyarrow is not installed
+    :return: The imported module
+    :rtype: module
+    """
+
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        raise ImportError(
+            f"{module} is required, install it with `pip install mwsql[arrow]`"
+        ) from e
+
+
+def _arrow_type(dtype: type) -> Any:
+    """
+    Get the Arrow data type that a column of a Python data type
+    is converted to.
+
+    :param dtype: The Python data type: int, float or str
+    :type dtype: type
+    :raises ImportError: If pyarrow is not installed
+    :return: pyarrow.int64(), pyarrow.float64() or pyarrow.large_string(),
+        whose 64-bit offsets match the ones of str columns
+    :rtype: pyarrow.DataType
+    """
+
+    pa = _import_pyarrow()
+    if dtype is int:
+        return pa.int64()
+    if dtype is float:
+        return pa.float64()
+    return pa.large_string()
+
+
+def _arrow_schema(col_names: List[str], dtypes: List[type]) -> Any:
+    """
+    Create the Arrow schema of the batches of a SQL table.
+
+    :param col_names: The column names
+    :type col_names: List[str]
+    :param dtypes: The Python data type of each column
+    :type dtypes: List[type]
+    :raises ImportError: If pyarrow is not installed
+    :return: The schema
+    :rtype: pyarrow.Schema
+    """
+
+    pa = _import_pyarrow()
+    return pa.schema(
+        [(name, _arrow_type(dtype)) for name, dtype in zip(col_names, dtypes)]
+    )
+
+
+def _pack_bits(mask: bytearray) -> bytes:
+    """
+    Pack a mask with one byte per value into a bitmap with one bit per
+    value, least significant bit first, as used by Arrow.
+
+    :param mask: A bytearray of zeros and ones
+    :type mask: bytearray
+    :return: The packed bitmap
+    :rtype: bytes
+    """
+
+    if not mask:
+        return b""
+    bits = mask[::-1].translate(_BITS)
+    return int(bits, 2).to_bytes((len(mask) + 7) // 8, "little")
+
+
+def _build_column(
+    name: str, dtype: type, values: Sequence[Optional[str]], strict: bool = False
+) -> Column:
+    """
+    Convert a sequence of string values, with None for NULL, into a Column.
+
+    Values of numerical columns that are empty or cannot be converted are
+    stored as NULL, like NULL itself.
+
+    :param name: The column name
+    :type name: str
+    :param dtype: The Python data type of the column: int, float or str
+    :type dtype: type
+    :param values: The column values as parsed from the dump file
+    :type values: Sequence[Optional[str]]
+    :param strict: When True, raise ValueError if a value cannot be
+        converted to `dtype`. Otherwise store it as NULL and warn.
+        Defaults to False.
+    :type strict: bool, optional
+    :raises ValueError: If `strict` is True and some of the values
+        couldn't be converted.
+    :return: The column
+    :rtype: Column
+    """
+
+    validity = None
+    if None in values:
+        validity = bytearray(val is not None for val in values)
+
+    if dtype is str:
+        encoded = [b"" if val is None else val.encode("utf-8") for val in values]
+        offsets = array("q", accumulate(map(len, encoded), initial=0))
+        return Column(name, dtype, b"".join(encoded), offsets, validity)
+
+    typecode = _TYPECODES[dtype]
+    if validity is None:
+        try:
+            return Column(name, dtype, array(typecode, map(dtype, values)))
+        except (ValueError, OverflowError):
+            pass  # Fall back to converting the values one by one
+
+    data = array(typecode)
+    validity = bytearray()
+    warn = False
+    for val in values:
+        try:
+            data.append(dtype(val))
+            validity.append(1)
+        except (TypeError, ValueError, OverflowError):
+            if val is not None and val != "":
+                if strict:
+                    raise ValueError(
+                        f"could not convert {val!r} in column {name} to {dtype.__name__}"
+                    )
+                warn = True
+            data.append(0)
+            validity.append(0)
+
+    if warn:
+        warnings.warn(
+            "some values could not be converted to Python dtypes", UserWarning
+        )
+
+    return Column(name, dtype, data, None, validity)
+
+
+def _build_batch(
+    rows: Sequence[List[Optional[str]]],
+    col_names: List[str],
+    dtypes: List[type],
+    strict: bool = False,
+) -> Batch:
+    """
+    Convert a sequence of rows into a column-oriented Batch.
+
+    :param rows: The rows as parsed from the dump file, with None for NULL
+    :type rows: Sequence[List[Optional[str]]]
+    :param col_names: The column names
+    :type col_names: List[str]
+    :param dtypes: The Python data type of each column
+    :type dtypes: List[type]
+    :param strict: Whether the conversion is strict, see
+        :func:`_build_column`. Defaults to False.
+    :type strict: bool, optional
+    :raises ValueError: If a row does not have one value per column
+    :return: The batch
+    :rtype: Batch
+    """
+
+    n_cols = len(col_names)
+    if any(len(row) != n_cols for row in rows):
+        raise ValueError("rows and col_names are not the same length")
+
+    columns = list(zip(*rows)) if rows else [()] * n_cols
+    return Batch(
+        [
+            _build_column(name, dtype, values, strict)
+            for name, dtype, values in zip(col_names, dtypes, columns)
+        ]
+    )
@@ -0,0 +1,338 @@
+"""
+On-disk cache of the rows parsed from SQL dump files.
+"""
+
+import hashlib
+import os
+import struct
+import uuid
+from array import array
+from itertools import accumulate, chain, islice
+from pathlib import Path
+from typing import Any, BinaryIO, Iterable, Iterator, List, Optional
+
+from .utils import PathObject
+
+# Default maximum total size of the files in a cache directory, in bytes
+CACHE_SIZE = 10 * 1024 * 1024 * 1024
+
+# Bump when the file format changes, so that old entries are not read
+_CACHE_VERSION = 2
+
+_CACHE_SUFFIX = ".mwcache"
+
+# Number of rows in each batch of a cache file. Small batches are faster
+# to read, as fewer rows stay alive to be scanned by the garbage collector
+_CACHE_BATCH_SIZE = 256
+
+# Number of bytes read from each end of a dump file to fingerprint its content
+_SAMPLE_SIZE = 1024 * 1024
+
+_BATCH_HEADER = struct.Struct("<QI")
+_COLUMN_HEADER = struct.Struct("<BQ")
+
+# A column is stored either as its values joined by NUL characters or,
+# if a value contains NUL, as the concatenated values and their offsets.
+# A column with NULL values is flagged, and its values are preceded by a
+# mask of one byte per row that is 1 for NULL.
+_JOINED = 0
+_OFFSETS = 1
+_NULLS = 2
+
+
+def _cache_key(file_path: PathObject, encoding: str) -> str:
+    """
+    Fingerprint a dump file by its path, size, modification time and
+    content. To keep this cheap for large files, only the first and last
+    MiB of the content are hashed, which together with the size and
+    modification time is enough to tell apart dumps of different dates.
+
+    :param file_path: The path to the dump file
+    :type file_path: PathObject
+    :param encoding: Text encoding the file is read with
+    :type encoding: str
+    :return: A hex digest
+    :rtype: str
+    """
+
+    path = Path(file_path).resolve()
+    stat = path.stat()
+    digest = hashlib.sha256()
+    for part in (_CACHE_VERSION, path, stat.st_size, stat.st_mtime_ns, encoding):
+        digest.update(f"{part}\0".encode("utf-8"))
+    with open(path, "rb") as infile:
+        digest.update(infile.read(_SAMPLE_SIZE))
+        if stat.st_size > _SAMPLE_SIZE:
+            infile.seek(max(_SAMPLE_SIZE, stat.st_size - _SAMPLE_SIZE))
+            digest.update(infile.read())
+    return digest.hexdigest()
+
+
+def _cache_path(cache_dir: PathObject, file_path: PathObject, encoding: str) -> Path:
+    """
+    Get the path of the cache file of a dump file.
+
+    :param cache_dir: The cache directory
+    :type cache_dir: PathObject
+    :param file_path: The path to the dump file
+    :type file_path: PathObject
+    :param encoding: Text encoding the file is read with
+    :type encoding: str
+    :return: The path to the cache file, e.g.
+        "cache_dir/enwiki-latest-page.sql.gz-<key>.mwcache"
+    :rtype: Path
+    """
+
+    key = _cache_key(file_path, encoding)
+    name = f"{Path(file_path).name}-{key[:32]}{_CACHE_SUFFIX}"
+    return Path(cache_dir).expanduser() / name
+
+
+def _write_batch(
+    outfile: BinaryIO, rows: List[List[Optional[str]]], n_cols: int
+) -> bool:
+    """
+    Write a batch of rows to a cache file, column by column.
+
+    :param outfile: The cache file
+    :type outfile: BinaryIO
+    :param rows: The rows, each with `n_cols` values, where NULL is None
+    :type rows: List[List[Optional[str]]]
+    :param n_cols: Number of columns
+    :type n_cols: int
+    :return: Whether any of the values is NULL
+    :rtype: bool
+    """
+
+    has_nulls = False
+    outfile.write(_BATCH_HEADER.pack(len(rows), n_cols))
+    for values in zip(*rows):
+        nulls = None
+        if None in values:
+            nulls = bytes(val is None for val in values)
+            values = tuple("" if val is None else val for val in values)
+            has_nulls = True
+        joined = "\0".join(values)
+        if joined.count("\0") == len(values) - 1:
+            kind, data = _JOINED, joined.encode("utf-8")
+            offsets = None
+        else:
+            encoded = [val.encode("utf-8") for val in values]
+            kind, data = _OFFSETS, b"".join(encoded)
+            offsets = array("q", accumulate(map(len, encoded), initial=0))
+        if nulls is not None:
+            kind |= _NULLS
+        outfile.write(_COLUMN_HEADER.pack(kind, len(data)))
+        if nulls is not None:
+            outfile.write(nulls)
+        if offsets is not None:
+            outfile.write(offsets.tobytes())
+        outfile.write(data)
+    return has_nulls
+
+
+def _read_batches(infile: BinaryIO, null: Any = "") -> Iterator[List[List[Any]]]:
+    """
+    Read the batches of rows from a cache file.
+
+    :param infile: The cache file
+    :type infile: BinaryIO
+    :param null: The value that NULL is replaced with, defaults to ""
+    :type null: Any, optional
+    :yield: Lists of rows
+    :rtype: Iterator[List[List[Any]]]
+    """
+
+    while True:
+        header = infile.read(_BATCH_HEADER.size)
+        if not header:
+            return
+        n_rows, n_cols = _BATCH_HEADER.unpack(header)
+        columns = []
+        for _ in range(n_cols):
+            kind, n_bytes = _COLUMN_HEADER.unpack(infile.read(_COLUMN_HEADER.size))
+            nulls = infile.read(n_rows) if kind & _NULLS else None
+            values: List[Any]
+            if kind & _OFFSETS:
+                offsets = array("q")
+                offsets.frombytes(infile.read((n_rows + 1) * offsets.itemsize))
+                data = infile.read(n_bytes)
+                values = [
+                    data[offsets[i] : offsets[i + 1]].decode("utf-8")
+                    for i in range(n_rows)
+                ]
+            else:
+                values = infile.read(n_bytes).decode("utf-8").split("\0")
+            if nulls is not None:
+                values = [
+                    null if is_null else val for val, is_null in zip(values, nulls)
+                ]
+            columns.append(values)
+        yield list(map(list, zip(*columns)))
+
+
+def _read_cache(
+    cache_path: Path, null: Any = ""
+) -> Optional[Iterator[List[List[Any]]]]:
+    """
+    Open a cache file for reading, and mark it as recently used.
+
+    Cache files are only ever replaced or deleted as a whole, so a file
+    that was opened can be read to the end even if another process
+    evicts it in the meantime.
+
+    :param cache_path: The path to the cache file
+    :type cache_path: Path
+    :param null: The value that NULL is replaced with, defaults to ""
+    :type null: Any, optional
+    :return: The batches of rows in the cache file, or None if it
+        doesn't exist
+    :rtype: Optional[Iterator[List[List[Any]]]]
+    """
+
+    try:
+        infile = open(cache_path, "rb")
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(cache_path)
+    except OSError:
+        pass  # Evicted since it was opened
+
+    def batches() -> Iterator[List[List[Any]]]:
+        with infile:
+            yield from _read_batches(infile, null)
+
+    return batches()
+
+
+def _batched(rows: Iterable[List[Any]], batch_size: int) -> Iterator[List[List[Any]]]:
+    """
+    Group rows into lists of `batch_size` rows, the last one possibly shorter.
+
+    :param rows: The rows
+    :type rows: Iterable[List[Any]]
+    :param batch_size: Number of rows in each list
+    :type batch_size: int
+    :yield: Lists of rows
+    :rtype: Iterator[List[List[Any]]]
+    """
+
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _replace_nulls(rows: List[List[Any]], null: Any) -> List[List[Any]]:
+    """
+    Replace the NULL values in a list of rows, parsed as None.
+
+    :param rows: The rows
+    :type rows: List[List[Any]]
+    :param null: The value that NULL is replaced with
+    :type null: Any
+    :return: The rows with `null` instead of None
+    :rtype: List[List[Any]]
+    """
+
+    if null is None:
+        return rows
+    return [[null if val is None else val for val in row] for row in rows]
+
+
+def _write_cache(
+    cache_path: Path,
+    rows: Iterable[List[Optional[str]]],
+    n_cols: int,
+    cache_size: int = CACHE_SIZE,
+    batch_size: int = _CACHE_BATCH_SIZE,
+    null: Any = "",
+) -> Iterator[List[List[Any]]]:
+    """
+    Pass through the rows in batches while writing them to a cache file.
+
+    The rows are written to a temporary file that is renamed to
+    `cache_path` once all of them have been written, so readers never see
+    an incomplete cache file. Unlike files created by tempfile, the cache
+    file gets the default permissions, so that it can be shared by the
+    users of a dump file. If the iteration stops early, or a row doesn't
+    have `n_cols` values and cannot be stored column by column, the
+    temporary file is removed. After a cache file has been written, the
+    cache directory is shrunk to `cache_size` bytes.
+
+    :param cache_path: The path to the cache file
+    :type cache_path: Path
+    :param rows: The rows parsed from the dump file, where NULL is None
+    :type rows: Iterable[List[Optional[str]]]
+    :param n_cols: Number of columns
+    :type n_cols: int
+    :param cache_size: Maximum total size of the cache directory in bytes,
+        defaults to CACHE_SIZE
+    :type cache_size: int, optional
+    :param batch_size: Number of rows in each batch, defaults to 256
+    :type batch_size: int, optional
+    :param null: The value that NULL is replaced with in the batches
+        that are passed through, defaults to ""
+    :type null: Any, optional
+    :yield: Lists of rows
+    :rtype: Iterator[List[List[Any]]]
+    """
+
+    batches = _batched(rows, batch_size)
+    uncached = None
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_name = cache_path.with_name(f".{cache_path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_name, "xb") as outfile:
+            for batch in batches:
+                if any(len(row) != n_cols for row in batch):
+                    uncached = batch
+                    break
+                if _write_batch(outfile, batch, n_cols):
+                    batch = _replace_nulls(batch, null)
+                yield batch
+        if uncached is None:
+            os.replace(tmp_name, cache_path)
+    finally:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+
+    if uncached is None:
+        _evict(cache_path.parent, cache_size)
+        return
+    for batch in chain([uncached], batches):
+        yield _replace_nulls(batch, null)
+
+
+def _evict(cache_dir: PathObject, cache_size: int) -> None:
+    """
+    Delete the least recently used cache files until the total size of
+    the cache directory is at most `cache_size` bytes.
+
+    :param cache_dir: The cache directory
+    :type cache_dir: PathObject
+    :param cache_size: Maximum total size in bytes
+    :type cache_size: int
+    """
+
+    entries = []
+    for path in Path(cache_dir).glob(f"*{_CACHE_SUFFIX}"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue  # Evicted by another process
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= cache_size:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue  # Already deleted, or still open on Windows
+        total -= size
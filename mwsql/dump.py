@@ -2,28 +2,279 @@
 A set of utilities for processing MediaWiki SQL dump data.
 """
 
+import asyncio
 import csv
+import io
+import multiprocessing
 import sys
+import threading
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    wait,
+)
+from functools import partial
+from itertools import islice
+from operator import itemgetter
 from pathlib import Path
-from typing import Any, Dict, Iterator, List, Optional, Type, TypeVar, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
+from .batch import Batch, _arrow_schema, _build_batch, _import_pyarrow
+from .cache import CACHE_SIZE, _batched, _cache_path, _read_cache, _write_cache
+from .index import (
+    Key,
+    _build_column_index,
+    _build_index,
+    _ColumnIndex,
+    _encode_key,
+    _KeyIndex,
+    _read_column_index,
+    _read_index,
+)
 from .parser import (
-    _convert,
-    _get_sql_attribute,
-    _has_sql_attribute,
+    Lookups,
+    RowFilters,
+    RowsConverter,
+    _compile_converter,
+    _compile_filters,
+    _Dictionary,
+    _filter_rows,
+    _Interned,
     _map_dtypes,
-    _parse,
+    _parse_buffer,
+    _parse_byte_lines,
+    _parse_header,
+    _parse_lines,
+    _record_class,
+)
+from .utils import (
+    GZIP_INDEX_SPACING,
+    WRITE_BUFFER_SIZE,
+    _build_gzip_index,
+    _compression,
+    _has_gzip_index,
+    _mmap_file,
+    _open_binary,
+    _open_file,
+    _open_output,
+    _open_url,
+    _read_ahead,
+    _read_chunks,
+    _read_header,
+    _read_header_from,
+    _read_lines,
+    _read_schema,
+    _split_file,
+    _write_schema,
 )
-from .utils import _open_file
 
 # Allow long field names
 csv.field_size_limit(min(sys.maxsize, 2147483647))
 
+# Approximate number of bytes parsed by each task in parallel mode
+_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Number of rows sampled to find the columns with few distinct values
+_PROBE_ROWS = 10000
+
+# Maximum number of distinct values of a column that is interned or
+# dictionary encoded automatically, and minimum average number of
+# occurrences of each value among the sampled rows
+_MAX_DISTINCT_VALUES = 256
+_MIN_OCCURRENCES = 10
+
+# Number of rows from worker processes that are rebuilt at a time
+_ROWS_BATCH_SIZE = 1024
+
+# Start method of the worker processes. They are not forked from this
+# process, whose reading and decompression threads may hold locks that
+# would never be released in the children.
+_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
 # Custom types
 PathObject = Union[str, Path]
 T = TypeVar("T", bound="Dump")
 
 
+def _parse_chunk(
+    file_path: PathObject,
+    start: int,
+    end: int,
+    encoding: str,
+    dtypes: Optional[List[type]],
+    strict: bool,
+    engine: str,
+    fmtparams: Dict[str, Any],
+    raw: bool = False,
+    columns: Optional[Tuple[int, ...]] = None,
+    conditions: Optional[List[Tuple[int, type, Any]]] = None,
+    null: Any = "",
+) -> List[List[Any]]:
+    """
+    Parse the rows in a byte range of an uncompressed dump file.
+    Used as the task run by the worker processes in parallel mode.
+
+    :param file_path: The path to the SQL dump file
+    :type file_path: PathObject
+    :param start: Byte offset of the first line to parse
+    :type start: int
+    :param end: Byte offset at which to stop parsing
+    :type end: int
+    :param encoding: Text encoding
+    :type encoding: str
+    :param dtypes: Python data types to convert the values to, or None
+    :type dtypes: Optional[List[type]]
+    :param strict: Whether the conversion is strict
+    :type strict: bool
+    :param engine: The parser engine
+    :type engine: str
+    :param fmtparams: Any kwargs for the "csv" engine
+    :type fmtparams: Dict[str, Any]
+    :param raw: Whether to yield the values as undecoded bytes,
+        defaults to False
+    :type raw: bool, optional
+    :param columns: Indices of the columns to parse, in ascending order,
+        defaults to None for all columns. `dtypes` are the types of
+        these columns only.
+    :type columns: Optional[Tuple[int, ...]], optional
+    :param conditions: Triples of a column index, its Python data type
+        and a condition on its values, see
+        :func:`mwsql.parser._compile_filters`. Defaults to None.
+    :type conditions: Optional[List[Tuple[int, type, Any]]], optional
+    :param null: The value that SQL NULL is replaced with, unless `raw`
+        is True. Defaults to "".
+    :type null: Any, optional
+    :return: The rows found in the byte range
+    :rtype: List[List[Any]]
+    """
+
+    converter = _compile_converter(dtypes, strict) if dtypes is not None else None
+    filters = _compile_filters(conditions or (), raw, encoding)
+    null = b"" if raw else null
+    if engine == "tokenizer" and _compression(file_path) is None:
+        # All workers map the same file, which shares its pages
+        with _mmap_file(file_path) as buffer:
+            text_encoding = None if raw else encoding
+            rows = _parse_buffer(
+                buffer, converter, text_encoding, null, start, end, columns, filters
+            )
+            return list(rows)
+    if raw:
+        lines = _read_lines(file_path, start, end, None)
+        return list(_parse_byte_lines(lines, converter, null, columns, filters))
+    lines = _read_lines(file_path, start, end, encoding)
+    rows = _parse_lines(lines, converter, engine, null, columns, filters, **fmtparams)
+    return list(rows)
+
+
+def _parse_statements(
+    chunk: bytes,
+    encoding: str,
+    dtypes: Optional[List[type]],
+    strict: bool,
+    engine: str,
+    fmtparams: Dict[str, Any],
+    raw: bool = False,
+    columns: Optional[Tuple[int, ...]] = None,
+    conditions: Optional[List[Tuple[int, type, Any]]] = None,
+    null: Any = "",
+) -> List[List[Any]]:
+    """
+    Parse the rows in a chunk of whole lines of a dump file. Used as the
+    task run by the worker processes in pipeline mode. Takes the same
+    parameters as :func:`_parse_chunk`, except for the file and range.
+
+    :param chunk: The lines, in binary mode, see
+        :func:`mwsql.utils._read_chunks`
+    :type chunk: bytes
+    :return: The rows found in the chunk
+    :rtype: List[List[Any]]
+    """
+
+    converter = _compile_converter(dtypes, strict) if dtypes is not None else None
+    filters = _compile_filters(conditions or (), raw, encoding)
+    null = b"" if raw else null
+    if engine == "tokenizer":
+        text_encoding = None if raw else encoding
+        rows = _parse_buffer(
+            chunk, converter, text_encoding, null, columns=columns, filters=filters
+        )
+        return list(rows)
+    lines = io.StringIO(chunk.decode(encoding), newline="\n")
+    rows = _parse_lines(lines, converter, engine, null, columns, filters, **fmtparams)
+    return list(rows)
+
+
+def _map_tasks(
+    task: Callable[..., List[List[Any]]],
+    args: Iterator[Tuple[Any, ...]],
+    workers: int,
+    ordered: bool,
+) -> Iterator[List[Any]]:
+    """
+    Run a parsing task for each tuple of arguments in a pool of worker
+    processes and yield the rows that the tasks return. At most two tasks
+    per worker are pending at any time, so that memory use stays bounded
+    when the rows are consumed slower than they are produced.
+
+    :param task: A function that returns a list of rows
+    :type task: Callable[..., List[List[Any]]]
+    :param args: The positional arguments of each task
+    :type args: Iterator[Tuple[Any, ...]]
+    :param workers: Number of worker processes
+    :type workers: int
+    :param ordered: When True, yield the rows of the tasks in the order of
+        `args`. Otherwise yield them as soon as their task is done.
+    :type ordered: bool
+    :yield: The rows returned by the tasks
+    :rtype: Iterator[List[Any]]
+    """
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context(_START_METHOD)
+    )
+    pending: Deque[Future] = deque()
+
+    def submit() -> None:
+        task_args = next(args, None)
+        if task_args is not None:
+            pending.append(executor.submit(task, *task_args))
+
+    try:
+        for _ in range(2 * workers):
+            submit()
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                done = list(wait(pending, return_when=FIRST_COMPLETED).done)
+                for future in done:
+                    pending.remove(future)
+            for future in done:
+                submit()
+                yield from future.result()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
 class Dump:
     """
     Class for parsing an SQL dump file and processing its contents.
@@ -38,6 +289,10 @@ class Dump:
         primary_key: Optional[str],
         source_file: PathObject,
         encoding: str,
+        cache_dir: Optional[PathObject] = None,
+        cache_size: int = CACHE_SIZE,
+        url: Optional[str] = None,
+        decompression_thread: bool = False,
     ) -> None:
         """
         Dump class constructor.
@@ -59,6 +314,18 @@ class Dump:
         :type source_file: PathObject
         :param encoding: Text encoding
         :type encoding: str
+        :param cache_dir: Directory in which to cache the parsed rows,
+            defaults to None for no caching
+        :type cache_dir: Optional[PathObject], optional
+        :param cache_size: Maximum total size of the cache directory
+            in bytes, defaults to 10 GiB
+        :type cache_size: int, optional
+        :param url: URL the dump file is streamed from until it has been
+            saved to `source_file`, see :meth:`from_url`. Defaults to None.
+        :type url: Optional[str], optional
+        :param decompression_thread: Whether to decompress the dump file
+            in a background thread, defaults to False
+        :type decompression_thread: bool, optional
         """
 
         self.db = database
@@ -66,10 +333,21 @@ class Dump:
         self.col_names = col_names
         self.sql_dtypes = col_sql_dtypes
         self.primary_key = primary_key
-        self.size = Path(source_file).stat().st_size
+        self.size = None if url is not None else Path(source_file).stat().st_size
         self._dtypes: Optional[Dict[str, type]] = None
+        self._converters: Dict[Tuple[Any, ...], RowsConverter] = {}
+        self._lookup_tables: Dict[Tuple[str, bool, bool], Dict[Any, Any]] = {}
+        self._repetitive_columns: Optional[List[str]] = None
         self._source_file = source_file
+        self._url = url
+        self._decompression_thread = decompression_thread
         self._encoding = encoding
+        self._cache_dir = cache_dir
+        self._cache_size = cache_size
+        self._key_index: Optional[Tuple[Tuple[int, int], _KeyIndex]] = None
+        self._column_indexes: Dict[
+            Tuple[str, ...], Tuple[Tuple[int, int], _ColumnIndex]
+        ] = {}
 
     def __str__(self) -> str:
         return f"Dump(database={self.db}, name={self.name}, size={self.size})"
@@ -111,10 +389,291 @@ class Dump:
             self._dtypes = _map_dtypes(self.sql_dtypes)
         return self._dtypes
 
+    def _converter(
+        self,
+        strict: bool,
+        columns: Optional[Tuple[int, ...]] = None,
+        row_type: type = list,
+        convert: bool = True,
+        lookups: Optional[Lookups] = None,
+    ) -> RowsConverter:
+        """
+        Get the function that converts rows to :attr:`dtypes`. It is
+        generated once per Dump, conversion mode, projection and row type,
+        and cached.
+
+        :param strict: Whether the conversion is strict
+        :type strict: bool
+        :param columns: Indices of the columns in the rows, defaults to
+            None for all columns
+        :type columns: Optional[Tuple[int, ...]], optional
+        :param row_type: The type of the converted rows, see
+            :meth:`_row_type`. Defaults to list.
+        :type row_type: type, optional
+        :param convert: When set to False, the values are not converted
+            and the rows are only rebuilt as `row_type`. Defaults to True.
+        :type convert: bool, optional
+        :param lookups: The tables of distinct values of some columns, by
+            their index in the rows, see :meth:`_lookups`. Defaults to None.
+        :type lookups: Optional[Dict[int, Dict[Any, Any]]], optional
+        :return: A function that converts a list of rows
+        :rtype: Callable[[List[List[str]]], List[List[Any]]]
+        """
+
+        # The tables are kept by the Dump, so their ids identify them
+        tables = tuple((i, id(table)) for i, table in sorted((lookups or {}).items()))
+        key = (strict, columns, row_type, convert, tables)
+        if key not in self._converters:
+            dtypes = self._projected_dtypes(columns)
+            if not convert:
+                dtypes = [str] * len(dtypes)
+            self._converters[key] = _compile_converter(
+                dtypes, strict, row_type, lookups
+            )
+        return self._converters[key]
+
+    def _probe_columns(self) -> List[str]:
+        """
+        Find the columns that have few distinct values among the first
+        rows of the dump file, e.g. page_content_model. The result is
+        cached.
+
+        :return: The names of the columns
+        :rtype: List[str]
+        """
+
+        if self._repetitive_columns is None:
+            rows = list(islice(self._parse_file(), _PROBE_ROWS))
+            max_distinct = min(_MAX_DISTINCT_VALUES, len(rows) // _MIN_OCCURRENCES)
+            self._repetitive_columns = [
+                name
+                for name, values in zip(self.col_names, zip(*rows))
+                if len(set(values)) <= max_distinct
+            ]
+        return self._repetitive_columns
+
+    def _lookup_columns(
+        self,
+        option: Union[bool, List[str]],
+        names: List[str],
+        convert_dtypes: bool,
+    ) -> List[str]:
+        """
+        Resolve the `intern` or `dictionary_encode` argument of
+        :meth:`rows` into the names of the columns it applies to.
+
+        :param option: True for the columns found by :meth:`_probe_columns`,
+            a list of column names, or False for none
+        :type option: Union[bool, List[str]]
+        :param names: The names of the columns that are yielded
+        :type names: List[str]
+        :param convert_dtypes: Whether the values are converted
+        :type convert_dtypes: bool
+        :raises ValueError: If `option` contains names of columns that are
+            not yielded or, when converting, of columns that are not str
+        :return: The names of the columns
+        :rtype: List[str]
+        """
+
+        if option is False:
+            return []
+        text = [
+            name for name in names if not convert_dtypes or self.dtypes[name] is str
+        ]
+        if option is True:
+            return [name for name in self._probe_columns() if name in text]
+        if isinstance(option, str):
+            raise ValueError("intern and dictionary_encode take lists of columns")
+        unknown = [name for name in option if name not in names]
+        if unknown:
+            raise ValueError(f"columns that are not yielded: {unknown}")
+        numerical = [name for name in option if name not in text]
+        if numerical:
+            raise ValueError(f"converted columns that are not str: {numerical}")
+        return list(option)
+
+    def _lookups(
+        self,
+        intern: Union[bool, List[str]],
+        dictionary_encode: Union[bool, List[str]],
+        columns: Optional[Tuple[int, ...]],
+        raw: bool,
+        convert_dtypes: bool,
+    ) -> Lookups:
+        """
+        Get the tables of distinct values of the columns that are interned
+        or dictionary encoded, see :class:`mwsql.parser._Interned` and
+        :class:`mwsql.parser._Dictionary`. The tables are kept by the Dump,
+        so that values get the same codes each time the rows are iterated
+        over. Columns that are in both `intern` and `dictionary_encode`
+        are dictionary encoded.
+
+        :param intern: The `intern` argument of :meth:`rows`
+        :type intern: Union[bool, List[str]]
+        :param dictionary_encode: The `dictionary_encode` argument of
+            :meth:`rows`
+        :type dictionary_encode: Union[bool, List[str]]
+        :param columns: Indices of the columns in the rows, in ascending
+            order, or None for all columns
+        :type columns: Optional[Tuple[int, ...]]
+        :param raw: Whether the values are bytes
+        :type raw: bool
+        :param convert_dtypes: Whether the values are converted
+        :type convert_dtypes: bool
+        :raises ValueError: See :meth:`_lookup_columns`
+        :return: The table of each column, by its index in the rows
+        :rtype: Dict[int, Dict[Any, Any]]
+        """
+
+        names = self.col_names
+        if columns is not None:
+            names = [self.col_names[i] for i in columns]
+        encoded = self._lookup_columns(dictionary_encode, names, convert_dtypes)
+        interned = self._lookup_columns(intern, names, convert_dtypes)
+
+        lookups: Lookups = {}
+        for name in interned:
+            table = self._lookup_tables.setdefault((name, raw, False), _Interned())
+            lookups[names.index(name)] = table
+        for name in encoded:
+            table = self._lookup_tables.setdefault((name, raw, True), _Dictionary())
+            lookups[names.index(name)] = table
+        return lookups
+
+    def dictionary(self, column: str, raw: bool = False) -> List[Any]:
+        """
+        Get the values of a column that is dictionary encoded by
+        :meth:`rows`, see `dictionary_encode`. The code of each value is
+        its index in the list. The list grows as new values are found,
+        and a value keeps its code for as long as the Dump exists.
+
+        :param column: The name of the column
+        :type column: str
+        :param raw: Whether to get the values of the column in rows that
+            are read with `raw`, as bytes. Defaults to False.
+        :type raw: bool, optional
+        :raises ValueError: If `column` is not in :attr:`col_names`
+        :return: The distinct values of the column found so far
+        :rtype: List[Any]
+        """
+
+        if column not in self.col_names:
+            raise ValueError(f"unknown column: {column!r}")
+        table = self._lookup_tables.setdefault((column, raw, True), _Dictionary())
+        return table.by_code  # type: ignore
+
+    def _row_type(self, row_type: str, columns: Optional[List[str]]) -> type:
+        """
+        Resolve the name of a row type passed by the user into the type
+        of the rows to yield.
+
+        :param row_type: "list", "tuple" or "record"
+        :type row_type: str
+        :param columns: Names of the columns in the rows, in the order in
+            which they are yielded, or None for all columns
+        :type columns: Optional[List[str]]
+        :raises ValueError: If `row_type` is not a known row type
+        :return: list, tuple, or the named tuple class of the table and
+            columns, see :func:`mwsql.parser._record_class`
+        :rtype: type
+        """
+
+        if row_type == "list":
+            return list
+        if row_type == "tuple":
+            return tuple
+        if row_type == "record":
+            col_names = self.col_names if columns is None else columns
+            return _record_class(self.name, tuple(col_names))
+        raise ValueError(f"unknown row_type: {row_type!r}")
+
+    def _projected_dtypes(self, columns: Optional[Tuple[int, ...]]) -> List[type]:
+        """
+        Get the Python data types of some of the columns.
+
+        :param columns: Indices of the columns, or None for all columns
+        :type columns: Optional[Tuple[int, ...]]
+        :return: The Python data type of each column
+        :rtype: List[type]
+        """
+
+        dtypes = list(self.dtypes.values())
+        if columns is None:
+            return dtypes
+        return [dtypes[i] for i in columns]
+
+    def _projection(
+        self, columns: Optional[List[str]]
+    ) -> Tuple[Optional[Tuple[int, ...]], Optional[List[int]]]:
+        """
+        Resolve the names of the columns selected by the user into the
+        indices of the columns to parse, in table order, and the order
+        in which to yield them if it is a different one.
+
+        :param columns: Column names, or None for all columns
+        :type columns: Optional[List[str]]
+        :raises ValueError: If `columns` contains unknown or repeated names
+        :return: The indices of the columns to parse, or None for all
+            columns, and the positions of the parsed values in each row to
+            yield, or None if they are yielded as parsed
+        :rtype: Tuple[Optional[Tuple[int, ...]], Optional[List[int]]]
+        """
+
+        if columns is None:
+            return None, None
+        if isinstance(columns, str):
+            raise ValueError("columns must be a list of column names")
+        unknown = [name for name in columns if name not in self.col_names]
+        if unknown:
+            raise ValueError(f"unknown columns: {unknown}")
+        if len(set(columns)) != len(columns):
+            raise ValueError("columns must not contain duplicates")
+
+        indices = [self.col_names.index(name) for name in columns]
+        parsed = tuple(sorted(indices))
+        if list(parsed) == indices:
+            return parsed, None
+        return parsed, [parsed.index(i) for i in indices]
+
+    def _conditions(
+        self, where: Optional[Dict[str, Any]]
+    ) -> List[Tuple[int, type, Any]]:
+        """
+        Resolve the names of the columns in the conditions passed by the
+        user into column indices, and add the Python data types of the
+        columns.
+
+        :param where: A mapping from column names to conditions, or None
+        :type where: Optional[Dict[str, Any]]
+        :raises ValueError: If `where` contains unknown column names
+        :return: Triples of a column index, its Python data type and the
+            condition on its values
+        :rtype: List[Tuple[int, type, Any]]
+        """
+
+        if not where:
+            return []
+        unknown = [name for name in where if name not in self.col_names]
+        if unknown:
+            raise ValueError(f"unknown columns: {unknown}")
+        return [
+            (self.col_names.index(name), self.dtypes[name], condition)
+            for name, condition in where.items()
+        ]
+
     @classmethod
-    def from_file(cls: Type[T], file_path: PathObject, encoding: str = "utf-8") -> T:
+    def from_file(
+        cls: Type[T],
+        file_path: PathObject,
+        encoding: str = "utf-8",
+        cache_dir: Optional[PathObject] = None,
+        cache_size: int = CACHE_SIZE,
+        decompression_thread: bool = False,
+    ) -> T:
         """
-        Initialize Dump object from dump file.
+        Initialize Dump object from dump file. The table metadata is read
+        from the CREATE TABLE statement at the start of the file, or from
+        a schema file saved by :meth:`save_schema`, if there is one.
 
         :param cls: A Dump class instance
         :type cls: Dump
@@ -125,54 +684,460 @@ class Dump:
             an encoding error when processing the file, try setting this
             parameter to 'Latin-1'
         :type encoding: str, optional
+        :param cache_dir: Directory in which to cache the parsed rows.
+            The first call to :meth:`rows` stores them in a binary columnar
+            file, and later calls read them from it instead of parsing the
+            dump file again, even from other processes. The cache file is
+            keyed by the path, size, modification time and content of the
+            dump file, so it is not used once the dump file changes.
+            Defaults to None for no caching.
+        :type cache_dir: Optional[PathObject], optional
+        :param cache_size: Maximum total size of the cache directory in
+            bytes. The least recently used cache files are deleted when it
+            is exceeded. Defaults to 10 GiB.
+        :type cache_size: int, optional
+        :param decompression_thread: Whether to decompress a compressed
+            dump file in a background thread, which reads a few MiB ahead
+            of the parser. This lets decompression and parsing run on two
+            cores, as decompressing releases the GIL. Defaults to False.
+        :type decompression_thread: bool, optional
         :return: A Dump class instance
         :rtype: Dump
         """
 
-        source_file = file_path
-        database = None
-        table_name = None
-        primary_key = None
-        col_names = []
-        col_sql_dtypes = {}
-
-        # Extract meta data from dump file
-        with _open_file(file_path, encoding=encoding) as infile:
-            for line in infile:
-                if _has_sql_attribute(line, "database"):
-                    database = _get_sql_attribute(line, "database")
-
-                elif _has_sql_attribute(line, "create"):
-                    table_name = _get_sql_attribute(line, "table_name")
-
-                elif _has_sql_attribute(line, "col_name"):
-                    col_name = _get_sql_attribute(line, "col_name")
-                    dtype = _get_sql_attribute(line, "dtype")
-                    col_names.append(col_name)
-                    col_sql_dtypes[col_name] = dtype
-
-                elif _has_sql_attribute(line, "primary_key"):
-                    primary_key = _get_sql_attribute(line, "primary_key")
-
-                elif _has_sql_attribute(line, "insert"):
-                    break
-
-            return cls(
-                database,
-                table_name,
-                col_names,  # type: ignore
-                col_sql_dtypes,  # type: ignore
-                primary_key,
-                source_file,
-                encoding,
+        schema = _read_schema(file_path, encoding)
+        if schema is None:
+            header = _read_header(file_path)
+            schema = _parse_header(header.decode(encoding))
+
+        return cls(
+            schema["database"],
+            schema["table_name"],
+            schema["col_names"],
+            schema["sql_dtypes"],
+            schema["primary_key"],
+            file_path,
+            encoding,
+            cache_dir,
+            cache_size,
+            decompression_thread=decompression_thread,
+        )
+
+    @classmethod
+    def from_url(
+        cls: Type[T],
+        url: str,
+        encoding: str = "utf-8",
+        file_path: Optional[PathObject] = None,
+    ) -> T:
+        """
+        Initialize Dump object from the URL of a dump file, without
+        downloading it first. The table metadata is read from the start of
+        the file, and :meth:`rows` streams and parses the rest of it as it
+        arrives, decompressing it if the URL ends with .gz.
+
+        Each pass over the rows requests the file again, unless it is
+        saved to `file_path` at the same time. Once a pass has read the
+        whole file, the dump is read from `file_path` from then on, as if
+        it had been opened with :meth:`from_file`. Until then,
+        :attr:`size` is None, and the dump can only be read from start to
+        end: parallel parsing and indexes need a saved file.
+
+        :param cls: A Dump class instance
+        :type cls: Dump
+        :param url: URL of the dump file, e.g.
+            "https://dumps.wikimedia.org/simplewiki/latest/simplewiki-latest-page.sql.gz"
+        :type url: str
+        :param encoding: Text encoding, defaults to "utf-8"
+        :type encoding: str, optional
+        :param file_path: The file to save the dump file to while it is
+            streamed. It is written as "<file_path>.part" and renamed once
+            it is complete. Defaults to None.
+        :type file_path: Optional[PathObject], optional
+        :raises requests.exceptions.HTTPError: If the file cannot be requested
+        :return: A Dump class instance
+        :rtype: Dump
+        """
+
+        with _open_url(url) as infile:
+            header = _read_header_from(infile)
+        schema = _parse_header(header.decode(encoding))
+
+        return cls(
+            schema["database"],
+            schema["table_name"],
+            schema["col_names"],
+            schema["sql_dtypes"],
+            schema["primary_key"],
+            file_path if file_path is not None else url,
+            encoding,
+            url=url,
+        )
+
+    def _local_file(self) -> PathObject:
+        """
+        Get the path to the dump file, for operations that need random
+        access to it.
+
+        :raises ValueError: If the dump file is streamed from a URL and
+            hasn't been saved yet
+        :return: The path to the dump file
+        :rtype: PathObject
+        """
+
+        if self._url is not None:
+            raise ValueError(
+                "the dump file is streamed from a URL, save it with "
+                "Dump.from_url(file_path=...) and read its rows once first"
             )
+        return self._source_file
+
+    def _saved(self) -> None:
+        """
+        Read the dump from the file it was saved to while streaming it.
+        """
+
+        self._url = None
+        self.size = Path(self._source_file).stat().st_size
+
+    def save_schema(self) -> Path:
+        """
+        Save the table metadata in a schema file next to the dump file,
+        e.g. as "page.sql.gz.schema.json". :meth:`from_file` reads the
+        metadata from there instead of from the dump file, which makes
+        opening many dumps much faster. The schema file is ignored if the
+        dump file is modified later.
+
+        :return: The path to the schema file
+        :rtype: Path
+        """
+
+        schema = {
+            "database": self.db,
+            "table_name": self.name,
+            "col_names": self.col_names,
+            "sql_dtypes": self.sql_dtypes,
+            "primary_key": self.primary_key,
+        }
+        return _write_schema(self._local_file(), self.encoding, schema)
+
+    def build_gzip_index(self, spacing: int = GZIP_INDEX_SPACING) -> Path:
+        """
+        Build a seekable index for a compressed dump file and save it next
+        to the file, e.g. as "page.sql.gz.gzidx". The index records inflate
+        checkpoints, which lets the file be parsed in parallel by passing
+        `workers` to :meth:`rows`. It only needs to be built once, and is
+        ignored if the dump file is modified later. Requires the optional
+        indexed_gzip package.
+
+        :param spacing: Distance between two checkpoints in bytes of
+            uncompressed data. Smaller values make seeking faster but the
+            index larger, as each checkpoint takes up 32 KiB.
+            Defaults to 8 MiB.
+        :type spacing: int, optional
+        :raises ValueError: If the dump file is not a .gz file
+        :raises ImportError: If indexed_gzip is not installed
+        :return: The path to the index file
+        :rtype: Path
+        """
+
+        file_path = self._local_file()
+        if _compression(file_path) != "gzip":
+            raise ValueError("only gzip compressed dump files can be indexed")
+        return _build_gzip_index(file_path, spacing)
+
+    def build_index(self) -> Path:
+        """
+        Build a sparse index of the dump file by primary key and save it
+        next to the file, e.g. as "page.sql.gz.pkidx". The index records
+        the byte range and the smallest and largest primary key of each
+        INSERT INTO statement, which lets :meth:`get` and :meth:`range`
+        read only the statements that contain the requested rows. It only
+        needs to be built once, and is ignored if the dump file is
+        modified later. Seeking in a compressed dump file is only fast
+        if it also has a gzip index, see :meth:`build_gzip_index`.
+
+        :raises ValueError: If the table has no primary key
+        :return: The path to the index file
+        :rtype: Path
+        """
+
+        if not self.primary_key:
+            raise ValueError("the table has no primary key")
+        self._key_index = None
+        return _build_index(
+            self._local_file(),
+            self.encoding,
+            self.col_names,
+            self.dtypes,
+            list(self.primary_key),
+        )
+
+    def _primary_key_index(self) -> _KeyIndex:
+        """
+        Get the primary key index of the dump file. It is read once per
+        Dump, and read again if the dump file changes.
+
+        :raises ValueError: If the dump file has no up-to-date index
+        :return: The index
+        :rtype: _KeyIndex
+        """
+
+        stat = Path(self._local_file()).stat()
+        stamp = (stat.st_size, stat.st_mtime_ns)
+        if self._key_index is None or self._key_index[0] != stamp:
+            index = _read_index(self._source_file, self.encoding)
+            if index is None:
+                raise ValueError(
+                    "looking up rows by primary key requires an index, "
+                    "create one with Dump.build_index()"
+                )
+            self._key_index = (stamp, index)
+        return self._key_index[1]
+
+    def _key(self, key: Any, partial: bool = False) -> Key:
+        """
+        Convert a primary key passed by the user into a tuple of values
+        of the dtypes of the primary key columns.
+
+        :param key: A value, for a single column primary key, or a tuple
+            of values, e.g. (12, 345) for a primary key of two columns
+        :type key: Any
+        :param partial: Whether the key may have fewer values than there
+            are primary key columns, defaults to False
+        :type partial: bool, optional
+        :raises ValueError: If the key has the wrong number of values, or
+            if they cannot be converted to the dtypes of their columns
+        :return: The key
+        :rtype: Tuple[Any, ...]
+        """
+
+        key_columns = list(self.primary_key or ())
+        values = tuple(key) if isinstance(key, tuple) else (key,)
+        if len(values) > len(key_columns) or (
+            len(values) < len(key_columns) and not partial
+        ):
+            raise ValueError(f"the primary key has the columns {key_columns}")
+        return tuple(self.dtypes[name](val) for name, val in zip(key_columns, values))
+
+    def get(self, key: Any, convert_dtypes: bool = False) -> Optional[List[Any]]:
+        """
+        Get the row with a given primary key. Requires a primary key
+        index, see :meth:`build_index`.
+
+        :param key: The primary key of the row, e.g. 12345, or a tuple of
+            values if the primary key has several columns, e.g. (12, 345)
+        :type key: Any
+        :param convert_dtypes: When set to True, numerical types are
+            converted from str to int or float. Defaults to False.
+        :type convert_dtypes: bool, optional
+        :raises ValueError: If the dump file has no up-to-date primary key
+            index, or if `key` does not match the primary key columns
+        :return: The row, or None if there is no row with this key
+        :rtype: Optional[List[Any]]
+        """
+
+        index = self._primary_key_index()
+        key = self._key(key)
+        conditions = [
+            (self.col_names.index(name), self.dtypes[name], val)
+            for name, val in zip(index.columns, key)
+        ]
+        filters = _compile_filters(conditions, False, self.encoding)
+        converter = self._converter(False) if convert_dtypes else None
+
+        for start, end in index.find(key, key, inclusive=True):
+            lines = _read_lines(self._source_file, start, end, self.encoding)
+            for row in _parse_lines(lines, converter, filters=filters):
+                return row
+        return None
+
+    def range(
+        self, lo: Any = None, hi: Any = None, convert_dtypes: bool = False
+    ) -> Iterator[List[Any]]:
+        """
+        Create a generator object from the rows whose primary key is at
+        least `lo` and less than `hi`, in file order. Requires a primary
+        key index, see :meth:`build_index`.
+
+        :param lo: Smallest primary key, or None for no lower bound.
+            Defaults to None. For a primary key of several columns, a
+            tuple that has values for the first columns only is smaller
+            than all the keys that start with these values, e.g. (12,)
+            is smaller than (12, 345).
+        :type lo: Any, optional
+        :param hi: Primary key at which to stop, which is excluded, or
+            None for no upper bound. Defaults to None. E.g. with lo=(12,)
+            and hi=(13,), all the rows whose key starts with 12 are yielded.
+        :type hi: Any, optional
+        :param convert_dtypes: When set to True, numerical types are
+            converted from str to int or float. Defaults to False.
+        :type convert_dtypes: bool, optional
+        :raises ValueError: If the dump file has no up-to-date primary key
+            index, or if `lo` or `hi` do not match the primary key columns
+        :yield: The rows in the range
+        :rtype: Iterator[List[Any]]
+        """
+
+        index = self._primary_key_index()
+        lo = None if lo is None else self._key(lo, partial=True)
+        hi = None if hi is None else self._key(hi, partial=True)
+        positions = [self.col_names.index(name) for name in index.columns]
+        dtypes = [self.dtypes[name] for name in index.columns]
+        converter = self._converter(False) if convert_dtypes else None
+
+        for start, end in index.find(lo, hi):
+            lines = _read_lines(self._source_file, start, end, self.encoding)
+            rows = []
+            for row in _parse_lines(lines):
+                key = tuple(dtype(row[i]) for dtype, i in zip(dtypes, positions))
+                if (lo is None or key >= lo) and (hi is None or key < hi):
+                    rows.append(row)
+            yield from converter(rows) if converter else rows
+
+    def _index_columns(self, columns: Union[str, List[str]]) -> List[str]:
+        """
+        Validate the key columns of a column index.
+
+        :param columns: A column name, or a list of column names for a
+            composite key
+        :type columns: Union[str, List[str]]
+        :raises ValueError: If `columns` is empty or contains unknown or
+            repeated names
+        :return: The column names
+        :rtype: List[str]
+        """
+
+        names = [columns] if isinstance(columns, str) else list(columns)
+        if not names:
+            raise ValueError("an index needs at least one column")
+        unknown = [name for name in names if name not in self.col_names]
+        if unknown:
+            raise ValueError(f"unknown columns: {unknown}")
+        if len(set(names)) != len(names):
+            raise ValueError("columns must not contain duplicates")
+        return names
+
+    def create_index(self, columns: Union[str, List[str]]) -> Path:
+        """
+        Build an index of the dump file by the values of some columns and
+        save it next to the file, e.g. as "categorylinks.sql.gz.cl_to.idx".
+        The index maps the hash of each key to the INSERT INTO statements
+        that contain rows with this key, which lets :meth:`lookup` read
+        only these statements. It is built in one pass over the file, with
+        bounded memory use, and only needs to be built once. It is ignored
+        if the dump file is modified later. Seeking in a compressed dump
+        file is only fast if it also has a gzip index, see
+        :meth:`build_gzip_index`.
+
+        :param columns: The column to index, or a list of columns for a
+            composite key, e.g. ["pl_namespace", "pl_title"]
+        :type columns: Union[str, List[str]]
+        :raises ValueError: If `columns` are not in :attr:`col_names`
+        :return: The path to the index file
+        :rtype: Path
+        """
+
+        names = self._index_columns(columns)
+        cached = self._column_indexes.pop(tuple(names), None)
+        if cached is not None:
+            cached[1].close()
+        return _build_column_index(
+            self._local_file(), self.encoding, self.col_names, self.dtypes, names
+        )
+
+    def _column_index(self, columns: List[str]) -> _ColumnIndex:
+        """
+        Get the index of some columns of the dump file. It is opened once
+        per Dump, and opened again if the dump file changes.
+
+        :param columns: Names of the key columns
+        :type columns: List[str]
+        :raises ValueError: If the dump file has no up-to-date index
+            of these columns
+        :return: The index
+        :rtype: _ColumnIndex
+        """
+
+        stat = Path(self._local_file()).stat()
+        stamp = (stat.st_size, stat.st_mtime_ns)
+        cached = self._column_indexes.get(tuple(columns))
+        if cached is None or cached[0] != stamp:
+            if cached is not None:
+                cached[1].close()
+            index = _read_column_index(self._source_file, self.encoding, columns)
+            if index is None:
+                raise ValueError(
+                    f"looking up rows by {columns} requires an index, "
+                    f"create one with Dump.create_index({columns})"
+                )
+            cached = (stamp, index)
+            self._column_indexes[tuple(columns)] = cached
+        return cached[1]
+
+    def lookup(
+        self,
+        columns: Union[str, List[str]],
+        value: Any,
+        convert_dtypes: bool = False,
+    ) -> Iterator[List[Any]]:
+        """
+        Create a generator object from the rows where some columns have
+        given values, in file order. Requires an index of the columns,
+        see :meth:`create_index`.
+
+        :param columns: The indexed column, or list of columns
+        :type columns: Union[str, List[str]]
+        :param value: The value to look up, e.g. "Living_people", or a
+            tuple with one value per column for a composite key,
+            e.g. (0, "Main_Page")
+        :type value: Any
+        :param convert_dtypes: When set to True, numerical types are
+            converted from str to int or float. Defaults to False.
+        :type convert_dtypes: bool, optional
+        :raises ValueError: If the dump file has no up-to-date index of
+            `columns`, or if `value` does not have one value per column
+        :yield: The matching rows
+        :rtype: Iterator[List[Any]]
+        """
+
+        names = self._index_columns(columns)
+        values = value if isinstance(value, tuple) else (value,)
+        if len(values) != len(names):
+            raise ValueError(f"expected one value for each of {names}")
+        index = self._column_index(names)
+
+        dtypes = [self.dtypes[name] for name in names]
+        key = _encode_key(values, dtypes, self.encoding)
+        # Rows are compared with the key, as different keys can have
+        # the same hash
+        conditions = [
+            (self.col_names.index(name), dtype, val)
+            for name, dtype, val in zip(names, dtypes, values)
+        ]
+        filters = _compile_filters(conditions, False, self.encoding)
+        converter = self._converter(False) if convert_dtypes else None
+
+        for start, end in index.find(key):
+            lines = _read_lines(self._source_file, start, end, self.encoding)
+            yield from _parse_lines(lines, converter, filters=filters)
 
     def rows(
         self,
         convert_dtypes: bool = False,
         strict_conversion: bool = False,
+        engine: Optional[str] = None,
+        workers: int = 1,
+        ordered: bool = True,
+        raw: bool = False,
+        columns: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        pipeline: bool = False,
+        row_type: str = "list",
+        intern: Union[bool, List[str]] = False,
+        dictionary_encode: Union[bool, List[str]] = False,
         **fmtparams: Any,
-    ) -> Iterator[List[Any]]:
+    ) -> Iterator[Any]:
         """
         Create a generator object from the rows.
 
@@ -183,42 +1148,740 @@ class Dump:
             bad input when converting from SQL dtypes to Python dtypes.
             Defaults to False.
         :type strict_conversion: bool, optional
+        :param engine: The parser used to split INSERT INTO statements into
+            rows. "tokenizer" (the default) reads each statement in a single
+            pass and resolves MySQL escape sequences. "csv" uses the previous
+            regex and csv.reader based parser. Defaults to None for
+            "tokenizer", or "csv" when `fmtparams` are passed.
+        :type engine: Optional[str], optional
+        :param workers: Number of processes used to parse the dump file.
+            When greater than 1, the file is split at INSERT INTO statements
+            and the parts are parsed in parallel. Of the compressed dump
+            files, only gzip files can be split, and they need a gzip index,
+            see :meth:`build_gzip_index`. Rows that are
+            read from the cache are not parsed, see :meth:`from_file`.
+            Defaults to 1.
+        :type workers: int, optional
+        :param ordered: When parsing in parallel, whether the rows are
+            yielded in their original order. If False, rows from parts of
+            the file that finish parsing first are yielded first.
+            Defaults to True.
+        :type ordered: bool, optional
+        :param raw: When set to True, the dump file is parsed in binary
+            mode and the values are yielded as bytes, without ever being
+            decoded, with b"" for NULL. Numerical values are still converted
+            if `convert_dtypes` is True. Raw rows are not cached.
+            Only supported by the "tokenizer" engine. Defaults to False.
+        :type raw: bool, optional
+        :param columns: Names of the columns to yield, in the order in which
+            they are yielded, e.g. ["page_id", "page_title"]. The values of
+            the other columns are skipped over by the "tokenizer" engine
+            instead of being extracted, and are not converted.
+            Defaults to None for all columns.
+        :type columns: Optional[List[str]], optional
+        :param where: A mapping from column names to conditions that the
+            rows must meet, e.g. {"page_namespace": 0}. A condition is a
+            value, a list, tuple or set of values, e.g. {"page_namespace":
+            [0, 14]}, or a function that takes a value converted to the
+            column's dtype and returns whether to keep the row, e.g.
+            {"page_len": lambda val: val > 1000}. Values and collections
+            are compared with the values as written in the dump file, so
+            the conditions are tested before the rows are built or
+            converted. None matches NULL, and in str columns also the
+            empty string, as NULL is parsed as one. When parsing in
+            parallel, functions must be
+            picklable, e.g. defined at module level. Defaults to None.
+        :type where: Optional[Dict[str, Any]], optional
+        :param pipeline: When set to True, the dump file is read and
+            decompressed by a thread of this process, which passes chunks of
+            whole INSERT INTO statements through a bounded queue to `workers`
+            processes that parse and convert them. Decompression then
+            overlaps with parsing, and any dump file can be parsed in
+            parallel, including compressed files without a gzip index and
+            dumps streamed from a URL. To also decompress in a thread of its
+            own, see `decompression_thread` in :meth:`from_file`.
+            Defaults to False.
+        :type pipeline: bool, optional
+        :param row_type: The type of the rows: "list" (the default), or
+            "tuple" and "record", which take less memory when many rows are
+            kept. Records are named tuples of a class generated for the
+            table, whose fields are named after the columns, e.g.
+            ``row.page_title``. Converted rows are built as tuples or
+            records directly, without an intermediate list per row.
+        :type row_type: str, optional
+        :param intern: Names of columns whose equal values are yielded as
+            the same object, e.g. ["page_content_model"], which saves
+            memory when many rows are kept. When True, the columns that
+            have few distinct values among the first rows are interned.
+            Converted values of numerical columns can't be interned.
+            Defaults to False.
+        :type intern: Union[bool, List[str]], optional
+        :param dictionary_encode: Names of columns whose values are
+            yielded as small integer codes, e.g. ["page_namespace"]. The
+            value of each code is found with :meth:`dictionary`. When True,
+            the columns that have few distinct values among the first rows
+            are encoded. Converted values of numerical columns can't be
+            encoded. Defaults to False.
+        :type dictionary_encode: Union[bool, List[str]], optional
         :param fmtparams: Any kwargs you want to pass to the csv.reader()
-            function that does the actual parsing.
+            function that does the actual parsing. Only supported by the
+            "csv" engine, which is used when `engine` is not set.
+        :raises ValueError: If `engine` is not a known parser or
+            `row_type` a known row type, if `fmtparams` are passed to the
+            "tokenizer" engine or `raw` to the "csv" engine, if `columns`
+            or `where` contain names that are not in :attr:`col_names`, if
+            `intern` or `dictionary_encode` contain names of columns that
+            are not yielded or can't be encoded, or if `workers` is
+            greater than 1 without `pipeline` for a compressed dump file
+            without a gzip index or a dump file that is streamed from a URL.
         :yield: A generator used to iterate over the rows in the SQL table
+        :rtype: Iterator[Union[List[Any], Tuple[Any, ...]]]
+        """
+
+        if engine is None:
+            engine = "csv" if fmtparams else "tokenizer"
+        if engine not in ("tokenizer", "csv"):
+            raise ValueError(f"unknown engine: {engine!r}")
+        if engine == "tokenizer" and fmtparams:
+            raise ValueError("fmtparams are only supported by the 'csv' engine")
+        if engine == "csv" and raw:
+            raise ValueError("raw is only supported by the 'tokenizer' engine")
+
+        indices, order = self._projection(columns)
+        conditions = self._conditions(where)
+        row_cls = self._row_type(row_type, columns)
+        lookups = self._lookups(intern, dictionary_encode, indices, raw, convert_dtypes)
+        rows = self._projected_rows(
+            convert_dtypes,
+            strict_conversion,
+            engine,
+            workers,
+            ordered,
+            raw,
+            indices,
+            conditions,
+            fmtparams,
+            pipeline,
+            row_cls if order is None else list,
+            lookups,
+        )
+        if order is None:
+            yield from rows
+        elif row_cls is list:
+            for row in rows:
+                yield [row[i] for i in order]
+        else:
+            reorder = itemgetter(*order)
+            for row in rows:
+                yield tuple.__new__(row_cls, reorder(row))
+
+    def _projected_rows(
+        self,
+        convert_dtypes: bool,
+        strict: bool,
+        engine: str,
+        workers: int,
+        ordered: bool,
+        raw: bool,
+        columns: Optional[Tuple[int, ...]],
+        conditions: List[Tuple[int, type, Any]],
+        fmtparams: Dict[str, Any],
+        pipeline: bool = False,
+        row_type: type = list,
+        lookups: Optional[Lookups] = None,
+    ) -> Iterator[Any]:
+        """
+        Yield the values of some of the columns of the rows that meet
+        some conditions, in table order. Takes the same parameters as
+        :meth:`rows`.
+
+        :param columns: Indices of the columns to yield, in ascending
+            order, or None for all columns
+        :type columns: Optional[Tuple[int, ...]]
+        :param conditions: Triples of a column index, its Python data type
+            and the condition on its values
+        :type conditions: List[Tuple[int, type, Any]]
+        :param row_type: The type of the rows, see :meth:`_row_type`.
+            Defaults to list.
+        :type row_type: type, optional
+        :param lookups: The tables of distinct values of the columns that
+            are interned or dictionary encoded, see :meth:`_lookups`.
+            Defaults to None.
+        :type lookups: Optional[Dict[int, Dict[Any, Any]]], optional
+        :yield: The rows in the SQL table
+        :rtype: Iterator[Union[List[Any], Tuple[Any, ...]]]
+        """
+
+        converter = None
+        if convert_dtypes or row_type is not list or lookups:
+            converter = self._converter(
+                strict, columns, row_type, convert_dtypes, lookups
+            )
+        filters = _compile_filters(conditions, raw, self.encoding)
+
+        if self._cache_dir is not None and engine == "tokenizer" and not raw:
+            for batch in self._cached_batches(self._cache_dir, workers, pipeline):
+                if filters:
+                    batch = list(_filter_rows(batch, filters))
+                if columns is not None:
+                    batch = [[row[i] for i in columns] for row in batch]
+                yield from converter(batch) if converter else batch
+            return
+
+        if workers > 1 or pipeline:
+            dtypes = self._projected_dtypes(columns) if convert_dtypes else None
+            parallel_rows = self._pipelined_rows if pipeline else self._parallel_rows
+            rows = parallel_rows(
+                workers,
+                ordered,
+                dtypes,
+                strict,
+                engine,
+                fmtparams,
+                raw,
+                columns,
+                conditions,
+            )
+            if row_type is list and not lookups:
+                yield from rows
+                return
+            # Workers send the rows back as lists, which unpickle faster
+            # than records, and the tables of distinct values are kept
+            # in this process, so the rows are rebuilt here
+            rebuild = self._converter(False, columns, row_type, False, lookups)
+            for batch in _batched(rows, _ROWS_BATCH_SIZE):
+                yield from rebuild(batch)
+            return
+
+        null = b"" if raw else ""
+        yield from self._parse_file(
+            converter, engine, raw, null, columns, filters, **fmtparams
+        )
+
+    def _parse_file(
+        self,
+        converter: Optional[RowsConverter] = None,
+        engine: str = "tokenizer",
+        raw: bool = False,
+        null: Any = "",
+        columns: Optional[Tuple[int, ...]] = None,
+        filters: Optional[RowFilters] = None,
+        **fmtparams: Any,
+    ) -> Iterator[List[Any]]:
+        """
+        Parse the dump file in this process. Uncompressed files are
+        memory-mapped when parsed with the "tokenizer" engine, see
+        :func:`mwsql.parser._parse_buffer`.
+
+        :param converter: A function that converts the rows of each
+            statement, or None
+        :type converter: Optional[Callable[[List[List[str]]], List[List[Any]]]],
+            optional
+        :param engine: The parser engine, defaults to "tokenizer"
+        :type engine: str, optional
+        :param raw: Whether to yield the values as undecoded bytes,
+            defaults to False
+        :type raw: bool, optional
+        :param null: The value that SQL NULL is replaced with by the
+            "tokenizer" engine, defaults to ""
+        :type null: Any, optional
+        :param columns: Indices of the columns to parse, in ascending
+            order, defaults to None for all columns
+        :type columns: Optional[Tuple[int, ...]], optional
+        :param filters: Pairs of a column index and a function that tests
+            its unconverted values, defaults to None
+        :type filters: Optional[Sequence[Tuple[int, Callable[[Any], bool]]]],
+            optional
+        :param fmtparams: Any kwargs for the "csv" engine
+        :yield: The rows in the SQL table
         :rtype: Iterator[List[Any]]
         """
 
-        if convert_dtypes:
-            dtypes = list(self.dtypes.values())
+        if self._url is not None:
+            file_path = self._source_file if self._source_file != self._url else None
+            with _open_url(self._url, file_path, self._saved) as binfile:
+                if raw:
+                    yield from _parse_byte_lines(
+                        binfile, converter, null, columns, filters
+                    )
+                    return
+                text = io.TextIOWrapper(binfile, encoding=self.encoding)
+                yield from _parse_lines(
+                    text, converter, engine, null, columns, filters, **fmtparams
+                )
+        elif engine == "tokenizer" and _compression(self._source_file) is None:
+            encoding = None if raw else self.encoding
+            with _mmap_file(self._source_file) as buffer:
+                yield from _parse_buffer(
+                    buffer, converter, encoding, null, columns=columns, filters=filters
+                )
+        elif raw:
+            with _open_binary(self._source_file, self._decompression_thread) as binfile:
+                yield from _parse_byte_lines(binfile, converter, null, columns, filters)
+        else:
+            with _open_file(
+                self._source_file, self.encoding, self._decompression_thread
+            ) as infile:
+                yield from _parse_lines(
+                    infile, converter, engine, null, columns, filters, **fmtparams
+                )
 
-        with _open_file(self._source_file, encoding=self.encoding) as infile:
-            for line in infile:
-                if _has_sql_attribute(line, "insert"):
-                    rows = _parse(line, **fmtparams)
-                    for row in rows:
-                        if convert_dtypes:
-                            converted_row = _convert(
-                                row, dtypes, strict=strict_conversion
-                            )
-                            yield converted_row
-                        else:
-                            yield row
+    def _cached_batches(
+        self,
+        cache_dir: PathObject,
+        workers: int,
+        pipeline: bool = False,
+        null: Any = "",
+    ) -> Iterator[List[List[Any]]]:
+        """
+        Read the unconverted rows from the cache, or parse them from the
+        dump file and write them to the cache if they aren't cached yet.
+
+        :param cache_dir: The cache directory
+        :type cache_dir: PathObject
+        :param workers: Number of processes used to parse the dump file
+        :type workers: int
+        :param pipeline: Whether to parse the dump file in pipeline mode,
+            defaults to False
+        :type pipeline: bool, optional
+        :param null: The value that SQL NULL is replaced with,
+            defaults to ""
+        :type null: Any, optional
+        :yield: Lists of rows
+        :rtype: Iterator[List[List[Any]]]
+        """
+
+        cache_path = _cache_path(cache_dir, self._source_file, self.encoding)
+        batches = _read_cache(cache_path, null)
+        if batches is not None:
+            yield from batches
+            return
+
+        # NULL is cached as such, so that any replacement can be read back
+        n_cols = len(self.col_names)
+        if workers > 1 or pipeline:
+            parallel_rows = self._pipelined_rows if pipeline else self._parallel_rows
+            rows = parallel_rows(workers, True, None, False, "tokenizer", {}, null=None)
+        else:
+            rows = self._parse_file(null=None)
+        yield from _write_cache(cache_path, rows, n_cols, self._cache_size, null=null)
+
+    def _serial_rows(
+        self, converter: Optional[RowsConverter] = None, null: Any = ""
+    ) -> Iterator[List[Any]]:
+        """
+        Parse the dump file in this process, or read the rows from the
+        cache if the dump has a cache directory, see :meth:`from_file`.
 
-    def to_csv(self, file_path: PathObject, **fmtparams: Any) -> None:
+        :param converter: A function that converts the rows of each
+            statement or batch, or None
+        :type converter: Optional[Callable[[List[List[str]]], List[List[Any]]]],
+            optional
+        :param null: The value that SQL NULL is replaced with,
+            defaults to ""
+        :type null: Any, optional
+        :yield: The rows in the SQL table
+        :rtype: Iterator[List[Any]]
         """
-        Write Dump object to CSV file.
+
+        if self._cache_dir is None:
+            yield from self._parse_file(converter, null=null)
+            return
+        for batch in self._cached_batches(self._cache_dir, 1, null=null):
+            yield from converter(batch) if converter else batch
+
+    def _parallel_rows(
+        self,
+        workers: int,
+        ordered: bool,
+        dtypes: Optional[List[type]],
+        strict: bool,
+        engine: str,
+        fmtparams: Dict[str, Any],
+        raw: bool = False,
+        columns: Optional[Tuple[int, ...]] = None,
+        conditions: Optional[List[Tuple[int, type, Any]]] = None,
+        null: Any = "",
+    ) -> Iterator[List[Any]]:
+        """
+        Parse the dump file in a pool of worker processes.
+
+        The file is split into byte ranges at INSERT INTO boundaries and
+        each range is parsed by one task, see :func:`_map_tasks`.
+
+        :param workers: Number of worker processes
+        :type workers: int
+        :param ordered: When True, yield the rows in their original order.
+            Otherwise yield them as soon as their range has been parsed.
+        :type ordered: bool
+        :param dtypes: Python data types to convert the values to, or None
+        :type dtypes: Optional[List[type]]
+        :param strict: Whether the conversion is strict
+        :type strict: bool
+        :param engine: The parser engine
+        :type engine: str
+        :param fmtparams: Any kwargs for the "csv" engine
+        :type fmtparams: Dict[str, Any]
+        :param raw: Whether to yield the values as undecoded bytes,
+            defaults to False
+        :type raw: bool, optional
+        :param columns: Indices of the columns to parse, in ascending
+            order, defaults to None for all columns
+        :type columns: Optional[Tuple[int, ...]], optional
+        :param conditions: Triples of a column index, its Python data type
+            and the condition on its values, defaults to None
+        :type conditions: Optional[List[Tuple[int, type, Any]]], optional
+        :param null: The value that SQL NULL is replaced with, unless
+            `raw` is True. Defaults to "".
+        :type null: Any, optional
+        :raises ValueError: If the dump file is compressed and is not a
+            gzip file with a gzip index
+        :yield: The rows in the SQL table
+        :rtype: Iterator[List[Any]]
+        """
+
+        file_path = self._local_file()
+        codec = _compression(file_path)
+        if codec not in (None, "gzip"):
+            raise ValueError(f"{codec} compressed dump files cannot be split")
+        if codec == "gzip" and not _has_gzip_index(file_path):
+            raise ValueError(
+                "parallel parsing of a compressed dump file requires a gzip "
+                "index, create one with Dump.build_gzip_index()"
+            )
+
+        task = partial(
+            _parse_chunk,
+            encoding=self.encoding,
+            dtypes=dtypes,
+            strict=strict,
+            engine=engine,
+            fmtparams=fmtparams,
+            raw=raw,
+            columns=columns,
+            conditions=conditions,
+            null=null,
+        )
+        chunks = (
+            (self._source_file, start, end)
+            for start, end in _split_file(self._source_file, _CHUNK_SIZE)
+        )
+        yield from _map_tasks(task, chunks, workers, ordered)
+
+    def _statement_chunks(self) -> Iterator[bytes]:
+        """
+        Read the dump file, or stream it from its URL, in chunks of whole
+        lines, see :func:`mwsql.utils._read_chunks`.
+
+        :yield: The chunks
+        :rtype: Iterator[bytes]
+        """
+
+        if self._url is not None:
+            file_path = self._source_file if self._source_file != self._url else None
+            with _open_url(self._url, file_path, self._saved) as binfile:
+                yield from _read_chunks(binfile, _CHUNK_SIZE)
+        else:
+            with _open_binary(self._source_file, self._decompression_thread) as binfile:
+                yield from _read_chunks(binfile, _CHUNK_SIZE)
+
+    def _pipelined_rows(
+        self,
+        workers: int,
+        ordered: bool,
+        dtypes: Optional[List[type]],
+        strict: bool,
+        engine: str,
+        fmtparams: Dict[str, Any],
+        raw: bool = False,
+        columns: Optional[Tuple[int, ...]] = None,
+        conditions: Optional[List[Tuple[int, type, Any]]] = None,
+        null: Any = "",
+    ) -> Iterator[List[Any]]:
+        """
+        Parse the dump file in a pipeline of three stages: a thread that
+        reads and decompresses the file in chunks of whole lines, a pool
+        of worker processes that parse and convert the chunks, and this
+        generator, which yields their rows. The reading thread stays up
+        to `workers` chunks ahead of the pool, and at most two chunks per
+        worker are being parsed at any time, see :func:`_map_tasks`.
+        Takes the same parameters as :meth:`_parallel_rows`.
+
+        :yield: The rows in the SQL table
+        :rtype: Iterator[List[Any]]
+        """
+
+        task = partial(
+            _parse_statements,
+            encoding=self.encoding,
+            dtypes=dtypes,
+            strict=strict,
+            engine=engine,
+            fmtparams=fmtparams,
+            raw=raw,
+            columns=columns,
+            conditions=conditions,
+            null=null,
+        )
+        chunks = _read_ahead(self._statement_chunks(), workers)
+        try:
+            yield from _map_tasks(
+                task, ((chunk,) for chunk in chunks), workers, ordered
+            )
+        finally:
+            chunks.close()
+
+    async def arows(
+        self,
+        batch_size: int = 1024,
+        prefetch: int = 4,
+        executor: Optional[Executor] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[List[Any]]:
+        """
+        Create an asynchronous generator object from the rows, for use in
+        asyncio applications, e.g. ``async for row in dump.arows():``.
+
+        The dump file is read and parsed by :meth:`rows` in a thread of
+        `executor`, which passes the rows to the event loop in batches of
+        `batch_size` rows. At most `prefetch` batches are parsed ahead of
+        the rows being consumed, so that memory use stays bounded when the
+        consumer is slower than the parser. Decompression releases the GIL,
+        but parsing doesn't: to keep the event loop responsive while
+        parsing large dumps, also pass `workers` to parse them in other
+        processes.
+
+        When the iteration stops early, e.g. on ``break``, parsing stops
+        after the current batch.
+
+        :param batch_size: Number of rows passed to the event loop at a
+            time, defaults to 1024
+        :type batch_size: int, optional
+        :param prefetch: Maximum number of batches parsed ahead,
+            defaults to 4
+        :type prefetch: int, optional
+        :param executor: The thread pool in which the rows are parsed. It
+            has to run one thread for each dump that is iterated over at the
+            same time. Defaults to None for the default executor of the
+            event loop.
+        :type executor: Optional[Executor], optional
+        :param kwargs: Any parameters of :meth:`rows`, e.g.
+            `convert_dtypes`, `columns` or `workers`
+        :raises ValueError: If `batch_size` or `prefetch` is less than 1,
+            or for the reasons listed in :meth:`rows`
+        :yield: An asynchronous generator used to iterate over the rows
+            in the SQL table
+        :rtype: AsyncIterator[List[Any]]
+        """
+
+        if batch_size < 1 or prefetch < 1:
+            raise ValueError("batch_size and prefetch must be at least 1")
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        slots = threading.Semaphore(prefetch)
+        stopped = threading.Event()
+
+        def produce() -> None:
+            # The end of the rows or the error that ended them is always
+            # passed on, as the consumer would otherwise wait forever
+            end: Optional[BaseException] = None
+            try:
+                for batch in _batched(self.rows(**kwargs), batch_size):
+                    slots.acquire()
+                    if stopped.is_set():
+                        return
+                    loop.call_soon_threadsafe(queue.put_nowait, batch)
+            except BaseException as exc:
+                end = exc
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, end)
+
+        producer = loop.run_in_executor(executor, produce)
+        try:
+            while True:
+                batch = await queue.get()
+                if batch is None:
+                    return
+                if isinstance(batch, BaseException):
+                    raise batch
+                slots.release()
+                for row in batch:
+                    yield row
+        finally:
+            stopped.set()
+            slots.release()
+            await producer
+
+    def batches(
+        self, batch_size: int = 65536, strict_conversion: bool = False
+    ) -> Iterator[Batch]:
+        """
+        Create a generator object that yields the rows in column-oriented
+        batches. Each column is converted to the Python dtype in
+        :attr:`dtypes`, and its values are stored in contiguous buffers:
+        int and float columns as int64 and float64 arrays, and str columns
+        as a buffer of UTF-8 encoded strings plus an array of offsets.
+        NULL values are marked in a validity mask. The buffers can be
+        wrapped by NumPy or Arrow without copying, see
+        :meth:`Batch.to_arrow`.
+
+        Numerical values that are empty or cannot be converted are stored
+        as NULL.
+
+        :param batch_size: Maximum number of rows in each batch,
+            defaults to 65536
+        :type batch_size: int, optional
+        :param strict_conversion: When True, raise exception Error on
+            bad input when converting from SQL dtypes to Python dtypes.
+            Defaults to False.
+        :type strict_conversion: bool, optional
+        :yield: A generator used to iterate over the batches
+        :rtype: Iterator[Batch]
+        """
+
+        dtypes = list(self.dtypes.values())
+
+        rows = self._serial_rows(null=None)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield _build_batch(batch, self.col_names, dtypes, strict_conversion)
+
+    def to_parquet(
+        self,
+        file_path: PathObject,
+        row_group_size: int = 65536,
+        compression: Optional[str] = "snappy",
+        use_dictionary: Union[bool, List[str]] = True,
+        strict_conversion: bool = False,
+    ) -> None:
+        """
+        Write Dump object to Parquet file. The rows are converted to
+        typed columns as in :meth:`batches` and written one row group at
+        a time, so memory use is bounded by `row_group_size` regardless of
+        the size of the dump. Requires the optional pyarrow package.
+
+        :param file_path: The file to write to. Will be created if it
+            doesn't already exist. Will be overwritten if it does exist.
+        :type file_path: PathObject
+        :param row_group_size: Number of rows in each row group,
+            defaults to 65536
+        :type row_group_size: int, optional
+        :param compression: Compression codec, e.g. "snappy", "gzip",
+            "zstd" or None for no compression. Defaults to "snappy".
+        :type compression: Optional[str], optional
+        :param use_dictionary: Whether to dictionary encode the columns,
+            or a list of the columns to dictionary encode. Columns with
+            too many distinct values to benefit from it fall back to plain
+            encoding. Defaults to True.
+        :type use_dictionary: Union[bool, List[str]], optional
+        :param strict_conversion: When True, raise exception Error on
+            bad input when converting from SQL dtypes to Python dtypes.
+            Defaults to False.
+        :type strict_conversion: bool, optional
+        :raises ValueError: If `use_dictionary` contains unknown columns
+        :raises ImportError: If pyarrow is not installed
+        """
+
+        if not isinstance(use_dictionary, bool):
+            unknown = set(use_dictionary) - set(self.col_names)
+            if unknown:
+                raise ValueError(f"unknown columns: {sorted(unknown)}")
+
+        pq = _import_pyarrow("pyarrow.parquet")
+        schema = _arrow_schema(self.col_names, list(self.dtypes.values()))
+
+        with pq.ParquetWriter(
+            file_path,
+            schema,
+            compression=compression,
+            use_dictionary=use_dictionary,
+        ) as writer:
+            for batch in self.batches(row_group_size, strict_conversion):
+                writer.write_batch(batch.to_arrow(), row_group_size=row_group_size)
+
+    def to_csv(
+        self,
+        file_path: PathObject,
+        convert_dtypes: bool = False,
+        null: str = "",
+        compression: Optional[str] = "infer",
+        compression_level: Optional[int] = None,
+        compression_threads: int = 1,
+        buffer_size: int = WRITE_BUFFER_SIZE,
+        **fmtparams: Any,
+    ) -> None:
+        """
+        Write Dump object to CSV file. Compressed output is compressed
+        in background threads while the dump is being parsed.
 
         :param file_path: The file to write to. Will be created if it
             doesn't already exist. Will be overwritten if it does exist.
         :type file_path: PathObject
+        :param convert_dtypes: When set to True, numerical values are
+            converted to int or float before being written, which
+            normalizes their formatting. Defaults to False.
+        :type convert_dtypes: bool, optional
+        :param null: The string that SQL NULL values are written as,
+            e.g. "\\N". Defaults to "".
+        :type null: str, optional
+        :param compression: "gzip", "zstd", None for no compression or
+            "infer" to choose from the extension of `file_path` (.gz or
+            .zst). zstd requires the optional zstandard package.
+            Defaults to "infer".
+        :type compression: Optional[str], optional
+        :param compression_level: Compression level, defaults to 6 for gzip
+            and 3 for zstd
+        :type compression_level: Optional[int], optional
+        :param compression_threads: Number of compression threads,
+            defaults to 1
+        :type compression_threads: int, optional
+        :param buffer_size: Size of the write buffer in bytes,
+            defaults to WRITE_BUFFER_SIZE
+        :type buffer_size: int, optional
+        :param fmtparams: Any kwargs you want to pass to the csv.writer()
+            function that does the actual writing
+        :raises ValueError: If `compression` is not supported
+        :raises ImportError: If `compression` is "zstd" and zstandard
+            is not installed
         """
 
-        with open(file_path, "w") as outfile:
+        output = _open_output(
+            file_path,
+            compression,
+            compression_level,
+            compression_threads,
+            buffer_size,
+            self.encoding,
+        )
+        with output as outfile:
             writer = csv.writer(outfile, **fmtparams)
             writer.writerow(self.col_names)
-            for row in self:
-                writer.writerow(row)
+            writer.writerows(self._csv_rows(convert_dtypes, null))
+
+    def _csv_rows(self, convert_dtypes: bool, null: str) -> Iterator[List[Any]]:
+        """
+        Yield the rows as they are written by :meth:`to_csv`.
+
+        :param convert_dtypes: Whether to convert numerical values
+        :type convert_dtypes: bool
+        :param null: The string that SQL NULL values are written as
+        :type null: str
+        :yield: The rows in the SQL table
+        :rtype: Iterator[List[Any]]
+        """
+
+        if not convert_dtypes:
+            yield from self._serial_rows(null=null)
+            return
+
+        # Parse NULL as None so that it isn't mistaken for a bad value
+        rows = self._serial_rows(self._converter(False), null=None)
+        if null:
+            rows = ([null if val is None else val for val in row] for row in rows)
+        yield from rows
 
     def head(self, n_lines: int = 10, convert_dtypes: bool = False) -> None:
         """
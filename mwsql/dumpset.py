@@ -0,0 +1,502 @@
+"""
+Processing the same table from many SQL dump files, e.g. across wikis.
+"""
+
+import csv
+import glob
+import multiprocessing
+import os
+import pickle
+import queue
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .batch import _arrow_schema, _import_pyarrow
+from .cache import _batched
+from .dump import _START_METHOD, Dump
+from .utils import WRITE_BUFFER_SIZE, PathObject, _open_output
+
+# Set in each worker process by _init_worker
+_QUEUE: Any = None
+_STOPPED: Any = None
+
+
+def _init_worker(items: Any, stopped: Any) -> None:
+    """
+    Initialize a worker process with the queue it passes its results
+    through and the event that tells it to stop.
+
+    :param items: The queue of results
+    :type items: multiprocessing.Queue
+    :param stopped: Set when the results are no longer read
+    :type stopped: multiprocessing.Event
+    """
+
+    global _QUEUE, _STOPPED
+    _QUEUE = items
+    _STOPPED = stopped
+    # Results that are left in the queue when the reader stops must not
+    # keep the worker process from exiting
+    items.cancel_join_thread()
+
+
+def _put(item: Tuple[int, Any]) -> bool:
+    """
+    Put a result in the queue of the worker process, waiting while it is
+    full.
+
+    :param item: The index of a dump and a result
+    :type item: Tuple[int, Any]
+    :return: False if the results are no longer read
+    :rtype: bool
+    """
+
+    while not _STOPPED.is_set():
+        try:
+            _QUEUE.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _picklable(exc: Exception) -> Exception:
+    """
+    Get an exception that can be passed through a queue. Exceptions that
+    can't be pickled would be dropped by the queue without an error, so
+    they are replaced with a RuntimeError that describes them.
+
+    :param exc: The exception raised in a worker process
+    :type exc: Exception
+    :return: `exc`, or a RuntimeError with its repr and traceback
+    :rtype: Exception
+    """
+
+    try:
+        pickle.loads(pickle.dumps(exc))
+    except Exception:
+        trace = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+        return RuntimeError(f"{exc!r} was raised in a worker process:\n{trace}")
+    return exc
+
+
+def _dump_items(
+    dump: Dump, method: str, kwargs: Dict[str, Any], batch_size: Optional[int]
+) -> Iterator[Any]:
+    """
+    Call a method of a Dump that yields rows or batches.
+
+    :param dump: The dump
+    :type dump: Dump
+    :param method: The name of the method, e.g. "rows"
+    :type method: str
+    :param kwargs: The parameters of the method
+    :type kwargs: Dict[str, Any]
+    :param batch_size: Number of rows to group in each list, or None if
+        the method yields batches
+    :type batch_size: Optional[int]
+    :yield: Lists of rows, or the items yielded by the method
+    :rtype: Iterator[Any]
+    """
+
+    items = getattr(dump, method)(**kwargs)
+    if batch_size is None:
+        return items
+    return _batched(items, batch_size)
+
+
+def _stream_dump(
+    index: int,
+    file_path: PathObject,
+    encoding: str,
+    cache_dir: Optional[PathObject],
+    cache_size: int,
+    decompression_thread: bool,
+    method: str,
+    kwargs: Dict[str, Any],
+    batch_size: Optional[int],
+) -> None:
+    """
+    Open a dump file in a worker process and pass the items yielded by
+    one of its methods to the queue of the worker, followed by None.
+    An exception is passed instead of the remaining items.
+
+    :param index: The index of the dump in the DumpSet
+    :type index: int
+    :param file_path: The path to the dump file
+    :type file_path: PathObject
+    :param encoding: Text encoding
+    :type encoding: str
+    :param cache_dir: Directory in which to cache the parsed rows
+    :type cache_dir: Optional[PathObject]
+    :param cache_size: Maximum total size of the cache directory in bytes
+    :type cache_size: int
+    :param decompression_thread: Whether to decompress the dump file in a
+        background thread
+    :type decompression_thread: bool
+    :param method: The name of the method, e.g. "rows"
+    :type method: str
+    :param kwargs: The parameters of the method
+    :type kwargs: Dict[str, Any]
+    :param batch_size: Number of rows to pass at a time, or None if the
+        method yields batches
+    :type batch_size: Optional[int]
+    """
+
+    try:
+        dump = Dump.from_file(
+            file_path, encoding, cache_dir, cache_size, decompression_thread
+        )
+        for item in _dump_items(dump, method, kwargs, batch_size):
+            if not _put((index, item)):
+                return
+    except Exception as exc:
+        _put((index, _picklable(exc)))
+        return
+    _put((index, None))
+
+
+class DumpSet:
+    """
+    Class for processing the same SQL table from many dump files, e.g.
+    the page table of every wiki.
+    """
+
+    def __init__(self, dumps: List[Dump]) -> None:
+        """
+        DumpSet class constructor.
+
+        :param dumps: The dumps, which must all have the same columns
+            and dtypes
+        :type dumps: List[Dump]
+        :raises ValueError: If `dumps` is empty, or if the columns or
+            dtypes of a dump differ from the ones of the first dump
+        """
+
+        if not dumps:
+            raise ValueError("a DumpSet needs at least one dump")
+        first = dumps[0]
+        for dump in dumps[1:]:
+            if dump.col_names != first.col_names or dump.dtypes != first.dtypes:
+                raise ValueError(
+                    f"the schema of {dump._source_file} is not compatible "
+                    f"with the schema of {first._source_file}"
+                )
+
+        self.dumps = dumps
+        self.name = first.name
+        self.col_names = first.col_names
+
+    def __str__(self) -> str:
+        return f"DumpSet(name={self.name}, dumps={len(self.dumps)})"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+    def __len__(self) -> int:
+        return len(self.dumps)
+
+    def __iter__(self) -> Iterator[Tuple[Optional[str], List[Any]]]:
+        return self.rows()
+
+    @property
+    def dtypes(self) -> Dict[str, type]:
+        """
+        Mapping between the column names and their Python data types,
+        which are the same in every dump.
+
+        :return: A mapping from column names to Python data types
+        :rtype: Dict[str, type]
+        """
+
+        return self.dumps[0].dtypes
+
+    @classmethod
+    def from_files(
+        cls,
+        file_paths: Union[PathObject, Iterable[PathObject]],
+        encoding: str = "utf-8",
+        cache_dir: Optional[PathObject] = None,
+    ) -> "DumpSet":
+        """
+        Initialize DumpSet object from dump files. See
+        :meth:`Dump.from_file`.
+
+        :param file_paths: A glob pattern, e.g. "dumps/*wiki-latest-page.sql.gz",
+            or a list of paths to the dump files. The files that match a
+            pattern are sorted by path.
+        :type file_paths: Union[PathObject, Iterable[PathObject]]
+        :param encoding: Text encoding of the files, defaults to "utf-8"
+        :type encoding: str, optional
+        :param cache_dir: Directory in which to cache the parsed rows,
+            defaults to None for no caching
+        :type cache_dir: Optional[PathObject], optional
+        :raises FileNotFoundError: If no file matches the pattern
+        :raises ValueError: If the schemas of the dumps are not compatible
+        :return: A DumpSet class instance
+        :rtype: DumpSet
+        """
+
+        if isinstance(file_paths, (str, os.PathLike)):
+            pattern = os.path.expanduser(file_paths)
+            file_paths = sorted(glob.glob(pattern))
+            if not file_paths:
+                raise FileNotFoundError(f"no dump files match {pattern!r}")
+
+        return cls(
+            [Dump.from_file(file_path, encoding, cache_dir) for file_path in file_paths]
+        )
+
+    def rows(
+        self,
+        workers: int = 1,
+        batch_size: int = 1024,
+        prefetch: int = 16,
+        **kwargs: Any,
+    ) -> Iterator[Tuple[Optional[str], List[Any]]]:
+        """
+        Create a generator object from the rows of all the dumps, each
+        tagged with the :attr:`Dump.db` of its dump.
+
+        With a single worker, the dumps are read one after the other. With
+        more, each worker process reads a whole dump at a time, and the rows
+        of the dumps are interleaved as they are parsed, with the rows of
+        each dump in their original order. Workers pass the rows in batches
+        of `batch_size` rows through a queue of `prefetch` batches, and
+        wait while it is full, so memory use stays bounded when the rows
+        are consumed slower than they are parsed.
+
+        :param workers: Number of processes that read the dumps,
+            defaults to 1
+        :type workers: int, optional
+        :param batch_size: Number of rows passed by a worker at a time,
+            defaults to 1024
+        :type batch_size: int, optional
+        :param prefetch: Maximum number of batches parsed ahead,
+            defaults to 16
+        :type prefetch: int, optional
+        :param kwargs: Any parameters of :meth:`Dump.rows`, e.g.
+            `convert_dtypes`, `columns` or `where`. With more than one
+            worker, they must be picklable.
+        :raises ValueError: For the reasons listed in :meth:`Dump.rows`
+        :yield: Pairs of a database name, e.g. "enwiki", and a row
+        :rtype: Iterator[Tuple[Optional[str], List[Any]]]
+        """
+
+        for db, rows in self._stream("rows", kwargs, batch_size, workers, prefetch):
+            for row in rows:
+                yield db, row
+
+    def _stream(
+        self,
+        method: str,
+        kwargs: Dict[str, Any],
+        batch_size: Optional[int],
+        workers: int,
+        prefetch: int,
+    ) -> Iterator[Tuple[Optional[str], Any]]:
+        """
+        Call a method that yields rows or batches on every dump, in one or
+        more worker processes. Takes the same parameters as :meth:`rows`.
+
+        :param method: The name of the method, e.g. "rows"
+        :type method: str
+        :param kwargs: The parameters of the method
+        :type kwargs: Dict[str, Any]
+        :param batch_size: Number of rows passed at a time, or None if
+            the method yields batches
+        :type batch_size: Optional[int]
+        :raises ValueError: If `workers` or `prefetch` is less than 1
+        :yield: Pairs of a database name and a list of rows or a batch
+        :rtype: Iterator[Tuple[Optional[str], Any]]
+        """
+
+        if workers < 1 or prefetch < 1:
+            raise ValueError("workers and prefetch must be at least 1")
+
+        if workers == 1:
+            for dump in self.dumps:
+                for item in _dump_items(dump, method, kwargs, batch_size):
+                    yield dump.db, item
+            return
+
+        context = multiprocessing.get_context(_START_METHOD)
+        items: Any = context.Queue(prefetch)
+        stopped = context.Event()
+        executor = ProcessPoolExecutor(
+            max_workers=min(workers, len(self.dumps)),
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(items, stopped),
+        )
+        futures: List[Future] = [
+            executor.submit(
+                _stream_dump,
+                index,
+                dump._source_file,
+                dump.encoding,
+                dump._cache_dir,
+                dump._cache_size,
+                dump._decompression_thread,
+                method,
+                kwargs,
+                batch_size,
+            )
+            for index, dump in enumerate(self.dumps)
+        ]
+
+        try:
+            remaining = len(self.dumps)
+            while remaining:
+                try:
+                    index, item = items.get(timeout=0.1)
+                except queue.Empty:
+                    # A worker process that dies without passing an
+                    # exception breaks the pool, which fails its tasks
+                    for future in futures:
+                        if future.done() and future.exception() is not None:
+                            raise future.exception()  # type: ignore[misc]
+                    continue
+                if item is None:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield self.dumps[index].db, item
+        finally:
+            stopped.set()
+            for future in futures:
+                future.cancel()
+            executor.shutdown()
+            items.close()
+
+    def to_parquet(
+        self,
+        file_path: PathObject,
+        workers: int = 1,
+        row_group_size: int = 65536,
+        compression: Optional[str] = "snappy",
+        use_dictionary: Union[bool, List[str]] = True,
+        strict_conversion: bool = False,
+    ) -> None:
+        """
+        Write the rows of all the dumps to a single Parquet file, with the
+        database name of each row in a leading "db" column. The dumps are
+        read as in :meth:`rows`, and their rows are converted and written
+        as in :meth:`Dump.to_parquet`. Requires the optional pyarrow
+        package.
+
+        :param file_path: The file to write to. Will be created if it
+            doesn't already exist. Will be overwritten if it does exist.
+        :type file_path: PathObject
+        :param workers: Number of processes that read the dumps,
+            defaults to 1
+        :type workers: int, optional
+        :param row_group_size: Maximum number of rows in each row group,
+            defaults to 65536
+        :type row_group_size: int, optional
+        :param compression: Compression codec, e.g. "snappy", "gzip",
+            "zstd" or None for no compression. Defaults to "snappy".
+        :type compression: Optional[str], optional
+        :param use_dictionary: Whether to dictionary encode the columns,
+            or a list of the columns to dictionary encode. Defaults to True.
+        :type use_dictionary: Union[bool, List[str]], optional
+        :param strict_conversion: When True, raise exception Error on
+            bad input when converting from SQL dtypes to Python dtypes.
+            Defaults to False.
+        :type strict_conversion: bool, optional
+        :raises ValueError: If `use_dictionary` contains unknown columns
+        :raises ImportError: If pyarrow is not installed
+        """
+
+        col_names = ["db", *self.col_names]
+        if not isinstance(use_dictionary, bool):
+            unknown = set(use_dictionary) - set(col_names)
+            if unknown:
+                raise ValueError(f"unknown columns: {sorted(unknown)}")
+
+        pa = _import_pyarrow()
+        pq = _import_pyarrow("pyarrow.parquet")
+        schema = _arrow_schema(col_names, [str, *self.dtypes.values()])
+
+        kwargs = {"batch_size": row_group_size, "strict_conversion": strict_conversion}
+        with pq.ParquetWriter(
+            file_path,
+            schema,
+            compression=compression,
+            use_dictionary=use_dictionary,
+        ) as writer:
+            for db, batch in self._stream("batches", kwargs, None, workers, 4):
+                columns = [column.to_arrow() for column in batch.columns]
+                dbs = pa.array([db] * len(batch), type=schema.field("db").type)
+                writer.write_batch(
+                    pa.RecordBatch.from_arrays([dbs, *columns], schema=schema),
+                    row_group_size=row_group_size,
+                )
+
+    def to_csv(
+        self,
+        file_path: PathObject,
+        workers: int = 1,
+        convert_dtypes: bool = False,
+        null: str = "",
+        compression: Optional[str] = "infer",
+        compression_level: Optional[int] = None,
+        compression_threads: int = 1,
+        buffer_size: int = WRITE_BUFFER_SIZE,
+        **fmtparams: Any,
+    ) -> None:
+        """
+        Write the rows of all the dumps to a single CSV file, with the
+        database name of each row in a leading "db" column. The dumps are
+        read as in :meth:`rows`, and their rows are written as in
+        :meth:`Dump.to_csv`, in the encoding of the first dump.
+
+        :param file_path: The file to write to. Will be created if it
+            doesn't already exist. Will be overwritten if it does exist.
+        :type file_path: PathObject
+        :param workers: Number of processes that read the dumps,
+            defaults to 1
+        :type workers: int, optional
+        :param convert_dtypes: When set to True, numerical values are
+            converted to int or float before being written, which
+            normalizes their formatting. Defaults to False.
+        :type convert_dtypes: bool, optional
+        :param null: The string that SQL NULL values are written as,
+            e.g. "\\N". Defaults to "".
+        :type null: str, optional
+        :param compression: "gzip", "zstd", None for no compression or
+            "infer" to choose from the extension of `file_path` (.gz or
+            .zst). Defaults to "infer".
+        :type compression: Optional[str], optional
+        :param compression_level: Compression level, defaults to 6 for gzip
+            and 3 for zstd
+        :type compression_level: Optional[int], optional
+        :param compression_threads: Number of compression threads,
+            defaults to 1
+        :type compression_threads: int, optional
+        :param buffer_size: Size of the write buffer in bytes,
+            defaults to WRITE_BUFFER_SIZE
+        :type buffer_size: int, optional
+        :param fmtparams: Any kwargs you want to pass to the csv.writer()
+            function that does the actual writing
+        :raises ValueError: If `compression` is not supported
+        :raises ImportError: If `compression` is "zstd" and zstandard
+            is not installed
+        """
+
+        output = _open_output(
+            file_path,
+            compression,
+            compression_level,
+            compression_threads,
+            buffer_size,
+            self.dumps[0].encoding,
+        )
+        kwargs = {"convert_dtypes": convert_dtypes, "null": null}
+        with output as outfile:
+            writer = csv.writer(outfile, **fmtparams)
+            writer.writerow(["db", *self.col_names])
+            for db, rows in self._stream("_csv_rows", kwargs, 1024, workers, 16):
+                writer.writerows([db, *row] for row in rows)
@@ -0,0 +1,591 @@
+"""
+Indexes of the INSERT INTO statements of SQL dump files.
+"""
+
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import struct
+import tempfile
+import uuid
+from array import array
+from bisect import bisect_left
+from itertools import islice
+from pathlib import Path
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from .parser import _tokenize_bytes
+from .utils import (
+    PathObject,
+    _read_json,
+    _read_statements,
+    _source_stamp,
+    _write_json,
+)
+
+# Bump when the format of index files changes, so that old ones are ignored
+_INDEX_VERSION = 1
+
+# Maximum number of entries of a column index that are sorted in memory
+# while it is built. Larger indexes are sorted in runs that are merged.
+_RUN_SIZE = 4 * 1024 * 1024
+
+# An entry of a column index: the hash of a key and the number of a
+# statement that contains a row with this key
+_ENTRY = struct.Struct("<QI")
+_HEADER_SIZE = struct.Struct("<Q")
+
+# A key of a row, with one value per key column
+Key = Tuple[Any, ...]
+
+
+def _index_path(file_path: PathObject) -> Path:
+    """
+    Get the path of the primary key index file of a dump file, which is
+    stored next to it.
+
+    :param file_path: The path to the dump file
+    :type file_path: PathObject
+    :return: The path to the index file, e.g. "page.sql.gz.pkidx"
+    :rtype: Path
+    """
+
+    return Path(f"{file_path}.pkidx")
+
+
+def _key_converter(
+    dtypes: Sequence[type], encoding: str
+) -> Callable[[Sequence[bytes]], Key]:
+    """
+    Generate a function that converts the encoded values of the key
+    columns of a row into a key.
+
+    :param dtypes: The Python data type of each key column
+    :type dtypes: Sequence[type]
+    :param encoding: Text encoding to decode str values with
+    :type encoding: str
+    :return: A function that takes the values of the key columns as bytes
+        and returns them converted to `dtypes`, as a tuple
+    :rtype: Callable[[Sequence[bytes]], Tuple[Any, ...]]
+    """
+
+    converters: List[Callable[[bytes], Any]] = [
+        (lambda val: val.decode(encoding)) if dtype is str else dtype
+        for dtype in dtypes
+    ]
+    return lambda values: tuple(
+        convert(val) for convert, val in zip(converters, values)
+    )
+
+
+class _KeyIndex:
+    """
+    A sparse index of the INSERT INTO statements of a dump file, that
+    records the byte range of each statement together with the smallest
+    and the largest key of its rows. Wikimedia dumps are sorted by primary
+    key, so the statements can be found by binary search.
+    """
+
+    def __init__(
+        self, columns: List[str], statements: List[Tuple[int, int, Key, Key]]
+    ) -> None:
+        """
+        _KeyIndex class constructor.
+
+        :param columns: Names of the key columns
+        :type columns: List[str]
+        :param statements: The start and end offsets, smallest key and
+            largest key of each statement, in file order
+        :type statements: List[Tuple[int, int, Tuple[Any, ...], Tuple[Any, ...]]]
+        """
+
+        self.columns = columns
+        self.statements = statements
+        self.is_sorted = all(
+            prev[3] <= curr[2] for prev, curr in zip(statements, statements[1:])
+        )
+        self._largest_keys = [largest for _, _, _, largest in statements]
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def find(
+        self, lo: Optional[Key], hi: Optional[Key], inclusive: bool = False
+    ) -> List[Tuple[int, int]]:
+        """
+        Find the statements that may contain keys from `lo` to `hi`.
+
+        :param lo: Smallest key, or None for no lower bound. Keys can be
+            shorter than the key columns, e.g. (12,) is smaller than any
+            key that starts with 12.
+        :type lo: Optional[Tuple[Any, ...]]
+        :param hi: Largest key, excluded unless `inclusive` is True,
+            or None for no upper bound
+        :type hi: Optional[Tuple[Any, ...]]
+        :param inclusive: Whether `hi` is included, defaults to False
+        :type inclusive: bool, optional
+        :return: Byte ranges covering the statements, with adjacent
+            statements merged into one range
+        :rtype: List[Tuple[int, int]]
+        """
+
+        first = 0
+        if self.is_sorted and lo is not None:
+            first = bisect_left(self._largest_keys, lo)
+
+        ranges: List[Tuple[int, int]] = []
+        for start, end, smallest, largest in islice(self.statements, first, None):
+            if hi is not None and (smallest > hi or (smallest == hi and not inclusive)):
+                if self.is_sorted:
+                    break
+                continue
+            if lo is not None and largest < lo:
+                continue
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+        return ranges
+
+
+def _build_index(
+    file_path: PathObject,
+    encoding: str,
+    col_names: List[str],
+    dtypes: Dict[str, type],
+    key_columns: List[str],
+) -> Path:
+    """
+    Read a dump file once and save a sparse index of its statements by
+    the values of some columns next to it, see :class:`_KeyIndex`. Only
+    the key columns are extracted from the statements.
+
+    :param file_path: The path to the dump file
+    :type file_path: PathObject
+    :param encoding: Text encoding the dump file is read with
+    :type encoding: str
+    :param col_names: The column names
+    :type col_names: List[str]
+    :param dtypes: The Python data type of each column
+    :type dtypes: Dict[str, type]
+    :param key_columns: Names of the key columns
+    :type key_columns: List[str]
+    :raises ValueError: If a key value cannot be converted to the dtype
+        of its column
+    :return: The path to the index file
+    :rtype: Path
+    """
+
+    indices = [col_names.index(name) for name in key_columns]
+    parsed = sorted(set(indices))
+    positions = [parsed.index(i) for i in indices]
+    to_key = _key_converter([dtypes[name] for name in key_columns], encoding)
+
+    statements = []
+    for start, end, line in _read_statements(file_path):
+        keys = [
+            to_key([row[i] for i in positions])
+            for row in _tokenize_bytes(line, columns=parsed)
+        ]
+        if keys:
+            statements.append([start, end, list(min(keys)), list(max(keys))])
+
+    index_path = _index_path(file_path)
+    source = _source_stamp(file_path, encoding, _INDEX_VERSION)
+    data = {"source": source, "columns": key_columns, "statements": statements}
+    _write_json(index_path, data, indent=None)
+    return index_path
+
+
+def _read_index(file_path: PathObject, encoding: str) -> Optional[_KeyIndex]:
+    """
+    Read the primary key index of a dump file.
+
+    :param file_path: The path to the dump file
+    :type file_path: PathObject
+    :param encoding: Text encoding the dump file is read with
+    :type encoding: str
+    :return: The index, or None if there is no index file or it was
+        built for another version of the dump file
+    :rtype: Optional[_KeyIndex]
+    """
+
+    data = _read_json(_index_path(file_path))
+    if data is None:
+        return None
+    if data.get("source") != _source_stamp(file_path, encoding, _INDEX_VERSION):
+        return None
+    statements = [
+        (start, end, tuple(smallest), tuple(largest))
+        for start, end, smallest, largest in data["statements"]
+    ]
+    return _KeyIndex(data["columns"], statements)
+
+
+def _column_index_path(file_path: PathObject, columns: Sequence[str]) -> Path:
+    """
+    Get the path of the index file of some columns of a dump file, which
+    is stored next to it.
+
+    :param file_path: The path to the dump file
+    :type file_path: PathObject
+    :param columns: Names of the key columns
+    :type columns: Sequence[str]
+    :return: The path to the index file, e.g. "categorylinks.sql.gz.cl_to.idx"
+        or "pagelinks.sql.gz.pl_namespace+pl_title.idx"
+    :rtype: Path
+    """
+
+    return Path(f"{file_path}.{'+'.join(columns)}.idx")
+
+
+def _encode_key(values: Sequence[Any], dtypes: Sequence[type], encoding: str) -> bytes:
+    """
+    Encode a key in a canonical form, so that keys parsed from the dump
+    file and keys passed by the user are encoded the same way. Numbers are
+    formatted after conversion, and strings are encoded with the encoding
+    of the dump file. Values that cannot be converted are used as they are.
+
+    :param values: The values of the key columns, as str or bytes
+        parsed from the dump file or as passed by the user
+    :type values: Sequence[Any]
+    :param dtypes: The Python data type of each key column
+    :type dtypes: Sequence[type]
+    :param encoding: Text encoding of the dump file
+    :type encoding: str
+    :return: The encoded key
+    :rtype: bytes
+    """
+
+    parts = []
+    for val, dtype in zip(values, dtypes):
+        if dtype is not str:
+            try:
+                val = repr(dtype(val))
+            except (TypeError, ValueError):
+                pass  # Encoded as it is
+        if isinstance(val, bytes):
+            parts.append(val)
+        else:
+            parts.append(str(val).encode(encoding))
+    return b"\0".join(parts)
+
+
+def _hash_key(key: bytes) -> int:
+    """
+    Hash an encoded key into 64 bits. Unlike hash(), the result is the
+    same in every process.
+
+    :param key: The encoded key, see :func:`_encode_key`
+    :type key: bytes
+    :return: The hash
+    :rtype: int
+    """
+
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def _write_run(entries: List[int], directory: Path) -> IO[bytes]:
+    """
+    Write a sorted run of entries to a temporary file.
+
+    :param entries: The sorted entries, each a hash shifted left by
+        32 bits plus a statement number
+    :type entries: List[int]
+    :param directory: The directory of the temporary file
+    :type directory: Path
+    :return: The temporary file, positioned at its start. It is deleted
+        when closed.
+    :rtype: IO[bytes]
+    """
+
+    run = tempfile.TemporaryFile(dir=directory)
+    pack = _ENTRY.pack
+    run.write(b"".join(pack(entry >> 32, entry & 0xFFFFFFFF) for entry in entries))
+    run.seek(0)
+    return run
+
+
+def _read_run(run: IO[bytes]) -> Iterator[int]:
+    """
+    Read the entries of a sorted run, see :func:`_write_run`.
+
+    :param run: The temporary file
+    :type run: IO[bytes]
+    :yield: The entries
+    :rtype: Iterator[int]
+    """
+
+    while True:
+        data = run.read(_ENTRY.size * 65536)
+        if not data:
+            return
+        for key_hash, statement in _ENTRY.iter_unpack(data):
+            yield (key_hash << 32) | statement
+
+
+def _build_column_index(
+    file_path: PathObject,
+    encoding: str,
+    col_names: List[str],
+    dtypes: Dict[str, type],
+    key_columns: List[str],
+    run_size: int = _RUN_SIZE,
+) -> Path:
+    """
+    Read a dump file once and save an index of its statements by the
+    values of some columns next to it, see :class:`_ColumnIndex`. Only
+    the key columns are extracted from the statements. The entries of
+    the index are sorted in runs of `run_size` entries, which are merged
+    when the index is written, so that memory use is bounded. Rows with
+    a NULL key value are not indexed.
+
+    :param file_path: The path to the dump file
+    :type file_path: PathObject
+    :param encoding: Text encoding the dump file is read with
+    :type encoding: str
+    :param col_names: The column names
+    :type col_names: List[str]
+    :param dtypes: The Python data type of each column
+    :type dtypes: Dict[str, type]
+    :param key_columns: Names of the key columns
+    :type key_columns: List[str]
+    :param run_size: Maximum number of entries sorted in memory,
+        defaults to _RUN_SIZE
+    :type run_size: int, optional
+    :return: The path to the index file
+    :rtype: Path
+    """
+
+    indices = [col_names.index(name) for name in key_columns]
+    parsed = sorted(set(indices))
+    positions = [parsed.index(i) for i in indices]
+    key_dtypes = [dtypes[name] for name in key_columns]
+    index_path = _column_index_path(file_path, key_columns)
+
+    starts = array("q")
+    ends = array("q")
+    runs: List[IO[bytes]] = []
+    entries: List[int] = []
+    try:
+        for start, end, line in _read_statements(file_path):
+            statement = len(starts)
+            starts.append(start)
+            ends.append(end)
+            hashes = set()
+            for row in _tokenize_bytes(line, None, parsed):
+                values = [row[i] for i in positions]
+                if None not in values:
+                    hashes.add(_hash_key(_encode_key(values, key_dtypes, encoding)))
+            entries.extend((key_hash << 32) | statement for key_hash in hashes)
+            if len(entries) >= run_size:
+                entries.sort()
+                runs.append(_write_run(entries, index_path.parent))
+                entries = []
+        entries.sort()
+        merged: Iterable[int] = heapq.merge(entries, *map(_read_run, runs))
+
+        metadata = {
+            "source": _source_stamp(file_path, encoding, _INDEX_VERSION),
+            "columns": key_columns,
+            "statements": len(starts),
+            "entries": len(entries)
+            + sum(os.fstat(run.fileno()).st_size // _ENTRY.size for run in runs),
+        }
+        _write_index(index_path, metadata, starts, ends, merged)
+    finally:
+        for run in runs:
+            run.close()
+    return index_path
+
+
+def _write_index(
+    index_path: Path,
+    metadata: Dict[str, Any],
+    starts: array,
+    ends: array,
+    entries: Iterable[int],
+) -> None:
+    """
+    Write a column index file: the length of the metadata, the metadata
+    as JSON, the start and end offsets of the statements as int64 arrays,
+    and the entries sorted by hash. The file is written to a temporary
+    file first, so that readers never see a partially written index.
+
+    :param index_path: The path to the index file
+    :type index_path: Path
+    :param metadata: The source stamp, key columns and numbers of
+        statements and entries
+    :type metadata: Dict[str, Any]
+    :param starts: The start offset of each statement
+    :type starts: array
+    :param ends: The end offset of each statement
+    :type ends: array
+    :param entries: The sorted entries, each a hash shifted left by
+        32 bits plus a statement number
+    :type entries: Iterable[int]
+    """
+
+    header = json.dumps(metadata).encode("utf-8")
+    tmp_name = index_path.with_name(f".{index_path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_name, "wb") as outfile:
+            outfile.write(_HEADER_SIZE.pack(len(header)))
+            outfile.write(header)
+            outfile.write(starts.tobytes())
+            outfile.write(ends.tobytes())
+            pack = _ENTRY.pack
+            buffer = []
+            for entry in entries:
+                buffer.append(pack(entry >> 32, entry & 0xFFFFFFFF))
+                if len(buffer) == 65536:
+                    outfile.write(b"".join(buffer))
+                    buffer = []
+            outfile.write(b"".join(buffer))
+        os.replace(tmp_name, index_path)
+    finally:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+
+
+class _ColumnIndex:
+    """
+    An index of the INSERT INTO statements of a dump file by the values
+    of some columns. For each distinct key in each statement, the index
+    file holds an entry made of the 64-bit hash of the key and the number
+    of the statement, sorted by hash. The file is memory-mapped, and the
+    entries of a key are found by binary search, without reading the
+    whole index. Different keys can have the same hash, so the rows read
+    from the statements still need to be compared with the key.
+    """
+
+    def __init__(self, index_path: Path, metadata: Dict[str, Any], offset: int):
+        """
+        _ColumnIndex class constructor.
+
+        :param index_path: The path to the index file
+        :type index_path: Path
+        :param metadata: The metadata stored in the index file
+        :type metadata: Dict[str, Any]
+        :param offset: Offset of the statement offsets in the index file
+        :type offset: int
+        """
+
+        self.columns: List[str] = metadata["columns"]
+        self.size: int = metadata["entries"]
+        n_statements = metadata["statements"]
+        self.starts = array("q")
+        self.ends = array("q")
+        with open(index_path, "rb") as infile:
+            infile.seek(offset)
+            self.starts.fromfile(infile, n_statements)
+            self.ends.fromfile(infile, n_statements)
+            self._entries_offset = infile.tell()
+            self._buffer: Any = b""
+            if self.size:
+                self._buffer = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def close(self) -> None:
+        """
+        Unmap the index file.
+        """
+
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def _hash_at(self, i: int) -> int:
+        """
+        Get the hash of the i-th entry.
+
+        :param i: The number of the entry
+        :type i: int
+        :return: The hash
+        :rtype: int
+        """
+
+        offset = self._entries_offset + i * _ENTRY.size
+        key_hash: int = _ENTRY.unpack_from(self._buffer, offset)[0]
+        return key_hash
+
+    def find(self, key: bytes) -> List[Tuple[int, int]]:
+        """
+        Find the statements that may contain rows with a key.
+
+        :param key: The encoded key, see :func:`_encode_key`
+        :type key: bytes
+        :return: Byte ranges covering the statements, with adjacent
+            statements merged into one range
+        :rtype: List[Tuple[int, int]]
+        """
+
+        key_hash = _hash_key(key)
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._hash_at(mid) < key_hash:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        statements = []
+        for i in range(lo, self.size):
+            entry_hash, statement = _ENTRY.unpack_from(
+                self._buffer, self._entries_offset + i * _ENTRY.size
+            )
+            if entry_hash != key_hash:
+                break
+            statements.append(statement)
+
+        ranges: List[Tuple[int, int]] = []
+        for statement in sorted(statements):
+            start, end = self.starts[statement], self.ends[statement]
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+        return ranges
+
+
+def _read_column_index(
+    file_path: PathObject, encoding: str, columns: Sequence[str]
+) -> Optional[_ColumnIndex]:
+    """
+    Open the index of some columns of a dump file.
+
+    :param file_path: The path to the dump file
+    :type file_path: PathObject
+    :param encoding: Text encoding the dump file is read with
+    :type encoding: str
+    :param columns: Names of the key columns
+    :type columns: Sequence[str]
+    :return: The index, or None if there is no index file or it was
+        built for another version of the dump file
+    :rtype: Optional[_ColumnIndex]
+    """
+
+    index_path = _column_index_path(file_path, columns)
+    try:
+        with open(index_path, "rb") as infile:
+            (header_size,) = _HEADER_SIZE.unpack(infile.read(_HEADER_SIZE.size))
+            metadata = json.loads(infile.read(header_size))
+    except (OSError, ValueError, struct.error):
+        return None
+    if metadata.get("source") != _source_stamp(file_path, encoding, _INDEX_VERSION):
+        return None
+    return _ColumnIndex(index_path, metadata, _HEADER_SIZE.size + header_size)
@@ -3,9 +3,25 @@ Parser functions used in src/dump.py
 """
 
 import csv
+import keyword
 import re
 import warnings
-from typing import Any, Dict, Iterator, List, Optional
+from collections import namedtuple
+from functools import lru_cache
+from itertools import chain, compress, cycle
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 
 def _has_sql_attribute(line: str, attr_type: str) -> bool:
@@ -82,6 +98,52 @@ def _get_sql_attribute(line: str, attr_type: str) -> Any:
     return attr
 
 
+_DATABASE = re.compile(r"^--.*?Database: (.*?)\s*$", re.MULTILINE)
+_CREATE_TABLE = re.compile(
+    r"^\s*CREATE TABLE `(\S*)` \((.*?)^\)", re.MULTILINE | re.DOTALL
+)
+_COLUMN = re.compile(r"^\s*`(\S*)` (.*?),?\s*$", re.MULTILINE)
+_PRIMARY_KEY = re.compile(r"^\s*PRIMARY KEY \(([^)]*)\)", re.MULTILINE)
+
+
+def _parse_header(header: str) -> Dict[str, Any]:
+    """
+    Extract the table metadata from the header of a SQL dump file, i.e.
+    everything before the first INSERT INTO statement, in one pass over
+    the CREATE TABLE statement.
+
+    :param header: The header of a SQL dump file
+    :type header: str
+    :return: A mapping with the keys "database", "table_name",
+        "col_names", "sql_dtypes" and "primary_key". Values that are
+        missing from the header are None, or empty for "col_names"
+        and "sql_dtypes".
+    :rtype: Dict[str, Any]
+    """
+
+    database = _DATABASE.search(header)
+    create_table = _CREATE_TABLE.search(header)
+    table_name = None
+    sql_dtypes = {}
+    primary_key = None
+
+    if create_table is not None:
+        table_name, definitions = create_table.groups()
+        for col_name, dtype in _COLUMN.findall(definitions):
+            sql_dtypes[col_name] = dtype
+        key = _PRIMARY_KEY.search(definitions)
+        if key is not None:
+            primary_key = key.group(1).replace("`", "").split(",")
+
+    return {
+        "database": database.group(1) if database else None,
+        "table_name": table_name,
+        "col_names": list(sql_dtypes),
+        "sql_dtypes": sql_dtypes,
+        "primary_key": primary_key,
+    }
+
+
 def _map_dtypes(sql_dtypes: Dict[str, str]) -> Dict[str, type]:
     """
     Create mapping from SQL data types to Python data types.
@@ -148,8 +210,8 @@ def _convert(values: List[str], dtypes: List[type], strict: bool = False) -> Lis
             conv = dtype(val)
             converted.append(conv)
 
-        except ValueError as e:
-            if values[i] == "":
+        except (TypeError, ValueError) as e:
+            if not val:
                 # why not convert to None?
                 converted.append(val)
             elif not strict:
@@ -167,6 +229,416 @@ def _convert(values: List[str], dtypes: List[type], strict: bool = False) -> Lis
     return converted
 
 
+def _convert_rows(
+    rows: List[List[str]], dtypes: List[type], strict: bool = False
+) -> List[List[Any]]:
+    """
+    Cast numerical values in a list of rows to float or int as specified
+    by the dtypes parameter. Same as calling :func:`_convert` on each row,
+    but the rows are converted column by column, which avoids dispatching
+    on the dtype for each value. NULL values parsed as None are kept.
+
+    :param rows: A list of rows, each a list of strings,
+        e.g. [['28207', 'April'], ['28208', 'May']]
+    :type rows: List[List[str]]
+    :param dtypes: A list of Python data types. E.g. [int, str]
+    :type dtypes: List[type]
+    :param strict: When set to False, if any of the values cannot be
+        converted, it is returned unchanged, i.e. as a str.
+    :type strict: bool, optional
+    :raises ValueError: If a row is not the same length as `dtypes`,
+        or if `strict` is set to True and some of the values
+        couldn't be converted.
+    :return: A list of rows where the numerical values have been cast
+        as int or float as defined by `dtypes`. E.g. the example rows from
+        above are returned as [[28207, 'April'], [28208, 'May']]
+    :rtype: List[List[Any]]
+    """
+
+    len_dtypes = len(dtypes)
+    if not rows or any(len(row) != len_dtypes for row in rows):
+        return [_convert(row, dtypes, strict=strict) for row in rows]
+
+    if str not in dtypes:
+        # Convert all values in one pass and slice the result back into
+        # rows. type.__call__(dtype, val) is the same as dtype(val).
+        try:
+            values = list(map(type.__call__, cycle(dtypes), chain.from_iterable(rows)))
+            return [
+                values[i : i + len_dtypes] for i in range(0, len(values), len_dtypes)
+            ]
+        except (TypeError, ValueError):
+            pass  # Fall back to converting the values column by column
+
+    warn = False
+    columns: List[Any] = list(zip(*rows))
+    for i, dtype in enumerate(dtypes):
+        if dtype is str:
+            continue
+        try:
+            columns[i] = list(map(dtype, columns[i]))
+            continue
+        except (TypeError, ValueError):
+            pass  # Fall back to converting the values one by one
+
+        converted = []
+        for val in columns[i]:
+            try:
+                converted.append(dtype(val))
+            except (TypeError, ValueError):
+                if not val:
+                    converted.append(val)
+                elif not strict:
+                    warn = True
+                    converted.append(val)
+                else:
+                    raise
+        columns[i] = converted
+
+    if warn:
+        warnings.warn(
+            "some values could not be converted to Python dtypes", UserWarning
+        )
+
+    return list(map(list, zip(*columns)))
+
+
+# Signature of the functions returned by _compile_converter
+RowsConverter = Callable[[List[List[str]]], List[List[Any]]]
+
+# Pairs of a column index and a function that takes the unconverted
+# value of the column and returns whether to keep the row
+RowFilters = Sequence[Tuple[int, Callable[[Any], bool]]]
+
+
+class _Interned(dict):
+    """
+    A table of the distinct values of a column, which maps each value to
+    the first occurrence of it, so that equal values share one object.
+    """
+
+    def __missing__(self, value: Any) -> Any:
+        self[value] = value
+        return value
+
+
+class _Dictionary(dict):
+    """
+    A table of the distinct values of a column, which maps each value to
+    a small integer code, assigned in order of first occurrence.
+    :attr:`by_code` holds the value of each code.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.by_code: List[Any] = []
+
+    def __missing__(self, value: Any) -> int:
+        code = self[value] = len(self.by_code)
+        self.by_code.append(value)
+        return code
+
+
+# Tables of distinct values used by _compile_converter, by column index
+Lookups = Dict[int, Dict[Any, Any]]
+
+
+def _lookup_rows(rows: List[List[Any]], lookups: Lookups) -> List[List[Any]]:
+    """
+    Replace the values of some columns by their entries in the tables of
+    distinct values of the columns, see :class:`_Interned` and
+    :class:`_Dictionary`. Rows that are too short to have a column are
+    left unchanged.
+
+    :param rows: A list of rows, which are modified in place
+    :type rows: List[List[Any]]
+    :param lookups: The table of each column, by column index
+    :type lookups: Dict[int, Dict[Any, Any]]
+    :return: The rows
+    :rtype: List[List[Any]]
+    """
+
+    for row in rows:
+        for i, table in lookups.items():
+            if i < len(row):
+                row[i] = table[row[i]]
+    return rows
+
+
+def _compile_converter(
+    dtypes: List[type],
+    strict: bool = False,
+    row_type: type = list,
+    lookups: Optional[Lookups] = None,
+) -> RowsConverter:
+    """
+    Generate a function that converts a list of rows to `dtypes`, with
+    one conversion call per value and no dispatching on the dtype at
+    runtime. E.g. for [int, str, int], the generated function returns
+    [[t0(v0), v1, t2(v2)] for v0, v1, v2 in rows], where t0 and t2 are
+    int. Values of str columns are passed through unchanged.
+
+    The converted rows are built as `row_type` directly, e.g. as
+    (t0(v0), v1, t2(v2)) for tuples, so that no intermediate list is
+    allocated per row.
+
+    The values of the columns in `lookups` are replaced by their entries
+    in the tables of distinct values of the columns, e.g. for
+    {1: _Dictionary()}, [[t0(v0), d1[v1], t2(v2)] for v0, v1, v2 in rows],
+    where d1 is the dictionary.
+
+    If a value cannot be converted, or a row is not the same length as
+    `dtypes`, the rows are converted by :func:`_convert_rows` instead,
+    which gives the same result as :func:`_convert`.
+
+    :param dtypes: A list of Python data types. E.g. [int, str, float]
+    :type dtypes: List[type]
+    :param strict: Whether the conversion is strict, see :func:`_convert`.
+        Defaults to False.
+    :type strict: bool, optional
+    :param row_type: The type of the converted rows: list, tuple or a
+        subclass of tuple, see :func:`_record_class`. Defaults to list.
+    :type row_type: type, optional
+    :param lookups: The tables of distinct values of some columns, by
+        column index, see :class:`_Interned` and :class:`_Dictionary`.
+        Defaults to None.
+    :type lookups: Optional[Dict[int, Dict[Any, Any]]], optional
+    :return: A function that takes a list of rows, each a list of strings,
+        and returns the converted rows
+    :rtype: Callable[[List[List[str]]], List[List[Any]]]
+    """
+
+    namespace: Dict[str, Any] = {
+        "_convert_rows": _convert_rows,
+        "dtypes": list(dtypes),
+        "strict": strict,
+        "new": tuple.__new__,
+        "row_type": row_type,
+        "_lookup_rows": _lookup_rows,
+        "lookups": lookups,
+    }
+    targets = []
+    values = []
+    for i, dtype in enumerate(dtypes):
+        targets.append(f"v{i}")
+        if dtype is str:
+            value = f"v{i}"
+        else:
+            namespace[f"t{i}"] = dtype
+            value = f"t{i}(v{i})"
+        if lookups and i in lookups:
+            namespace[f"d{i}"] = lookups[i]
+            value = f"d{i}[{value}]"
+        values.append(value)
+
+    if not dtypes or (values == targets and not strict):
+        # Nothing to convert, and rows of the wrong length are
+        # returned unchanged in non-strict mode
+        if row_type is list:
+            source = "def convert_rows(rows):\n    return rows\n"
+        else:
+            source = (
+                "def convert_rows(rows):\n"
+                "    return [new(row_type, row) for row in rows]\n"
+            )
+    else:
+        row = ", ".join(values)
+        unpack = ", ".join(targets)
+        if row_type is list:
+            build, fallback = f"[{row}]", "rows"
+        else:
+            build = f"({row},)"
+            if row_type is not tuple:
+                build = f"new(row_type, {build})"
+            fallback = "[new(row_type, row) for row in rows]"
+        source = (
+            "def convert_rows(rows):\n"
+            "    try:\n"
+            f"        return [{build} for {unpack}, in rows]\n"
+            "    except (TypeError, ValueError):\n"
+            "        rows = _convert_rows(rows, dtypes, strict)\n"
+            + ("        rows = _lookup_rows(rows, lookups)\n" if lookups else "")
+            + f"        return {fallback}\n"
+        )
+
+    exec(source, namespace)
+    return namespace["convert_rows"]
+
+
+@lru_cache(maxsize=None)
+def _record_class(table: str, col_names: Tuple[str, ...]) -> Any:
+    """
+    Get the named tuple class whose instances hold the rows of a table,
+    e.g. ChangeTagDef(ctd_id=1, ctd_name='mw-replace', ...). Named tuples
+    take no more memory than plain tuples, because their values are
+    stored like those of a tuple and they have no instance __dict__
+    (__slots__ is empty). Column names that are not valid identifiers
+    are replaced by their position, e.g. _1.
+
+    The classes are cached, so that the rows of a table share one class
+    in each process, and their instances can be pickled even though the
+    classes are generated at runtime, see :func:`_record`.
+
+    :param table: The name of the table, e.g. "change_tag_def"
+    :type table: str
+    :param col_names: The names of the columns in the rows
+    :type col_names: Tuple[str, ...]
+    :return: A subclass of tuple with one field per column
+    :rtype: Type[Tuple[Any, ...]]
+    """
+
+    name = "".join(part.capitalize() for part in table.split("_"))
+    if not name.isidentifier() or keyword.iskeyword(name):
+        name = "Row"
+    cls = namedtuple(name, col_names, rename=True)  # type: ignore
+    key = (table, col_names)
+    cls.__reduce__ = lambda row: (_record, (key, tuple(row)))  # type: ignore
+    return cls
+
+
+def _record(key: Tuple[str, Tuple[str, ...]], values: Tuple[Any, ...]) -> Any:
+    """
+    Rebuild a row of the named tuple class of a table when unpickling it.
+
+    :param key: The name of the table and the names of its columns
+    :type key: Tuple[str, Tuple[str, ...]]
+    :param values: The values of the row
+    :type values: Tuple[Any, ...]
+    :return: The row
+    :rtype: Tuple[Any, ...]
+    """
+
+    return tuple.__new__(_record_class(*key), values)
+
+
+def _compile_filter(
+    dtype: type, condition: Any, binary: bool = False, encoding: str = "utf-8"
+) -> Callable[[Any], bool]:
+    """
+    Generate a function that tests the unconverted value of a column,
+    as parsed from the dump file, against a condition.
+
+    A value, or a list, tuple or set of values, is compared with the
+    values of int and str columns as they are written in the dump file,
+    so that no value needs to be converted. The values of float columns
+    are converted before being compared. A callable is called with the
+    value converted to `dtype`. Values of int and float columns that
+    cannot be converted, e.g. NULL, never meet a callable condition.
+    None matches NULL, which is parsed as an empty value, so in str
+    columns it also matches empty strings.
+
+    :param dtype: The Python data type of the column: int, float or str
+    :type dtype: type
+    :param condition: The value to keep, e.g. 0, a collection of values
+        to keep, e.g. {0, 14}, or a function that takes a value and
+        returns whether to keep it, e.g. lambda val: val > 100
+    :type condition: Any
+    :param binary: Whether the values are bytes instead of str,
+        defaults to False
+    :type binary: bool, optional
+    :param encoding: Text encoding of the values, used to encode the
+        condition when `binary` is True. Defaults to "utf-8".
+    :type encoding: str, optional
+    :return: A function that takes an unconverted value and returns
+        whether it meets the condition
+    :rtype: Callable[[Any], bool]
+    """
+
+    if callable(condition):
+        if dtype is str:
+            return lambda val: bool(condition(val))
+
+        def test(val: Any) -> bool:
+            try:
+                val = dtype(val)
+            except (TypeError, ValueError):
+                return False
+            return bool(condition(val))
+
+        return test
+
+    if isinstance(condition, (list, tuple, set, frozenset)):
+        targets = list(condition)
+    else:
+        targets = [condition]
+    null: Any = b"" if binary else ""
+    match_null = any(target is None for target in targets)
+    targets = [target for target in targets if target is not None]
+
+    if dtype is float:
+        numbers = {float(target) for target in targets}
+
+        def test_float(val: Any) -> bool:
+            try:
+                return float(val) in numbers
+            except (TypeError, ValueError):
+                return match_null and val == null
+
+        return test_float
+
+    tokens = {null} if match_null else set()
+    for target in targets:
+        if dtype is int and not isinstance(target, bytes):
+            try:
+                target = int(target)
+            except (TypeError, ValueError):
+                pass  # Compared as written, and never equal to a number
+        if binary and not isinstance(target, bytes):
+            target = str(target).encode(encoding)
+        elif not binary:
+            target = (
+                target.decode(encoding) if isinstance(target, bytes) else str(target)
+            )
+        tokens.add(target)
+    return tokens.__contains__
+
+
+def _compile_filters(
+    conditions: Iterable[Tuple[int, type, Any]],
+    binary: bool = False,
+    encoding: str = "utf-8",
+) -> List[Tuple[int, Callable[[Any], bool]]]:
+    """
+    Generate the functions that test the unconverted values of some
+    columns against conditions, see :func:`_compile_filter`.
+
+    :param conditions: Triples of a column index, the Python data type
+        of the column and the condition on its values
+    :type conditions: Iterable[Tuple[int, type, Any]]
+    :param binary: Whether the values are bytes instead of str,
+        defaults to False
+    :type binary: bool, optional
+    :param encoding: Text encoding of the values, defaults to "utf-8"
+    :type encoding: str, optional
+    :return: Pairs of a column index and a function that takes the value
+        of the column and returns whether to keep the row
+    :rtype: List[Tuple[int, Callable[[Any], bool]]]
+    """
+
+    return [
+        (i, _compile_filter(dtype, condition, binary, encoding))
+        for i, dtype, condition in conditions
+    ]
+
+
+def _filter_rows(rows: Iterable[List[Any]], filters: RowFilters) -> Iterator[List[Any]]:
+    """
+    Keep the rows whose values pass the filters.
+
+    :param rows: The rows, with unconverted values
+    :type rows: Iterable[List[Any]]
+    :param filters: Pairs of a column index and a function that takes the
+        value of the column and returns whether to keep the row
+    :type filters: Sequence[Tuple[int, Callable[[Any], bool]]]
+    :return: A generator that yields the rows that pass the filters
+    :rtype: Iterator[List[Any]]
+    """
+
+    for row in rows:
+        if all(test(row[i]) for i, test in filters):
+            yield row
+
+
 def _split_tuples(line: str) -> List[str]:
     """
     Split an INSERT INTO statement into a list of strings each
@@ -241,3 +713,837 @@ def _parse(
         strict=strict,
     )
     return reader
+
+
+# Escape sequences recognized inside MySQL string literals. Any other
+# escaped character stands for itself, except for \% and \_ which keep
+# their backslash.
+_MYSQL_ESCAPES = {
+    "0": "\x00",
+    "b": "\b",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+    "Z": "\x1a",
+    "%": "\\%",
+    "_": "\\_",
+}
+
+_MYSQL_BYTE_ESCAPES = {
+    key.encode(): val.encode() for key, val in _MYSQL_ESCAPES.items()
+}
+
+_ESCAPE_SEQUENCE = re.compile(r"\\(.)", re.DOTALL)
+_BYTE_ESCAPE_SEQUENCE = re.compile(rb"\\(.)", re.DOTALL)
+
+# Looking for a single byte by its value is much faster than looking
+# for a bytes object of length one
+_BACKSLASH = ord("\\")
+
+# A single SQL value followed by the character that terminates it
+_SQL_FIELD = re.compile(r"(?:NULL|'[^'\\]*(?:\\.[^'\\]*)*'|[^,'()]*)([,)])", re.DOTALL)
+_SQL_BYTE_FIELD = re.compile(_SQL_FIELD.pattern.encode(), re.DOTALL)
+
+# A single SQL value inside a record. NULL is matched outside of the
+# capturing group so that it can be told apart from the string 'NULL'.
+# The lookbehind assertions make quoted and unquoted values share one
+# group, which is what allows a whole record to be read with a single
+# regex match.
+_SQL_VALUE = r"(?:NULL|'?((?<=')[^'\\]*(?:\\.[^'\\]*)*(?=')|(?<!')[^,'()]*)'?)"
+
+# A single SQL value that is matched but not captured, for the values
+# of the columns that are left out of a projection
+_SQL_SKIPPED_VALUE = r"(?:NULL|'[^'\\]*(?:\\.[^'\\]*)*'|[^,'()]*)"
+
+# Stand-ins for quoted values and for the escape sequences \\ and \', which
+# let a statement be split on its quotes without matching each record,
+# and a separator that joins its quoted values while their escape
+# sequences are resolved. They are only used in statements that contain
+# none of these characters.
+_QUOTED_VALUE = "\x00"
+_ESCAPED_BACKSLASH = "\x01"
+_ESCAPED_QUOTE = "\x02"
+_VALUE_SEPARATOR = "\x03"
+
+# The escape sequences of a column with stand-ins, see _unescape_values
+_SPLIT_ESCAPES = {**_MYSQL_ESCAPES, _ESCAPED_BACKSLASH: "\\", _ESCAPED_QUOTE: "'"}
+_SPLIT_BYTE_ESCAPES = {
+    key.encode(): val.encode() for key, val in _SPLIT_ESCAPES.items()
+}
+
+
+def _unescape(value: str) -> str:
+    """
+    Resolve the escape sequences in a MySQL string literal.
+
+    :param value: The contents of a quoted string, e.g. "It\\'s"
+    :type value: str
+    :return: The unescaped string, e.g. "It's"
+    :rtype: str
+    """
+
+    return _ESCAPE_SEQUENCE.sub(
+        lambda match: _MYSQL_ESCAPES.get(match.group(1), match.group(1)), value
+    )
+
+
+def _unescape_bytes(value: bytes) -> bytes:
+    """
+    Resolve the escape sequences in an encoded MySQL string literal.
+
+    :param value: The contents of a quoted string, e.g. b"It\\'s"
+    :type value: bytes
+    :return: The unescaped string, e.g. b"It's"
+    :rtype: bytes
+    """
+
+    return _BYTE_ESCAPE_SEQUENCE.sub(
+        lambda match: _MYSQL_BYTE_ESCAPES.get(match.group(1), match.group(1)), value
+    )
+
+
+@lru_cache(maxsize=None)
+def _record_pattern(
+    n_fields: int, binary: bool = False, columns: Optional[Tuple[int, ...]] = None
+) -> Pattern[Any]:
+    """
+    Compile a regex that matches one record with `n_fields` values,
+    including the comma separating it from the next record.
+
+    :param n_fields: Number of values in each record
+    :type n_fields: int
+    :param binary: Whether to match bytes instead of str, defaults to False
+    :type binary: bool, optional
+    :param columns: Indices of the values to capture, in ascending order,
+        defaults to None for all values. The other values are matched
+        without being captured, so no objects are created for them.
+    :type columns: Optional[Tuple[int, ...]], optional
+    :return: A compiled regex with one group per captured value
+    :rtype: Pattern[Any]
+    """
+
+    if columns is None:
+        fields = [_SQL_VALUE] * n_fields
+    else:
+        fields = [_SQL_SKIPPED_VALUE] * n_fields
+        for i in columns:
+            fields[i] = _SQL_VALUE
+    values = ",".join(fields)
+    pattern = rf"\({values}\)(?:,|$)"
+    return re.compile(pattern.encode() if binary else pattern, re.DOTALL)
+
+
+def _count_fields(values: Union[str, bytes]) -> int:
+    """
+    Count the values in the first record of an INSERT INTO statement.
+
+    :param values: The part of an INSERT INTO statement that comes after
+        the VALUES keyword, e.g. "(1,'mw-replace',0,10200),(2,...)"
+    :type values: Union[str, bytes]
+    :raises ValueError: If the first record is malformed
+    :return: The number of values in the first record
+    :rtype: int
+    """
+
+    match_field: Any = _SQL_FIELD.match
+    if isinstance(values, bytes):
+        match_field = _SQL_BYTE_FIELD.match
+
+    n_fields = 0
+    pos = 1  # Skip `(`
+    while True:
+        match = match_field(values, pos)
+        if match is None:
+            raise ValueError(f"malformed record at position {pos}")
+        n_fields += 1
+        pos = match.end()
+        if match.group(1) in (")", b")"):
+            return n_fields
+
+
+def _select(row: List[Any], columns: Sequence[int]) -> List[Any]:
+    """
+    Select the values at some indices of a row.
+
+    :param row: The values of a record
+    :type row: List[Any]
+    :param columns: Indices of the values to select
+    :type columns: Sequence[int]
+    :raises ValueError: If the row has no value at one of the indices
+    :return: The selected values
+    :rtype: List[Any]
+    """
+
+    try:
+        return [row[i] for i in columns]
+    except IndexError:
+        raise ValueError(f"record has only {len(row)} values") from None
+
+
+def _record_matcher(
+    n_fields: int, binary: bool, columns: Optional[Sequence[int]]
+) -> Callable[..., Any]:
+    """
+    Get the match method of the regex that matches one record,
+    see :func:`_record_pattern`.
+
+    :param n_fields: Number of values in each record
+    :type n_fields: int
+    :param binary: Whether to match bytes instead of str
+    :type binary: bool
+    :param columns: Indices of the values to capture, or None for all
+    :type columns: Optional[Sequence[int]]
+    :raises ValueError: If the records have no value at one of the indices
+    :return: The match method of the compiled regex
+    :rtype: Callable[..., Optional[re.Match]]
+    """
+
+    if columns is None:
+        return _record_pattern(n_fields, binary).match
+    if columns and columns[-1] >= n_fields:
+        raise ValueError(f"record has only {n_fields} values")
+    return _record_pattern(n_fields, binary, tuple(columns)).match
+
+
+def _select_records(
+    records: List[Any],
+    sep: Any,
+    null_token: Any,
+    null: Any,
+    columns: Optional[Sequence[int]] = None,
+    filters: Optional[RowFilters] = None,
+) -> Iterator[List[Any]]:
+    """
+    Split records that contain no quoted values, keep the ones that pass
+    the filters and select the values at some indices of each. When all
+    records have the same number of values, they are split in one go and
+    the columns are sliced out whole, which is much faster than going
+    through the records one by one.
+
+    :param records: The records of an INSERT INTO statement, without
+        their parentheses, e.g. ["1,0,10", "2,0,-3"]
+    :type records: List[Union[str, bytes]]
+    :param sep: The value separator, "," or b","
+    :type sep: Union[str, bytes]
+    :param null_token: How SQL NULL is written, "NULL" or b"NULL"
+    :type null_token: Union[str, bytes]
+    :param null: The value that SQL NULL is replaced with
+    :type null: Any
+    :param columns: Indices of the values to select, in ascending order,
+        defaults to None for all values
+    :type columns: Optional[Sequence[int]], optional
+    :param filters: Pairs of an index and a function that takes the value
+        at that index and returns whether to keep the record, see
+        :func:`_compile_filters`. Defaults to None for no filtering.
+    :type filters: Optional[Sequence[Tuple[int, Callable[[Any], bool]]]],
+        optional
+    :raises ValueError: If a record has no value at one of the indices
+    :return: The selected values of each record that passes the filters
+    :rtype: Iterator[List[Union[str, bytes]]]
+    """
+
+    n_fields = records[0].count(sep) + 1
+    fields = sep.join(records).split(sep)
+    if len(fields) != n_fields * len(records):
+        return _select_records_one_by_one(
+            records, sep, null_token, null, columns, filters
+        )
+
+    def column(i: int) -> List[Any]:
+        values = fields[i::n_fields]
+        if null_token in values:
+            values = [null if val == null_token else val for val in values]
+        return values
+
+    return _zip_columns(column, n_fields, columns, filters)
+
+
+def _zip_columns(
+    column: Callable[[int], List[Any]],
+    n_fields: int,
+    columns: Optional[Sequence[int]] = None,
+    filters: Optional[RowFilters] = None,
+) -> Iterator[List[Any]]:
+    """
+    Build the rows of a statement from its columns, keeping the ones that
+    pass the filters. Only the columns that are yielded or filtered on
+    are built.
+
+    :param column: A function that takes the index of a column and
+        returns its values, in record order
+    :type column: Callable[[int], List[Any]]
+    :param n_fields: Number of values in each record
+    :type n_fields: int
+    :param columns: Indices of the values to select, in ascending order,
+        defaults to None for all values
+    :type columns: Optional[Sequence[int]], optional
+    :param filters: Pairs of an index and a function that takes the value
+        at that index and returns whether to keep the record.
+        Defaults to None for no filtering.
+    :type filters: Optional[Sequence[Tuple[int, Callable[[Any], bool]]]],
+        optional
+    :raises ValueError: If the records have no value at one of the indices
+    :return: The selected values of each record that passes the filters
+    :rtype: Iterator[List[Any]]
+    """
+
+    indices = [i for i, _ in filters or ()]
+    indices.extend(range(n_fields) if columns is None else columns)
+    if indices and max(indices) >= n_fields:
+        raise ValueError(f"record has only {n_fields} values")
+
+    selected = range(n_fields) if columns is None else columns
+    rows: Iterator[List[Any]] = map(list, zip(*[column(i) for i in selected]))
+    if filters:
+        masks = [map(test, column(i)) for i, test in filters]
+        rows = compress(rows, masks[0] if len(masks) == 1 else map(all, zip(*masks)))
+    return rows
+
+
+def _select_records_one_by_one(
+    records: List[Any],
+    sep: Any,
+    null_token: Any,
+    null: Any,
+    columns: Optional[Sequence[int]] = None,
+    filters: Optional[RowFilters] = None,
+) -> Iterator[List[Any]]:
+    """
+    Same as :func:`_select_records`, for records that may not all have
+    the same number of values.
+    """
+
+    for record in records:
+        row: List[Any] = record.split(sep)
+        if null_token in row:
+            row = [null if val == null_token else val for val in row]
+        if filters:
+            try:
+                if not all(test(row[i]) for i, test in filters):
+                    continue
+            except IndexError:
+                raise ValueError(f"record has only {len(row)} values") from None
+        yield row if columns is None else _select(row, columns)
+
+
+def _unescape_values(values: List[Any]) -> List[Any]:
+    """
+    Resolve the escape sequences in a column of quoted values whose
+    escaped backslashes and quotes were replaced with stand-ins, see
+    :func:`_split_records`. The values are joined to look for escape
+    sequences. When there are few, the values that contain them are
+    resolved one by one, and otherwise the whole column is resolved with
+    one replacement per escaped character.
+
+    :param values: The contents of the quoted strings
+    :type values: List[Union[str, bytes]]
+    :return: The unescaped strings
+    :rtype: List[Union[str, bytes]]
+    """
+
+    separator: Any = _VALUE_SEPARATOR
+    backslash: Any = "\\"
+    stand_ins: Any = (_ESCAPED_BACKSLASH, _ESCAPED_QUOTE)
+    split_escapes: Dict[Any, Any] = _SPLIT_ESCAPES
+    escape_sequence: Pattern[Any] = _ESCAPE_SEQUENCE
+    if isinstance(values[0], bytes):
+        separator, backslash = separator.encode(), backslash.encode()
+        stand_ins = tuple(stand_in.encode() for stand_in in stand_ins)
+        split_escapes = _SPLIT_BYTE_ESCAPES
+        escape_sequence = _BYTE_ESCAPE_SEQUENCE
+
+    joined = separator.join(values)
+    # A replacement scans the whole column, which takes about as long as
+    # resolving a few hundred escape sequences one by one
+    if joined.count(backslash) * 512 < len(joined):
+        values = list(values)
+        index, position = 0, 0
+        found = joined.find(backslash)
+        while found != -1:
+            index += joined.count(separator, position, found)
+            values[index] = escape_sequence.sub(
+                lambda match: split_escapes.get(match.group(1), match.group(1)),
+                values[index],
+            )
+            position = joined.find(separator, found)
+            if position == -1:
+                break
+            found = joined.find(backslash, position)
+        return values
+
+    # The stand-ins are resolved last, as a backslash that they put back
+    # could otherwise be read as the start of another escape sequence
+    chars = set(escape_sequence.findall(joined))
+    for char in sorted(chars, key=lambda char: char in stand_ins):
+        joined = joined.replace(backslash + char, split_escapes.get(char, char))
+    return joined.split(separator)
+
+
+def _split_records(
+    values: Any,
+    binary: bool,
+    columns: Optional[Sequence[int]] = None,
+    filters: Optional[RowFilters] = None,
+) -> Optional[Iterator[List[Any]]]:
+    """
+    Split the records of an INSERT INTO statement that contains quoted
+    values without matching them one by one. Escaped backslashes and
+    quotes are replaced with stand-ins, so that the statement can be
+    split on its quotes. The quoted values are then replaced with another
+    stand-in, which leaves a statement that can be split on its
+    delimiters, and the columns are sliced out whole.
+
+    :param values: The part of an INSERT INTO statement that comes after
+        the VALUES keyword, e.g. "(1,'mw-replace',0,10200),(2,...)"
+    :type values: Union[str, bytes]
+    :param binary: Whether `values` is bytes
+    :type binary: bool
+    :param columns: Indices of the values to yield, in ascending order,
+        defaults to None for all values
+    :type columns: Optional[Sequence[int]], optional
+    :param filters: Pairs of an index and a function that takes the value
+        at that index and returns whether to keep the record.
+        Defaults to None for no filtering.
+    :type filters: Optional[Sequence[Tuple[int, Callable[[Any], bool]]]],
+        optional
+    :raises ValueError: If the records have no value at one of the indices
+    :return: The selected values of each record that passes the filters,
+        or None if the statement contains NULL or one of the stand-ins, or
+        if its columns are not each either quoted or unquoted throughout.
+        It must then be matched record by record, see
+        :func:`_match_records`, which is also faster on the tables whose
+        columns are partly NULL.
+    :rtype: Optional[Iterator[List[Any]]]
+    """
+
+    stand_ins: Any = (
+        _QUOTED_VALUE,
+        _ESCAPED_BACKSLASH,
+        _ESCAPED_QUOTE,
+        _VALUE_SEPARATOR,
+    )
+    tokens: Any = ("'", "\\", ",", ")", "),(", "NULL")
+    if binary:
+        stand_ins = tuple(token.encode() for token in stand_ins)
+        tokens = tuple(token.encode() for token in tokens)
+    marker, escaped_backslash, escaped_quote, _ = stand_ins
+    quote, backslash, sep, close, record_sep, null_token = tokens
+
+    if null_token in values or any(stand_in in values for stand_in in stand_ins):
+        return None
+    escaped = backslash in values
+    if escaped:
+        escape_sequence = _BYTE_ESCAPE_SEQUENCE if binary else _ESCAPE_SEQUENCE
+        chars = set(escape_sequence.findall(values))
+        if backslash in chars:
+            values = values.replace(
+                backslash + backslash, backslash + escaped_backslash
+            )
+        if quote in chars:
+            values = values.replace(backslash + quote, backslash + escaped_quote)
+
+    parts = values.split(quote)
+    if len(parts) % 2 == 0:
+        return None
+    quoted = parts[1::2]
+    skeleton = marker.join(parts[::2])
+    n_records = skeleton.count(record_sep) + 1
+    n_fields = skeleton.count(sep, 0, skeleton.find(close)) + 1
+    fields = skeleton[1:-1].replace(record_sep, sep).split(sep)
+    if len(fields) != n_fields * n_records:
+        return None
+
+    # Columns whose values are all quoted take every n-th quoted value
+    quoted_columns = [i for i in range(n_fields) if fields[i] == marker]
+    n_quoted = len(quoted_columns)
+    if n_quoted * n_records != len(quoted) or any(
+        fields[i::n_fields].count(marker) != n_records for i in quoted_columns
+    ):
+        return None
+    offsets = {i: j for j, i in enumerate(quoted_columns)}
+
+    def column(i: int) -> List[Any]:
+        if i not in offsets:
+            return fields[i::n_fields]
+        values = quoted[offsets[i] :: n_quoted]
+        return _unescape_values(values) if escaped else values
+
+    return _zip_columns(column, n_fields, columns, filters)
+
+
+def _match_records(
+    values: Any,
+    binary: bool,
+    null: Any,
+    columns: Optional[Sequence[int]] = None,
+    filters: Optional[RowFilters] = None,
+) -> Iterator[List[Any]]:
+    """
+    Match the records of an INSERT INTO statement one by one, keep the
+    ones that pass the filters and yield the values at some indices of
+    each, with their escape sequences resolved. Only the values that are
+    yielded or filtered on are extracted.
+
+    :param values: The part of an INSERT INTO statement that comes after
+        the VALUES keyword, e.g. "(1,'mw-replace',0,10200),(2,...)"
+    :type values: Union[str, bytes]
+    :param binary: Whether `values` is bytes
+    :type binary: bool
+    :param null: The value that SQL NULL is replaced with
+    :type null: Any
+    :param columns: Indices of the values to yield, in ascending order,
+        defaults to None for all values
+    :type columns: Optional[Sequence[int]], optional
+    :param filters: Pairs of an index and a function that takes the value
+        at that index and returns whether to keep the record.
+        Defaults to None for no filtering.
+    :type filters: Optional[Sequence[Tuple[int, Callable[[Any], bool]]]],
+        optional
+    :raises ValueError: If a record is malformed, has a different number
+        of values than the first record, or has no value at one of
+        the indices
+    :return: A generator that yields the selected values of the records
+    :rtype: Iterator[List[Any]]
+    """
+
+    kind: Any = str
+    backslash: Any = "\\"
+    unescape: Callable[[Any], Any] = _unescape
+    if binary:
+        kind, backslash, unescape = bytes, _BACKSLASH, _unescape_bytes
+
+    n_fields = _count_fields(values)
+    captured = columns
+    positions = None
+    tests = []
+    if filters:
+        # Capture the filtered values too, and leave them out of the rows
+        selected = range(n_fields) if columns is None else columns
+        captured = sorted({*selected, *(i for i, _ in filters)})
+        if list(captured) != list(selected):
+            positions = [captured.index(i) for i in selected]
+        tests = [(captured.index(i) + 1, test) for i, test in filters]
+    match_record = _record_matcher(n_fields, binary, captured)
+
+    pos = 0
+    end = len(values)
+    while pos < end:
+        match = match_record(values, pos)
+        if match is None:
+            raise ValueError(f"malformed record at position {pos}")
+        pos = match.end()
+        keep = True
+        for group, test in tests:
+            val = match.group(group)
+            if val is None:
+                val = null
+            elif backslash in val:
+                val = unescape(val)
+            if not test(val):
+                keep = False
+                break
+        if not keep:
+            continue
+        row: List[Any] = list(match.groups(null))
+        if positions is not None:
+            row = [row[i] for i in positions]
+        if backslash in match.group(0):
+            row = [
+                unescape(val) if isinstance(val, kind) and backslash in val else val
+                for val in row
+            ]
+        yield row
+
+
+def _tokenize(
+    line: str,
+    null: Any = "",
+    columns: Optional[Sequence[int]] = None,
+    filters: Optional[RowFilters] = None,
+) -> Iterator[List[Any]]:
+    """
+    Parse an INSERT INTO statement in a single pass and return a generator
+    that yields each SQL table row as a list of strings.
+
+    Unlike :func:`_parse`, quoting is taken into account when splitting
+    the records, so string values that contain e.g. "),(" are preserved.
+    MySQL escape sequences are resolved and NULL values are replaced
+    by `null`.
+
+    :param line: An INSERT INTO statement, e.g. "INSERT INTO `change_tag_def`
+        VALUES (1,'mw-replace',0,10200),(2,'visualeditor',0,305860);"
+    :type line: str
+    :param null: The value that SQL NULL is replaced with, defaults to ""
+    :type null: Any, optional
+    :param columns: Indices of the values to yield, in ascending order,
+        defaults to None for all values. When parsing quoted values, the
+        other values are skipped over without being extracted.
+    :type columns: Optional[Sequence[int]], optional
+    :param filters: Pairs of an index and a function that takes the value
+        at that index, as it would be yielded, and returns whether to
+        yield the row, see :func:`_compile_filters`. Rows are filtered
+        before they are built. Defaults to None for no filtering.
+    :type filters: Optional[Sequence[Tuple[int, Callable[[Any], bool]]]],
+        optional
+    :raises ValueError: If a record is malformed, has a different number
+        of values than the first record, or has no value at one of
+        the `columns`
+    :return: A generator that yields the rows of the statement,
+        e.g. ["1", "mw-replace", "0", "10200"]
+    :rtype: Iterator[List[Any]]
+    """
+
+    values = line.partition(" VALUES ")[-1].rstrip()
+    # Remove `;` at the end of the last `INSERT INTO` statement
+    if values.endswith(";"):
+        values = values[:-1]
+    if not values:
+        return
+
+    if "'" not in values:
+        # Without string values, no delimiter can appear inside a value,
+        # so records and values can be split on their delimiters directly
+        records = values[1:-1].split("),(")
+        if columns is not None or filters:
+            yield from _select_records(records, ",", "NULL", null, columns, filters)
+            return
+        for record in records:
+            row: List[Any] = record.split(",")
+            if "NULL" in record:
+                row = [null if val == "NULL" else val for val in row]
+            yield row
+        return
+
+    rows = _split_records(values, False, columns, filters)
+    if rows is None:
+        rows = _match_records(values, False, null, columns, filters)
+    yield from rows
+
+
+def _tokenize_bytes(
+    line: bytes,
+    null: Any = b"",
+    columns: Optional[Sequence[int]] = None,
+    filters: Optional[RowFilters] = None,
+) -> Iterator[List[Any]]:
+    """
+    Same as :func:`_tokenize`, but for an encoded INSERT INTO statement.
+    The values are not decoded, which saves decoding the fields that are
+    numbers or are not needed as str.
+
+    :param line: An INSERT INTO statement, e.g. b"INSERT INTO `change_tag_def`
+        VALUES (1,'mw-replace',0,10200),(2,'visualeditor',0,305860);"
+    :type line: bytes
+    :param null: The value that SQL NULL is replaced with, defaults to b""
+    :type null: Any, optional
+    :param columns: Indices of the values to yield, in ascending order,
+        defaults to None for all values
+    :type columns: Optional[Sequence[int]], optional
+    :param filters: Pairs of an index and a function that takes the value
+        at that index and returns whether to yield the row.
+        Defaults to None for no filtering.
+    :type filters: Optional[Sequence[Tuple[int, Callable[[Any], bool]]]],
+        optional
+    :raises ValueError: If a record is malformed, has a different number
+        of values than the first record, or has no value at one of
+        the `columns`
+    :return: A generator that yields the rows of the statement,
+        e.g. [b"1", b"mw-replace", b"0", b"10200"]
+    :rtype: Iterator[List[Any]]
+    """
+
+    values = line.partition(b" VALUES ")[-1].rstrip()
+    # Remove `;` at the end of the last `INSERT INTO` statement
+    if values.endswith(b";"):
+        values = values[:-1]
+    if not values:
+        return
+
+    if b"'" not in values:
+        records = values[1:-1].split(b"),(")
+        if columns is not None or filters:
+            yield from _select_records(records, b",", b"NULL", null, columns, filters)
+            return
+        # Searching bytes is slower than searching str, so look for NULL
+        # once per statement and then by value, rather than in each record
+        has_null = b"NULL" in values
+        for record in records:
+            row: List[Any] = record.split(b",")
+            if has_null and b"NULL" in row:
+                row = [null if val == b"NULL" else val for val in row]
+            yield row
+        return
+
+    rows = _split_records(values, True, columns, filters)
+    if rows is None:
+        rows = _match_records(values, True, null, columns, filters)
+    yield from rows
+
+
+def _parse_byte_lines(
+    lines: Iterable[bytes],
+    converter: Optional[RowsConverter] = None,
+    null: Any = b"",
+    columns: Optional[Sequence[int]] = None,
+    filters: Optional[RowFilters] = None,
+) -> Iterator[List[Any]]:
+    """
+    Same as :func:`_parse_lines` with the "tokenizer" engine, but for
+    lines read in binary mode. The values are yielded as bytes, unless
+    `converter` converts them to numbers.
+
+    :param lines: Lines from a SQL dump file, read in binary mode
+    :type lines: Iterable[bytes]
+    :param converter: A function that converts the rows of each statement
+        to Python data types, see :func:`_compile_converter`. Defaults to
+        None, in which case the values are not converted.
+    :type converter: Optional[Callable[[List[List[str]]], List[List[Any]]]],
+        optional
+    :param null: The value that SQL NULL is replaced with, defaults to b""
+    :type null: Any, optional
+    :param columns: Indices of the values to yield, in ascending order,
+        defaults to None for all values
+    :type columns: Optional[Sequence[int]], optional
+    :param filters: Pairs of a column index and a function that takes the
+        unconverted value of the column and returns whether to yield the
+        row, see :func:`_compile_filters`. Defaults to None.
+    :type filters: Optional[Sequence[Tuple[int, Callable[[Any], bool]]]],
+        optional
+    :return: A generator that yields the SQL table rows
+    :rtype: Iterator[List[Any]]
+    """
+
+    for line in lines:
+        if line.startswith(b"INSERT INTO"):
+            rows = _tokenize_bytes(line, null, columns, filters)
+            if converter is not None:
+                yield from converter(list(rows))
+            else:
+                yield from rows
+
+
+def _parse_buffer(
+    buffer: Any,
+    converter: Optional[RowsConverter] = None,
+    encoding: Optional[str] = None,
+    null: Any = "",
+    start: int = 0,
+    end: Optional[int] = None,
+    columns: Optional[Sequence[int]] = None,
+    filters: Optional[RowFilters] = None,
+) -> Iterator[List[Any]]:
+    """
+    Parse the INSERT INTO statements that start within a range of a
+    buffer holding a whole SQL dump file, e.g. a memory-mapped file, and
+    return a generator that yields the SQL table rows. Statements are
+    located by searching the buffer, so the lines in between are never
+    read, and each statement is copied out of the buffer only once.
+
+    :param buffer: The contents of a SQL dump file, as bytes or mmap.mmap
+    :type buffer: Union[bytes, mmap.mmap]
+    :param converter: A function that converts the rows of each statement
+        to Python data types, see :func:`_compile_converter`. Defaults to
+        None, in which case the values are not converted.
+    :type converter: Optional[Callable[[List[List[str]]], List[List[Any]]]],
+        optional
+    :param encoding: Text encoding to decode the statements with, or None
+        to yield the values as bytes, see :func:`_tokenize_bytes`.
+        Defaults to None.
+    :type encoding: Optional[str], optional
+    :param null: The value that SQL NULL is replaced with, defaults to ""
+    :type null: Any, optional
+    :param start: Offset at which to start searching, defaults to 0
+    :type start: int, optional
+    :param end: Offset at which to stop searching, defaults to None for
+        the end of the buffer. A statement that starts before `end`
+        is parsed to its end.
+    :type end: Optional[int], optional
+    :param columns: Indices of the values to yield, in ascending order,
+        defaults to None for all values
+    :type columns: Optional[Sequence[int]], optional
+    :param filters: Pairs of a column index and a function that takes the
+        unconverted value of the column and returns whether to yield the
+        row, see :func:`_compile_filters`. Defaults to None.
+    :type filters: Optional[Sequence[Tuple[int, Callable[[Any], bool]]]],
+        optional
+    :return: A generator that yields the SQL table rows
+    :rtype: Iterator[List[Any]]
+    """
+
+    if end is None:
+        end = len(buffer)
+    pos = start
+    while True:
+        pos = buffer.find(b"INSERT INTO", pos)
+        if pos == -1 or pos >= end:
+            return
+        line_end = buffer.find(b"\n", pos)
+        if line_end == -1:
+            line_end = len(buffer)
+        if pos == 0 or buffer[pos - 1 : pos] == b"\n":
+            statement = buffer[pos:line_end]
+            if encoding is None:
+                rows = _tokenize_bytes(statement, null, columns, filters)
+            else:
+                rows = _tokenize(statement.decode(encoding), null, columns, filters)
+            if converter is not None:
+                yield from converter(list(rows))
+            else:
+                yield from rows
+        pos = line_end
+
+
+def _parse_lines(
+    lines: Iterable[str],
+    converter: Optional[RowsConverter] = None,
+    engine: str = "tokenizer",
+    null: Any = "",
+    columns: Optional[Sequence[int]] = None,
+    filters: Optional[RowFilters] = None,
+    **fmtparams: Any,
+) -> Iterator[List[Any]]:
+    """
+    Parse the INSERT INTO statements among a sequence of lines and
+    return a generator that yields the SQL table rows. All other
+    lines are skipped.
+
+    :param lines: Lines from a SQL dump file
+    :type lines: Iterable[str]
+    :param converter: A function that converts the rows of each statement
+        to Python data types, see :func:`_compile_converter`. Defaults to
+        None, in which case the values are not converted.
+    :type converter: Optional[Callable[[List[List[str]]], List[List[Any]]]],
+        optional
+    :param engine: "tokenizer" to parse with :func:`_tokenize` or "csv" to
+        parse with :func:`_parse`, defaults to "tokenizer"
+    :type engine: str, optional
+    :param null: The value that SQL NULL is replaced with by the "tokenizer"
+        engine, defaults to ""
+    :type null: Any, optional
+    :param columns: Indices of the values to yield, in ascending order,
+        defaults to None for all values
+    :type columns: Optional[Sequence[int]], optional
+    :param filters: Pairs of a column index and a function that takes the
+        unconverted value of the column and returns whether to yield the
+        row, see :func:`_compile_filters`. Defaults to None.
+    :type filters: Optional[Sequence[Tuple[int, Callable[[Any], bool]]]],
+        optional
+    :param fmtparams: Any kwargs to pass to :func:`_parse`
+    :return: A generator that yields the SQL table rows
+    :rtype: Iterator[List[Any]]
+    """
+
+    for line in lines:
+        if _has_sql_attribute(line, "insert"):
+            if engine == "csv":
+                rows: Iterator[List[Any]] = _parse(line, **fmtparams)
+                if filters:
+                    rows = _filter_rows(rows, filters)
+                if columns is not None:
+                    rows = (_select(row, columns) for row in rows)
+            else:
+                rows = _tokenize(line, null, columns, filters)
+            if converter is not None:
+                yield from converter(list(rows))
+            else:
+                yield from rows
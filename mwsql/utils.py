@@ -3,41 +3,1057 @@ Utility functions used to download, open and display
 the contents of Wikimedia SQL dump files.
 """
 
+import bz2
 import gzip
-from contextlib import contextmanager
+import hashlib
+import importlib
+import io
+import json
+import lzma
+import mmap
+import os
+import queue
+import re
+import threading
+import uuid
+import warnings
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Iterator, Optional, TextIO, Union
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Deque,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
 
 import requests  # type: ignore
 from tqdm import tqdm  # type: ignore
 
+try:
+    import indexed_gzip  # type: ignore
+except ImportError:
+    indexed_gzip = None
+
+try:
+    import zstandard  # type: ignore
+except ImportError:
+    zstandard = None  # type: ignore
+
 # Custom type
 PathObject = Union[str, Path]
 
+# Default distance between two inflate checkpoints of a gzip index,
+# in bytes of uncompressed data
+GZIP_INDEX_SPACING = 8 * 1024 * 1024
+
+# Maximum number of bytes read from the start of a dump file to find
+# the table metadata, which takes up a few KiB in Wikimedia dumps
+HEADER_SIZE = 1024 * 1024
+
+# Bump when the format of schema files changes, so that old ones are ignored
+_SCHEMA_VERSION = 1
+
+# Default size of the buffer of files that are written to, in bytes
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Size of the chunks of data that are gzip compressed independently
+_GZIP_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Default size of the segments of a file that are downloaded in parallel,
+# which is also the most that is downloaded again when resuming
+DOWNLOAD_SEGMENT_SIZE = 64 * 1024 * 1024
+
+# Size of the blocks in which downloads are written, in bytes
+_DOWNLOAD_BLOCK_SIZE = 1024 * 1024
+
+# Connect and read timeouts of download requests, in seconds
+_DOWNLOAD_TIMEOUT = (30, 60)
+
+# Number of times a dropped connection is resumed before giving up
+_DOWNLOAD_RETRIES = 3
+
+# Bump when the format of download state files changes
+_DOWNLOAD_VERSION = 1
+
+# Number of bytes at the start of a file that identify its compression format
+_MAGIC_SIZE = 8
+
+# Number of gzip files that each process keeps open through their index
+_INDEXED_GZIP_CACHE_SIZE = 8
+
+# Held while a cached indexed gzip file is read from, as its position is
+# shared by all readers of the file in the process
+_INDEXED_GZIP_LOCK = threading.Lock()
+
+# Size of the blocks in which compressed files are decompressed, in bytes
+_READ_BLOCK_SIZE = 1024 * 1024
+
+# Number of decompressed blocks that a decompression thread reads ahead
+_READ_AHEAD_BLOCKS = 4
+
+# Output compression formats, by file extension
+_COMPRESSIONS = {".gz": "gzip", ".zst": "zstd"}
+
+
+def register_codec(
+    name: str, magic: bytes, opener: Callable[[BinaryIO], BinaryIO]
+) -> None:
+    """
+    Register a decompressor for dump files, or replace the one of a
+    format. Compressed dump files are recognized by the magic bytes at
+    the start of their content rather than by their extension. gzip,
+    bzip2, xz and zstd (which requires the optional zstandard package)
+    are registered by default.
+
+    :param name: Name of the compression format, e.g. "gzip"
+    :type name: str
+    :param magic: The bytes that compressed files start with, e.g.
+        b"\\x1f\\x8b", at most 8 bytes long
+    :type magic: bytes
+    :param opener: A function that takes a compressed file opened in
+        binary mode and returns a file object that reads the decompressed
+        data from it. The returned object is closed before the
+        compressed file.
+    :type opener: Callable[[BinaryIO], BinaryIO]
+    :raises ValueError: If `magic` is empty or longer than 8 bytes
+    """
+
+    if not 0 < len(magic) <= _MAGIC_SIZE:
+        raise ValueError(f"magic must be 1 to {_MAGIC_SIZE} bytes long")
+    _CODECS[name] = (magic, opener)
+
+
+@lru_cache(maxsize=None)
+def _gzip_module() -> Any:
+    """
+    Get the fastest module for decompressing gzip files that is installed:
+    isal.igzip, zlib_ng.gzip_ng or gzip. They have the same interface.
+
+    :return: The module
+    :rtype: module
+    """
+
+    for name in ("isal.igzip", "zlib_ng.gzip_ng"):
+        try:
+            return importlib.import_module(name)
+        except ImportError:
+            continue
+    return gzip
+
+
+def _open_gzip(infile: BinaryIO) -> BinaryIO:
+    """
+    Decompress a gzip file, with the fastest module that is installed.
+
+    :param infile: The compressed file
+    :type infile: BinaryIO
+    :return: The decompressed file
+    :rtype: BinaryIO
+    """
+
+    decompressed: BinaryIO = _gzip_module().open(infile, mode="rb")
+    return decompressed
+
+
+def _open_bz2(infile: BinaryIO) -> BinaryIO:
+    """
+    Decompress a bzip2 file.
+
+    :param infile: The compressed file
+    :type infile: BinaryIO
+    :return: The decompressed file
+    :rtype: BinaryIO
+    """
+
+    return bz2.open(infile, mode="rb")  # type: ignore
+
+
+def _open_xz(infile: BinaryIO) -> BinaryIO:
+    """
+    Decompress an xz file.
+
+    :param infile: The compressed file
+    :type infile: BinaryIO
+    :return: The decompressed file
+    :rtype: BinaryIO
+    """
+
+    return lzma.open(infile, mode="rb")  # type: ignore
+
+
+def _open_zstd(infile: BinaryIO) -> BinaryIO:
+    """
+    Decompress a zstd file, which may consist of several frames.
+
+    :param infile: The compressed file
+    :type infile: BinaryIO
+    :raises ImportError: If zstandard is not installed
+    :return: The decompressed file
+    :rtype: BinaryIO
+    """
+
+    if zstandard is None:
+        raise ImportError(
+            "zstd compressed files require zstandard, "
+            "install it with `pip install mwsql[zstd]`"
+        )
+    reader = zstandard.ZstdDecompressor().stream_reader(
+        infile, read_across_frames=True, closefd=False
+    )
+    return io.BufferedReader(reader, _READ_BLOCK_SIZE)  # type: ignore
+
+
+# Decompressors by compression format, see register_codec
+_CODECS: Dict[str, Tuple[bytes, Callable[[BinaryIO], BinaryIO]]] = {}
+register_codec("gzip", b"\x1f\x8b", _open_gzip)
+register_codec("bz2", b"BZh", _open_bz2)
+register_codec("xz", b"\xfd7zXZ\x00", _open_xz)
+register_codec("zstd", b"\x28\xb5\x2f\xfd", _open_zstd)
+
+
+def _detect_codec(magic: bytes) -> Optional[str]:
+    """
+    Find the compression format of a file from its first bytes.
+
+    :param magic: The first _MAGIC_SIZE bytes of the file, or fewer if
+        it is shorter
+    :type magic: bytes
+    :return: The name of the format, or None if the file is not compressed
+    :rtype: Optional[str]
+    """
+
+    for name, (prefix, _) in _CODECS.items():
+        if magic.startswith(prefix):
+            return name
+    return None
+
+
+def _compression(file_path: PathObject) -> Optional[str]:
+    """
+    Find the compression format of a file from its first bytes.
+
+    :param file_path: The path to the file
+    :type file_path: PathObject
+    :return: The name of the format, e.g. "gzip", or None if the file
+        is not compressed
+    :rtype: Optional[str]
+    """
+
+    with open(file_path, "rb") as infile:
+        return _detect_codec(infile.read(_MAGIC_SIZE))
+
+
+def _read_ahead(items: Iterator[Any], n_items: int) -> Generator[Any, None, None]:
+    """
+    Iterate over `items` in a background thread, which stays up to
+    `n_items` items ahead of the consumer. Exceptions raised by `items`
+    are raised by the returned generator. When the generator is closed
+    early, the thread stops at its next item and closes `items`.
+
+    :param items: The items to iterate over. If `items` is a generator,
+        only the background thread advances it.
+    :type items: Iterator[Any]
+    :param n_items: Maximum number of items read ahead
+    :type n_items: int
+    :yield: The items
+    :rtype: Generator[Any, None, None]
+    """
+
+    buffered: "queue.Queue[Tuple[bool, Any]]" = queue.Queue(n_items)
+    stopped = threading.Event()
+
+    def put(item: Tuple[bool, Any]) -> bool:
+        while not stopped.is_set():
+            try:
+                buffered.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put((True, item)):
+                    return
+        except Exception as exc:
+            put((False, exc))
+        else:
+            put((False, None))
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            more, item = buffered.get()
+            if not more:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
+
+
+class _ThreadedReader(io.RawIOBase):
+    """
+    Read a file in a background thread, which reads up to `n_blocks`
+    blocks ahead of the reader. Used to decompress a dump file while the
+    previous blocks are being parsed.
+    """
+
+    def __init__(
+        self,
+        infile: BinaryIO,
+        block_size: int = _READ_BLOCK_SIZE,
+        n_blocks: int = _READ_AHEAD_BLOCKS,
+    ) -> None:
+        """
+        _ThreadedReader class constructor.
+
+        :param infile: The file to read, which is not closed
+        :type infile: BinaryIO
+        :param block_size: Size of the blocks in bytes, defaults to
+            _READ_BLOCK_SIZE
+        :type block_size: int, optional
+        :param n_blocks: Maximum number of blocks read ahead, defaults to
+            _READ_AHEAD_BLOCKS
+        :type n_blocks: int, optional
+        """
+
+        blocks = iter(partial(infile.read, block_size), b"")
+        self._blocks = _read_ahead(blocks, n_blocks)
+        self._block = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        if not self._block:
+            self._block = memoryview(next(self._blocks, b""))
+        n_bytes = min(len(buffer), len(self._block))
+        buffer[:n_bytes] = self._block[:n_bytes]
+        self._block = self._block[n_bytes:]
+        return n_bytes
+
+    def close(self) -> None:
+        if not self.closed:
+            self._blocks.close()
+        super().close()
+
 
 @contextmanager
 def _open_file(
-    file_path: PathObject, encoding: Optional[str] = None
+    file_path: PathObject,
+    encoding: Optional[str] = None,
+    decompression_thread: bool = False,
 ) -> Iterator[TextIO]:
     """
-    Custom context manager for opening both .gz and uncompressed files.
+    Custom context manager for opening both compressed and uncompressed
+    files, see :func:`_open_binary`.
 
     :param file_path: The path to the file
     :type file_path: PathObject
     :param encoding: Text encoding, defaults to None
     :type encoding: Optional[str], optional
+    :param decompression_thread: Whether to decompress compressed files
+        in a background thread, defaults to False
+    :type decompression_thread: bool, optional
     :yield: A file handle
     :rtype: Iterator[TextIO]
     """
 
-    if str(file_path).endswith(".gz"):
-        infile = gzip.open(file_path, mode="rt", encoding=encoding)
+    if _compression(file_path) is None:
+        with open(file_path, mode="r", encoding=encoding) as infile:
+            yield infile
+        return
+
+    with _open_binary(file_path, decompression_thread) as binfile:
+        text = io.TextIOWrapper(binfile, encoding=encoding)  # type: ignore
+        try:
+            yield text
+        finally:
+            text.close()
+
+
+class _GzipWriter(io.RawIOBase):
+    """
+    A binary file that gzip compresses the data written to it in
+    background threads. The data is cut into chunks that are compressed
+    independently and written as consecutive gzip members, which gzip
+    readers decompress as a single stream. zlib releases the GIL while
+    compressing, so compression runs in parallel with the calling thread.
+    """
+
+    def __init__(
+        self,
+        outfile: BinaryIO,
+        level: int = 6,
+        threads: int = 1,
+        chunk_size: int = _GZIP_CHUNK_SIZE,
+    ) -> None:
+        """
+        _GzipWriter class constructor.
+
+        :param outfile: The file the compressed data is written to.
+            It is closed when the _GzipWriter is closed.
+        :type outfile: BinaryIO
+        :param level: Compression level from 0 to 9, defaults to 6
+        :type level: int, optional
+        :param threads: Number of compression threads, defaults to 1
+        :type threads: int, optional
+        :param chunk_size: Size of the chunks that are compressed
+            independently, defaults to _GZIP_CHUNK_SIZE
+        :type chunk_size: int, optional
+        """
+
+        super().__init__()
+        self._outfile = outfile
+        self._level = level
+        self._threads = threads
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+        self._executor = ThreadPoolExecutor(threads)
+        self._pending: Deque[Future] = deque()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self._buffer += data
+        if len(self._buffer) >= self._chunk_size:
+            self._submit()
+        return len(data)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            if self._buffer:
+                self._submit()
+            while self._pending:
+                self._outfile.write(self._pending.popleft().result())
+        finally:
+            self._executor.shutdown()
+            self._outfile.close()
+            super().close()
+
+    def _submit(self) -> None:
+        chunk, self._buffer = self._buffer, bytearray()
+        self._pending.append(self._executor.submit(gzip.compress, chunk, self._level))
+        # Write out finished chunks in order, holding at most two
+        # chunks per thread in memory
+        while len(self._pending) > 2 * self._threads:
+            self._outfile.write(self._pending.popleft().result())
+
+
+@contextmanager
+def _open_output(
+    file_path: PathObject,
+    compression: Optional[str] = "infer",
+    level: Optional[int] = None,
+    threads: int = 1,
+    buffer_size: int = WRITE_BUFFER_SIZE,
+    encoding: str = "utf-8",
+) -> Iterator[TextIO]:
+    """
+    Custom context manager for writing text files, optionally compressed
+    in background threads. Newlines are not translated, as required by
+    csv.writer().
+
+    :param file_path: The path to the file
+    :type file_path: PathObject
+    :param compression: "gzip", "zstd", None for no compression or "infer"
+        to choose from the file extension (.gz or .zst). Defaults to "infer".
+    :type compression: Optional[str], optional
+    :param level: Compression level, defaults to 6 for gzip and 3 for zstd
+    :type level: Optional[int], optional
+    :param threads: Number of compression threads, defaults to 1
+    :type threads: int, optional
+    :param buffer_size: Size of the write buffer in bytes,
+        defaults to WRITE_BUFFER_SIZE
+    :type buffer_size: int, optional
+    :param encoding: Text encoding, defaults to "utf-8"
+    :type encoding: str, optional
+    :raises ValueError: If `compression` is not supported
+    :raises ImportError: If `compression` is "zstd" and zstandard
+        is not installed
+    :yield: A file handle
+    :rtype: Iterator[TextIO]
+    """
+
+    if compression == "infer":
+        compression = _COMPRESSIONS.get(Path(file_path).suffix)
+    if compression not in (None, "gzip", "zstd"):
+        raise ValueError(f"unsupported compression: {compression}")
+    if compression == "zstd" and zstandard is None:
+        raise ImportError(
+            "zstd compression requires zstandard, "
+            "install it with `pip install mwsql[zstd]`"
+        )
+
+    outfile: TextIO
+    if compression is None:
+        outfile = open(
+            file_path, mode="w", buffering=buffer_size, encoding=encoding, newline=""
+        )
     else:
-        infile = open(file_path, mode="r", encoding=encoding)
+        raw: Any = open(file_path, mode="wb")
+        if compression == "gzip":
+            raw = _GzipWriter(raw, 6 if level is None else level, threads)
+        else:
+            compressor = zstandard.ZstdCompressor(
+                level=3 if level is None else level, threads=threads
+            )
+            raw = compressor.stream_writer(raw)
+        outfile = io.TextIOWrapper(
+            io.BufferedWriter(raw, buffer_size), encoding=encoding, newline=""
+        )
     try:
-        yield infile
+        yield outfile
     finally:
-        infile.close()
+        outfile.close()
+
+
+def _read_header(file_path: PathObject, max_size: int = HEADER_SIZE) -> bytes:
+    """
+    Read the start of a dump file up to the first INSERT INTO statement,
+    which contains the CREATE TABLE statement. Reading stops after
+    `max_size` bytes even if no INSERT INTO statement was found, so files
+    without one are not read to the end.
+
+    :param file_path: The path to the file
+    :type file_path: PathObject
+    :param max_size: Maximum number of bytes to read,
+        defaults to HEADER_SIZE
+    :type max_size: int, optional
+    :return: The header, ending with a complete line
+    :rtype: bytes
+    """
+
+    with _open_binary(file_path) as infile:
+        return _read_header_from(infile, max_size)
+
+
+def _read_header_from(infile: BinaryIO, max_size: int = HEADER_SIZE) -> bytes:
+    """
+    Read the start of a dump file from a file handle, as in
+    :func:`_read_header`.
+
+    :param infile: A binary file handle at the start of the dump
+    :type infile: BinaryIO
+    :param max_size: Maximum number of bytes to read,
+        defaults to HEADER_SIZE
+    :type max_size: int, optional
+    :return: The header, ending with a complete line
+    :rtype: bytes
+    """
+
+    marker = b"\nINSERT INTO"
+    header = b""
+    while len(header) < max_size:
+        chunk = infile.read(min(64 * 1024, max_size - len(header)))
+        if not chunk:
+            return header
+        start = max(0, len(header) - len(marker))
+        header += chunk
+        if header.startswith(marker[1:]):
+            return b""
+        pos = header.find(marker, start)
+        if pos != -1:
+            return header[: pos + 1]
+    return header[: header.rfind(b"\n") + 1]
+
+
+def _schema_path(file_path: PathObject) -> Path:
+    """
+    Get the path of the schema file of a dump file, which is stored
+    next to it.
+
+    :param file_path: The path to the dump file
+    :type file_path: PathObject
+    :return: The path to the schema file, e.g. "page.sql.gz.schema.json"
+    :rtype: Path
+    """
+
+    return Path(f"{file_path}.schema.json")
+
+
+def _source_stamp(file_path: PathObject, encoding: str, version: int) -> Dict[str, Any]:
+    """
+    Describe the version of a dump file that a sidecar file is derived
+    from, so that the sidecar file can be ignored once the dump file
+    changes.
+
+    :param file_path: The path to the dump file
+    :type file_path: PathObject
+    :param encoding: Text encoding the dump file is read with
+    :type encoding: str
+    :param version: Version of the format of the sidecar file
+    :type version: int
+    :return: The format version and the size, modification time and
+        encoding of the dump file
+    :rtype: Dict[str, Any]
+    """
+
+    stat = Path(file_path).stat()
+    return {
+        "version": version,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "encoding": encoding,
+    }
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    """
+    Read a JSON sidecar file.
+
+    :param path: The path to the file
+    :type path: Path
+    :return: The contents of the file, or None if it doesn't exist
+        or is not valid JSON
+    :rtype: Optional[Dict[str, Any]]
+    """
+
+    try:
+        with open(path, encoding="utf-8") as infile:
+            data: Dict[str, Any] = json.load(infile)
+    except (OSError, ValueError):
+        return None
+    return data
+
+
+def _write_json(path: Path, data: Dict[str, Any], indent: Optional[int] = 2) -> None:
+    """
+    Write a JSON sidecar file. The data is written to a temporary file
+    first, so that readers never see a partially written file. Unlike
+    files created by tempfile, the file gets the default permissions,
+    so that sidecar files can be shared by the users of a dump file.
+
+    :param path: The path to the file
+    :type path: Path
+    :param data: The contents of the file
+    :type data: Dict[str, Any]
+    :param indent: Indentation of the JSON, or None to write it on a
+        single line. Defaults to 2.
+    :type indent: Optional[int], optional
+    """
+
+    tmp_name = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_name, "x", encoding="utf-8") as outfile:
+            json.dump(data, outfile, indent=indent)
+        os.replace(tmp_name, path)
+    finally:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+
+
+def _read_schema(file_path: PathObject, encoding: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the table metadata of a dump file from its schema file.
+
+    :param file_path: The path to the dump file
+    :type file_path: PathObject
+    :param encoding: Text encoding the dump file is read with
+    :type encoding: str
+    :return: The table metadata as returned by
+        :func:`mwsql.parser._parse_header`, or None if there is no schema
+        file or it was written for another version of the dump file
+    :rtype: Optional[Dict[str, Any]]
+    """
+
+    schema = _read_json(_schema_path(file_path))
+    if schema is None:
+        return None
+    source = schema.pop("source", None)
+    if source != _source_stamp(file_path, encoding, _SCHEMA_VERSION):
+        return None
+    return schema
+
+
+def _write_schema(file_path: PathObject, encoding: str, schema: Dict[str, Any]) -> Path:
+    """
+    Save the table metadata of a dump file in a schema file next to it.
+    The schema file records the size and modification time of the dump
+    file, and is ignored once they change.
+
+    :param file_path: The path to the dump file
+    :type file_path: PathObject
+    :param encoding: Text encoding the dump file is read with
+    :type encoding: str
+    :param schema: The table metadata, as returned by
+        :func:`mwsql.parser._parse_header`
+    :type schema: Dict[str, Any]
+    :return: The path to the schema file
+    :rtype: Path
+    """
+
+    source = _source_stamp(file_path, encoding, _SCHEMA_VERSION)
+    schema_path = _schema_path(file_path)
+    _write_json(schema_path, {"source": source, **schema})
+    return schema_path
+
+
+def _gzip_index_path(file_path: PathObject) -> Path:
+    """
+    Get the path of the index file of a gzip file, which is stored
+    next to it.
+
+    :param file_path: The path to the gzip file
+    :type file_path: PathObject
+    :return: The path to the index file, e.g. "page.sql.gz.gzidx"
+    :rtype: Path
+    """
+
+    return Path(f"{file_path}.gzidx")
+
+
+def _has_gzip_index(file_path: PathObject) -> bool:
+    """
+    Check whether a gzip file has an index that can be used
+    for random access.
+
+    :param file_path: The path to the gzip file
+    :type file_path: PathObject
+    :return: True if indexed_gzip is installed and the index file exists
+        and is not older than the gzip file
+    :rtype: bool
+    """
+
+    index_path = _gzip_index_path(file_path)
+    if indexed_gzip is None or not index_path.exists():
+        return False
+    return index_path.stat().st_mtime >= Path(file_path).stat().st_mtime
+
+
+def _build_gzip_index(file_path: PathObject, spacing: int = GZIP_INDEX_SPACING) -> Path:
+    """
+    Decompress a gzip file once and save inflate checkpoints next to it,
+    so that it can later be read from any uncompressed offset without
+    decompressing everything that comes before.
+
+    :param file_path: The path to the gzip file
+    :type file_path: PathObject
+    :param spacing: Distance between two checkpoints in bytes of
+        uncompressed data, defaults to GZIP_INDEX_SPACING. Each checkpoint
+        takes up 32 KiB in the index file.
+    :type spacing: int, optional
+    :raises ImportError: If indexed_gzip is not installed
+    :return: The path to the index file
+    :rtype: Path
+    """
+
+    if indexed_gzip is None:
+        raise ImportError(
+            "indexing gzip files requires indexed_gzip, "
+            "install it with `pip install mwsql[gzip-index]`"
+        )
+
+    index_path = _gzip_index_path(file_path)
+    with indexed_gzip.IndexedGzipFile(str(file_path), spacing=spacing) as infile:
+        infile.build_full_index()
+        infile.export_index(str(index_path))
+    return index_path
+
+
+def _open_indexed_gzip(file_path: str) -> Any:
+    """
+    Open a gzip file through its index. The file object is cached, so that
+    each (worker) process imports the index only once. Handles are dropped
+    between reads, so the cached object is safe to use after forking.
+
+    :param file_path: The path to the gzip file
+    :type file_path: str
+    :return: An indexed_gzip.IndexedGzipFile
+    :rtype: Any
+    """
+
+    index_path = str(_gzip_index_path(file_path))
+    return _cached_indexed_gzip(
+        file_path, index_path, _file_version(file_path), _file_version(index_path)
+    )
+
+
+def _file_version(file_path: str) -> Tuple[int, int]:
+    """
+    Get the size and modification time of a file, which change when the
+    file is replaced.
+
+    :param file_path: The path to the file
+    :type file_path: str
+    :return: The size in bytes and the modification time in nanoseconds
+    :rtype: Tuple[int, int]
+    """
+
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+@lru_cache(maxsize=_INDEXED_GZIP_CACHE_SIZE)
+def _cached_indexed_gzip(
+    file_path: str,
+    index_path: str,
+    version: Tuple[int, int],
+    index_version: Tuple[int, int],
+) -> Any:
+    """
+    Open a gzip file through its index. The versions of both files are
+    part of the cache key, so that a replaced file or index is reopened.
+
+    :param file_path: The path to the gzip file
+    :type file_path: str
+    :param index_path: The path to the index file
+    :type index_path: str
+    :param version: See :func:`_file_version`
+    :type version: Tuple[int, int]
+    :param index_version: See :func:`_file_version`
+    :type index_version: Tuple[int, int]
+    :return: An indexed_gzip.IndexedGzipFile
+    :rtype: Any
+    """
+
+    return indexed_gzip.IndexedGzipFile(file_path, index_file=index_path)
+
+
+@contextmanager
+def _open_binary(
+    file_path: PathObject, decompression_thread: bool = False, indexed: bool = False
+) -> Iterator[BinaryIO]:
+    """
+    Custom context manager for opening both compressed and uncompressed
+    files in binary mode. Compressed files are recognized by their first
+    bytes and decompressed by the codec registered for their format, see
+    :func:`register_codec`.
+
+    :param file_path: The path to the file
+    :type file_path: PathObject
+    :param decompression_thread: Whether to decompress compressed files
+        in a background thread, which reads ahead of the caller.
+        Defaults to False.
+    :type decompression_thread: bool, optional
+    :param indexed: Whether to open gzip files that have an index through
+        it, which supports fast random access but is slower to read from
+        start to end. Defaults to False.
+    :type indexed: bool, optional
+    :yield: A file handle
+    :rtype: Iterator[BinaryIO]
+    """
+
+    codec = _compression(file_path)
+    with ExitStack() as stack:
+        infile: BinaryIO
+        if indexed and codec == "gzip" and _has_gzip_index(file_path):
+            infile = indexed_gzip.IndexedGzipFile(
+                str(file_path), index_file=str(_gzip_index_path(file_path))
+            )
+            stack.callback(infile.close)
+        else:
+            infile = stack.enter_context(open(file_path, mode="rb"))
+            if codec is not None:
+                infile = _CODECS[codec][1](infile)
+                stack.callback(infile.close)
+        if codec is not None and decompression_thread:
+            reader = _ThreadedReader(infile)
+            stack.callback(reader.close)
+            infile = io.BufferedReader(reader, _READ_BLOCK_SIZE)  # type: ignore
+        yield infile
+
+
+@contextmanager
+def _mmap_file(file_path: PathObject) -> Iterator[Any]:
+    """
+    Custom context manager for memory-mapping an uncompressed file for
+    reading. The mapping is backed by the page cache, so processes that
+    map the same file share its memory, and reading it again after the
+    first time doesn't copy it.
+
+    :param file_path: The path to the file
+    :type file_path: PathObject
+    :yield: A read-only mmap.mmap, or b"" if the file is empty,
+        as empty files cannot be mapped
+    :rtype: Iterator[Union[mmap.mmap, bytes]]
+    """
+
+    with open(file_path, mode="rb") as infile:
+        if Path(file_path).stat().st_size == 0:
+            yield b""
+            return
+        buffer = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield buffer
+        finally:
+            buffer.close()
+
+
+def _split_file(file_path: PathObject, chunk_size: int) -> List[Tuple[int, int]]:
+    """
+    Split a dump file into byte ranges of roughly `chunk_size` bytes. Every
+    range except the first one starts at the beginning of an INSERT INTO
+    statement, so that each statement lies entirely within one range.
+    For gzip files, offsets refer to the uncompressed data and ranges are
+    aligned to the checkpoints of the gzip index, if there is one.
+
+    :param file_path: The path to the file
+    :type file_path: PathObject
+    :param chunk_size: Approximate size of each range in bytes
+    :type chunk_size: int
+    :return: A list of (start, end) byte offsets covering the whole file
+    :rtype: List[Tuple[int, int]]
+    """
+
+    offsets = [0]
+
+    with _open_binary(file_path, indexed=True) as infile:
+        size = infile.seek(0, io.SEEK_END)
+        seek_points = []
+        if hasattr(infile, "seek_points"):
+            seek_points = [point for point, _ in infile.seek_points()]
+
+        for candidate in range(chunk_size, size, chunk_size):
+            if seek_points:
+                # Reading can only start at a checkpoint
+                candidate = seek_points[bisect_right(seek_points, candidate) - 1]
+            if candidate <= offsets[-1]:
+                continue
+            # Move to the start of the first line at or after `candidate`
+            infile.seek(candidate - 1)
+            infile.readline()
+            pos = infile.tell()
+            line = infile.readline()
+            while line and not line.startswith(b"INSERT INTO"):
+                pos += len(line)
+                line = infile.readline()
+            if not line:
+                break
+            if pos > offsets[-1]:
+                offsets.append(pos)
+
+    offsets.append(size)
+    return list(zip(offsets, offsets[1:]))
+
+
+def _read_statements(file_path: PathObject) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Read the INSERT INTO statements of a dump file together with their
+    byte ranges. For gzip files, offsets refer to the uncompressed data.
+
+    :param file_path: The path to the file
+    :type file_path: PathObject
+    :yield: The start and end offsets of each statement, including its
+        line ending, and the statement itself
+    :rtype: Iterator[Tuple[int, int, bytes]]
+    """
+
+    pos = 0
+    with _open_binary(file_path) as infile:
+        for line in infile:
+            end = pos + len(line)
+            if line.startswith(b"INSERT INTO"):
+                yield pos, end, line
+            pos = end
+
+
+def _read_lines(
+    file_path: PathObject, start: int, end: int, encoding: Optional[str]
+) -> Iterator[Any]:
+    """
+    Read the lines of a file that start within a byte range. For gzip
+    files, offsets refer to the uncompressed data.
+
+    :param file_path: The path to the file
+    :type file_path: PathObject
+    :param start: Byte offset of the first line
+    :type start: int
+    :param end: Byte offset at which to stop reading
+    :type end: int
+    :param encoding: Text encoding, or None to read bytes
+    :type encoding: Optional[str]
+    :yield: Decoded lines, including the line endings
+    :rtype: Iterator[Union[str, bytes]]
+    """
+
+    if _compression(file_path) == "gzip" and _has_gzip_index(file_path):
+        # The cached file object is shared, so the whole range is read
+        # before any line is yielded, in case the caller reads another
+        # range of the same file in between
+        with _INDEXED_GZIP_LOCK:
+            infile = _open_indexed_gzip(str(file_path))
+            infile.seek(start)
+            lines = list(_read_until(infile, start, end, encoding))
+        yield from lines
+        return
+
+    with _open_binary(file_path) as infile:
+        infile.seek(start)
+        yield from _read_until(infile, start, end, encoding)
+
+
+def _read_until(
+    infile: BinaryIO, pos: int, end: int, encoding: Optional[str]
+) -> Iterator[Any]:
+    """
+    Read lines from a binary file handle until a byte offset is reached.
+
+    :param infile: A file handle positioned at `pos`
+    :type infile: BinaryIO
+    :param pos: The current byte offset of `infile`
+    :type pos: int
+    :param end: Byte offset at which to stop reading
+    :type end: int
+    :param encoding: Text encoding, or None to read bytes
+    :type encoding: Optional[str]
+    :yield: Decoded lines, including the line endings
+    :rtype: Iterator[Union[str, bytes]]
+    """
+
+    while pos < end:
+        line = infile.readline()
+        if not line:
+            break
+        pos += len(line)
+        yield line if encoding is None else line.decode(encoding)
+
+
+def _read_chunks(infile: BinaryIO, chunk_size: int) -> Iterator[bytes]:
+    """
+    Read a binary file in chunks of roughly `chunk_size` bytes that end
+    at line endings, so that each INSERT INTO statement lies entirely
+    within one chunk.
+
+    :param infile: A buffered binary file handle
+    :type infile: BinaryIO
+    :param chunk_size: Approximate size of each chunk in bytes
+    :type chunk_size: int
+    :yield: The chunks, including the line ending of their last line
+    :rtype: Iterator[bytes]
+    """
+
+    while True:
+        chunk = infile.read(chunk_size)
+        if not chunk:
+            return
+        if not chunk.endswith(b"\n"):
+            chunk += infile.readline()
+        yield chunk
 
 
 def head(file_path: PathObject, n_lines: int = 10, encoding: str = "utf-8") -> None:
@@ -65,41 +1081,428 @@ def head(file_path: PathObject, n_lines: int = 10, encoding: str = "utf-8") -> N
     return
 
 
-def download_file(url: str, file_name: str) -> Optional[Path]:
+class _ResponseReader(io.RawIOBase):
+    """
+    Read the body of a streamed HTTP response as it arrives, optionally
+    copying it to a file at the same time. The copy is written to
+    "<file_path>.part" and renamed to `file_path` once the whole body
+    has been read, or deleted if the reader is closed before that.
+    """
+
+    def __init__(
+        self,
+        response: Any,
+        file_path: Optional[PathObject] = None,
+        on_complete: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        _ResponseReader class constructor.
+
+        :param response: The streamed response
+        :type response: requests.Response
+        :param file_path: The file to copy the body to, defaults to None
+        :type file_path: Optional[PathObject], optional
+        :param on_complete: Called once the copy of the body has been
+            renamed to `file_path`, defaults to None
+        :type on_complete: Optional[Callable[[], None]], optional
+        """
+
+        self._response = response
+        self._file_path = file_path
+        self._part_path = Path(f"{file_path}.part") if file_path else None
+        self._outfile = open(self._part_path, "wb") if self._part_path else None
+        self._on_complete = on_complete
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        data = self._response.raw.read(len(buffer), decode_content=False)
+        n_bytes = len(data)
+        buffer[:n_bytes] = data
+        if self._outfile is not None:
+            if n_bytes:
+                self._outfile.write(data)
+            else:
+                self._outfile.close()
+                self._outfile = None
+                os.replace(self._part_path, self._file_path)  # type: ignore
+                if self._on_complete is not None:
+                    self._on_complete()
+        return n_bytes
+
+    def close(self) -> None:
+        if not self.closed:
+            self._response.close()
+            if self._outfile is not None:
+                self._outfile.close()
+                os.remove(self._part_path)  # type: ignore
+        super().close()
+
+
+@contextmanager
+def _open_url(
+    url: str,
+    file_path: Optional[PathObject] = None,
+    on_complete: Optional[Callable[[], None]] = None,
+) -> Iterator[BinaryIO]:
+    """
+    Custom context manager for streaming a dump file from a URL in binary
+    mode, optionally saving it to a file at the same time, see
+    :class:`_ResponseReader`. Compressed files are recognized by their
+    first bytes and decompressed as they arrive.
+
+    :param url: URL of the dump file
+    :type url: str
+    :param file_path: The file to save the dump file to, defaults to None
+    :type file_path: Optional[PathObject], optional
+    :param on_complete: Called once the dump file has been saved,
+        defaults to None
+    :type on_complete: Optional[Callable[[], None]], optional
+    :raises requests.exceptions.HTTPError: If the file cannot be requested
+    :yield: A file handle
+    :rtype: Iterator[BinaryIO]
+    """
+
+    response = requests.get(url, stream=True, timeout=_DOWNLOAD_TIMEOUT)
+    try:
+        response.raise_for_status()
+    except requests.exceptions.HTTPError:
+        response.close()
+        raise
+
+    reader = _ResponseReader(response, file_path, on_complete)
+    buffered = io.BufferedReader(reader, _DOWNLOAD_BLOCK_SIZE)
+    infile: BinaryIO = buffered  # type: ignore
+    codec = _detect_codec(buffered.peek(_MAGIC_SIZE)[:_MAGIC_SIZE])
+    if codec is not None:
+        infile = _CODECS[codec][1](infile)
+    try:
+        yield infile
+    finally:
+        infile.close()
+        reader.close()
+
+
+def _read_checksum(url: str, file_name: str) -> Optional[str]:
+    """
+    Look up the checksum of a file in a checksum file of a dump, e.g.
+    "enwiki-20240601-sha1sums.txt", whose lines are a hex digest and a
+    file name. The checksum files in the "latest" directories list the
+    files by their dated names, so "enwiki-latest-page.sql.gz" also
+    matches e.g. "enwiki-20240601-page.sql.gz". Warns if the checksum
+    file can't be read or doesn't list the file, which is then not
+    verified.
+
+    :param url: URL of the checksum file
+    :type url: str
+    :param file_name: Name of the file, e.g. "enwiki-20240601-page.sql.gz"
+    :type file_name: str
+    :return: The hex digest, or None if the checksum file can't be read
+        or doesn't list the file
+    :rtype: Optional[str]
+    """
+
+    try:
+        response = requests.get(url, timeout=_DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        warnings.warn(
+            f"{file_name} is not verified, the checksums could not be read: {e}",
+            UserWarning,
+        )
+        return None
+
+    name_pattern = re.compile(
+        re.escape(file_name).replace(re.escape("-latest-"), r"-(?:latest|\d{8})-", 1)
+    )
+    for line in response.text.splitlines():
+        digest, _, name = line.strip().partition("  ")
+        if name_pattern.fullmatch(name):
+            return digest
+    warnings.warn(
+        f"{file_name} is not verified, {url} has no checksum for it", UserWarning
+    )
+    return None
+
+
+def _hash_file(file_path: PathObject, checksum: str) -> str:
+    """
+    Hash a file with the algorithm of a checksum, chosen by its length.
+
+    :param file_path: The path to the file
+    :type file_path: PathObject
+    :param checksum: An MD5, SHA-1 or SHA-256 hex digest
+    :type checksum: str
+    :raises ValueError: If the length of `checksum` matches none of
+        these algorithms
+    :return: The hex digest of the file
+    :rtype: str
+    """
+
+    algorithms = {32: "md5", 40: "sha1", 64: "sha256"}
+    if len(checksum) not in algorithms:
+        raise ValueError(f"unknown checksum algorithm: {checksum!r}")
+
+    digest = hashlib.new(algorithms[len(checksum)])
+    with open(file_path, "rb") as infile:
+        for block in iter(lambda: infile.read(_DOWNLOAD_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _download_stream(session: Any, url: str, part_path: Path) -> None:
+    """
+    Download a file in a single request, for servers that don't
+    support range requests.
+
+    :param session: The requests session
+    :type session: requests.Session
+    :param url: URL to download from
+    :type url: str
+    :param part_path: The path the file is written to
+    :type part_path: Path
+    :raises RuntimeError: If the download is shorter than announced
+    """
+
+    with session.get(url, stream=True, timeout=_DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        total_size = int(response.headers.get("content-length", 0))
+        progress_bar = tqdm(total=total_size, unit="iB", unit_scale=True)
+        with open(part_path, "wb") as outfile:
+            for data in response.iter_content(_DOWNLOAD_BLOCK_SIZE):
+                progress_bar.update(len(data))
+                outfile.write(data)
+        progress_bar.close()
+
+    if total_size != 0 and progress_bar.n != total_size:
+        raise RuntimeError(
+            f"Downloaded {progress_bar.n} bytes, expected {total_size} bytes"
+        )
+
+
+def _download_segment(
+    session: Any,
+    url: str,
+    part_path: Path,
+    start: int,
+    end: int,
+    validator: Optional[str],
+    progress_bar: Any,
+) -> None:
+    """
+    Download bytes `start` to `end` of a file with range requests, and
+    write them at the same offsets of a partial file. A dropped
+    connection is resumed from the last byte written, up to
+    _DOWNLOAD_RETRIES times.
+
+    :param session: The requests session
+    :type session: requests.Session
+    :param url: URL to download from
+    :type url: str
+    :param part_path: The partial file, already of the full size
+    :type part_path: Path
+    :param start: Offset of the first byte
+    :type start: int
+    :param end: Offset after the last byte
+    :type end: int
+    :param validator: The ETag or Last-Modified header of the file, which
+        is sent with the requests so that the file cannot change unnoticed
+    :type validator: Optional[str]
+    :param progress_bar: Progress bar updated with the bytes written
+    :type progress_bar: tqdm
+    :raises RuntimeError: If the file changed on the server, or the
+        connection kept dropping
+    """
+
+    offset = start
+    failures = 0
+    with open(part_path, "r+b") as outfile:
+        while offset < end:
+            headers = {"Range": f"bytes={offset}-{end - 1}"}
+            if validator is not None:
+                headers["If-Range"] = validator
+            error = None
+            try:
+                with session.get(
+                    url, headers=headers, stream=True, timeout=_DOWNLOAD_TIMEOUT
+                ) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise RuntimeError(f"{url} changed during the download")
+                    outfile.seek(offset)
+                    for data in response.iter_content(_DOWNLOAD_BLOCK_SIZE):
+                        data = data[: end - offset]
+                        outfile.write(data)
+                        offset += len(data)
+                        progress_bar.update(len(data))
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.Timeout,
+            ) as e:
+                error = e
+            if offset < end:
+                failures += 1
+                if failures > _DOWNLOAD_RETRIES:
+                    raise RuntimeError(f"Downloading {url} failed") from error
+
+
+def _download_segments(
+    session: Any,
+    url: str,
+    part_path: Path,
+    total_size: int,
+    validator: Optional[str],
+    workers: int,
+    segment_size: int,
+) -> None:
+    """
+    Download a file in segments of `segment_size` bytes, `workers` at a
+    time. The segments that have been downloaded are recorded in a state
+    file next to the partial file, e.g. "page.sql.gz.part.json", so that
+    an interrupted download resumes with the missing segments. The
+    state file is ignored if the file changed on the server since.
+
+    :param session: The requests session
+    :type session: requests.Session
+    :param url: URL to download from
+    :type url: str
+    :param part_path: The path the file is written to
+    :type part_path: Path
+    :param total_size: Size of the file in bytes
+    :type total_size: int
+    :param validator: The ETag or Last-Modified header of the file
+    :type validator: Optional[str]
+    :param workers: Number of segments downloaded at the same time
+    :type workers: int
+    :param segment_size: Size of the segments in bytes
+    :type segment_size: int
+    :raises RuntimeError: If a segment cannot be downloaded
+    """
+
+    state_path = Path(f"{part_path}.json")
+    source = {
+        "version": _DOWNLOAD_VERSION,
+        "url": url,
+        "size": total_size,
+        "validator": validator,
+        "segment_size": segment_size,
+    }
+    state = _read_json(state_path)
+    if (
+        state is None
+        or state.get("source") != source
+        or not part_path.exists()
+        or part_path.stat().st_size != total_size
+    ):
+        with open(part_path, "wb") as outfile:
+            outfile.truncate(total_size)
+        state = {"source": source, "done": []}
+
+    done = set(state["done"])
+    segments = [
+        (i, start, min(start + segment_size, total_size))
+        for i, start in enumerate(range(0, total_size, segment_size))
+        if i not in done
+    ]
+    remaining = sum(end - start for _, start, end in segments)
+    progress_bar = tqdm(
+        total=total_size, initial=total_size - remaining, unit="iB", unit_scale=True
+    )
+    lock = threading.Lock()
+
+    def download(segment: Tuple[int, int, int]) -> None:
+        i, start, end = segment
+        _download_segment(session, url, part_path, start, end, validator, progress_bar)
+        with lock:
+            done.add(i)
+            _write_json(state_path, {"source": source, "done": sorted(done)}, None)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for _ in executor.map(download, segments):
+            pass
+    finally:
+        executor.shutdown(cancel_futures=True)
+        progress_bar.close()
+    if state_path.exists():
+        state_path.unlink()
+
+
+def download_file(
+    url: str,
+    file_name: str,
+    workers: int = 2,
+    segment_size: int = DOWNLOAD_SEGMENT_SIZE,
+    checksum: Optional[str] = None,
+) -> Optional[Path]:
     """
     Download a file from a URL and show a progress indicator. Return the path to the downloaded file.
 
+    If the server supports range requests, the file is downloaded in
+    segments, `workers` of them at a time over a pool of connections.
+    The file is written to "<file_name>.part" and renamed once it is
+    complete. If the download is interrupted, calling this function
+    again resumes it from the segments that are missing. Servers that
+    don't support range requests are downloaded from in a single request.
+
     :param url: URL to download from
     :type url: str
     :param file_name: name of the file to download
     :type file_name: str
+    :param workers: Number of segments downloaded at the same time.
+        dumps.wikimedia.org allows up to 2 connections per client.
+        Defaults to 2.
+    :type workers: int, optional
+    :param segment_size: Size of the segments in bytes, which is also the
+        most that is downloaded again when resuming, defaults to
+        DOWNLOAD_SEGMENT_SIZE
+    :type segment_size: int, optional
+    :param checksum: MD5, SHA-1 or SHA-256 hex digest to verify the file
+        against, defaults to None for no verification
+    :type checksum: Optional[str], optional
+    :raises requests.exceptions.HTTPError: If the file cannot be requested
+    :raises RuntimeError: If the download fails or the downloaded file
+        doesn't match `checksum`, in which case it is deleted
     :return: path to the downloaded file
     :rtype: Optional[Path]
     """
 
-    session = requests.Session()
-    response = session.get(url, stream=True)
-    response.raise_for_status()
-    total_size = int(response.headers.get("content-length", 0))
-    block_size = 4096
-    progress_bar = tqdm(total=total_size, unit="iB", unit_scale=True)
+    part_path = Path(f"{file_name}.part")
+    with requests.Session() as session:
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
 
-    with open(file_name, "wb") as outfile:
-        for data in response.iter_content(block_size):
-            progress_bar.update(len(data))
-            outfile.write(data)
-    progress_bar.close()
+        response = session.head(url, allow_redirects=True, timeout=_DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        total_size = int(response.headers.get("content-length", 0))
+        if response.headers.get("accept-ranges") == "bytes" and total_size > 0:
+            validator = response.headers.get("etag") or response.headers.get(
+                "last-modified"
+            )
+            _download_segments(
+                session, url, part_path, total_size, validator, workers, segment_size
+            )
+        else:
+            _download_stream(session, url, part_path)
 
-    if total_size != 0 and progress_bar.n != total_size:
-        raise RuntimeError(
-            f"Downloaded {progress_bar.n} bytes, expected {total_size} bytes"
-        )
+    if checksum is not None and _hash_file(part_path, checksum) != checksum.lower():
+        part_path.unlink()
+        raise RuntimeError(f"The checksum of {file_name} doesn't match {checksum}")
 
+    os.replace(part_path, file_name)
     return Path(file_name)
 
 
 def load(
-    database: str, filename: str, date: str = "latest", extension: str = "sql"
+    database: str,
+    filename: str,
+    date: str = "latest",
+    extension: str = "sql",
+    workers: int = 2,
+    verify: bool = True,
 ) -> Optional[PathObject]:
     """
     Load a dump file from a Wikimedia public directory if the
@@ -117,6 +1520,14 @@ def load(
     :type date: str, optional
     :param extension: The file extension. Defaults to 'sql'
     :type extension: str
+    :param workers: Number of connections used to download the file,
+        see :func:`download_file`. Defaults to 2.
+    :type workers: int, optional
+    :param verify: Whether to verify the downloaded file against the
+        SHA-1 checksums published with the dump. Warns and downloads the
+        file unverified if they can't be read or don't list it.
+        Defaults to True.
+    :type verify: bool, optional
     :return: Path to dump file
     :rtype: Optional[PathObject]
     """
@@ -133,4 +1544,8 @@ def load(
     else:
         subdir_str = str(subdir).replace("\\", "/")
         url = f"{dumps_url}{subdir_str}/{str(extended_filename)}"
-        return download_file(url, extended_filename)
+        checksum = None
+        if verify:
+            checksums_url = f"{dumps_url}{subdir_str}/{database}-{date}-sha1sums.txt"
+            checksum = _read_checksum(checksums_url, extended_filename)
+        return download_file(url, extended_filename, workers, checksum=checksum)
@@ -1,4 +1,6 @@
 import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from io import StringIO
 
 
@@ -13,3 +15,103 @@ class Capturing(list):
         self.extend(self._stringio.getvalue().splitlines())
         del self._stringio  # free up some memory
         sys.stdout = self._stdout
+
+
+# Helper function for creating a dump file with many INSERT statements
+def split_inserts(source, target, rows_per_insert):
+    with open(source) as infile, open(target, "w") as outfile:
+        for line in infile:
+            if not line.startswith("INSERT INTO"):
+                outfile.write(line)
+                continue
+            prefix, _, values = line.rstrip().rstrip(";").partition(" VALUES ")
+            records = values[1:-1].split("),(")
+            for i in range(0, len(records), rows_per_insert):
+                chunk = "),(".join(records[i : i + rows_per_insert])
+                outfile.write(f"{prefix} VALUES ({chunk});\n")
+
+
+# Helper HTTP server for testing downloads. Serves the bytes in `files`,
+# supports range requests unless `ranges` is False, records the requested
+# ranges, drops the connection halfway through the first `drops`
+# responses and through any response from offset `broken_from` onwards,
+# and responds to the names in `errors` with their HTTP status code
+class FileServer(ThreadingHTTPServer):
+    def __init__(self, files):
+        super().__init__(("127.0.0.1", 0), FileRequestHandler)
+        self.files = files
+        self.ranges = True
+        self.etag = '"1"'
+        self.drops = 0
+        self.broken_from = None
+        self.errors = {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        pass  # Clients that stop reading early close the connection
+
+    def url(self, name):
+        return f"http://127.0.0.1:{self.server_port}/{name}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, args=(0.01,), daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class FileRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def respond(self, send_body):
+        server = self.server
+        name = self.path.lstrip("/")
+        data = server.files.get(name)
+        if data is None or name in server.errors:
+            self.send_response(server.errors.get(name, 404))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end, status = 0, len(data), 200
+        requested = self.headers.get("Range")
+        if_range = self.headers.get("If-Range", server.etag)
+        if send_body and server.ranges and requested and if_range == server.etag:
+            first, last = requested[len("bytes=") :].split("-")
+            start, end, status = int(first), int(last) + 1, 206
+        with server.lock:
+            if send_body:
+                server.requests.append((start, end))
+            broken = server.broken_from is not None and start >= server.broken_from
+            drop = send_body and (server.drops > 0 or broken)
+            if drop and not broken:
+                server.drops -= 1
+
+        self.send_response(status)
+        self.send_header("Content-Length", str(end - start))
+        if server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", server.etag)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(data)}")
+        self.end_headers()
+        if not send_body:
+            return
+        if drop:
+            self.wfile.write(data[start : (start + end) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(data[start:end])
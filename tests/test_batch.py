@@ -0,0 +1,91 @@
+from array import array
+
+import pytest
+
+from mwsql.batch import Batch, Column, _build_batch, _build_column, _pack_bits
+
+
+def test__build_column_int():
+    column = _build_column("page_id", int, ("10", "12", "290"))
+    assert column.data == array("q", [10, 12, 290])
+    assert column.offsets is None
+    assert column.validity is None
+    assert column.null_count == 0
+    assert column.to_pylist() == [10, 12, 290]
+
+
+def test__build_column_float_with_null():
+    column = _build_column("page_random", float, ("0.5", None, "", "1e-05"))
+    assert column.data == array("d", [0.5, 0.0, 0.0, 1e-05])
+    assert column.validity == bytearray([1, 0, 0, 1])
+    assert column.null_count == 2
+    assert column.to_pylist() == [0.5, None, None, 1e-05]
+
+
+def test__build_column_str():
+    column = _build_column("page_title", str, ("Anarchism", None, "", "Über"))
+    assert column.data == "AnarchismÜber".encode("utf-8")
+    assert column.offsets == array("q", [0, 9, 9, 9, 14])
+    assert column.validity == bytearray([1, 0, 1, 1])
+    assert len(column) == 4
+    assert column.to_pylist() == ["Anarchism", None, "", "Über"]
+
+
+def test__build_column_raise_warning_wrong_dtype():
+    with pytest.warns(UserWarning):
+        column = _build_column("page_id", int, ("10", "bad value"))
+    assert column.to_pylist() == [10, None]
+
+
+def test__build_column_raise_value_error_wrong_dtype():
+    with pytest.raises(ValueError):
+        _build_column("page_id", int, ("10", "bad value"), strict=True)
+
+
+def test__build_column_out_of_range():
+    with pytest.warns(UserWarning):
+        column = _build_column("ctd_count", int, ("1", str(2**64)))
+    assert column.to_pylist() == [1, None]
+
+
+def test__build_batch():
+    rows = [["1", "mw-replace", None], ["2", None, "305860"]]
+    batch = _build_batch(rows, ["ctd_id", "ctd_name", "ctd_count"], [int, str, int])
+    assert isinstance(batch, Batch)
+    assert batch.num_rows == len(batch) == 2
+    assert batch.col_names == ["ctd_id", "ctd_name", "ctd_count"]
+    assert isinstance(batch["ctd_name"], Column)
+    assert batch.to_pydict() == {
+        "ctd_id": [1, 2],
+        "ctd_name": ["mw-replace", None],
+        "ctd_count": [None, 305860],
+    }
+
+
+def test__build_batch_raise_value_error_wrong_length():
+    with pytest.raises(ValueError):
+        _build_batch([["1", "mw-replace"]], ["ctd_id"], [int])
+
+
+@pytest.mark.parametrize(
+    "mask,expected",
+    [
+        (bytearray(), b""),
+        (bytearray([1, 0, 1]), b"\x05"),
+        (bytearray([0, 1, 1, 1, 1, 1, 1, 1, 1]), b"\xfe\x01"),
+    ],
+)
+def test__pack_bits(mask, expected):
+    assert _pack_bits(mask) == expected
+
+
+def test_batch_to_arrow():
+    pa = pytest.importorskip("pyarrow")
+    rows = [["1", "mw-replace", "0.5"], [None, None, "bad value"]]
+    with pytest.warns(UserWarning):
+        batch = _build_batch(rows, ["id", "name", "random"], [int, str, float])
+    record_batch = batch.to_arrow()
+    assert record_batch.schema == pa.schema(
+        [("id", pa.int64()), ("name", pa.large_string()), ("random", pa.float64())]
+    )
+    assert record_batch.to_pydict() == batch.to_pydict()
@@ -0,0 +1,63 @@
+import gzip
+
+import pytest
+
+from benchmarks.generate import TABLES, generate_dump, generate_rows
+from benchmarks.run import CASES, compare, run_benchmarks
+from mwsql import Dump
+
+
+@pytest.mark.parametrize("suffix", [".sql", ".sql.gz"])
+@pytest.mark.parametrize("table", TABLES)
+def test_generate_dump(tmp_path, table, suffix):
+    options = {"escape_ratio": 0.5, "null_ratio": 0.5, "multibyte_ratio": 0.5}
+    file_path = generate_dump(
+        tmp_path / f"{table}{suffix}", table, 500, statement_size=4096, **options
+    )
+    dump = Dump.from_file(file_path)
+    assert dump.name == table
+    expected = [
+        ["" if val is None else str(val) for val in row]
+        for row in generate_rows(table, 500, **options)
+    ]
+    assert list(dump.rows()) == expected
+    assert list(dump.rows(raw=True)) == [
+        [val.encode() for val in row] for row in expected
+    ]
+
+
+def test_generate_dump_deterministic(tmp_path):
+    first = generate_dump(tmp_path / "first.sql.gz", "page", 200, seed=1)
+    second = generate_dump(tmp_path / "second.sql.gz", "page", 200, seed=1)
+    other = generate_dump(tmp_path / "other.sql.gz", "page", 200, seed=2)
+    assert first.read_bytes() == second.read_bytes()
+    assert first.read_bytes() != other.read_bytes()
+    assert gzip.decompress(first.read_bytes()).count(b"\nINSERT INTO") == 1
+
+
+def test_generate_rows_raise_value_error():
+    with pytest.raises(ValueError):
+        next(generate_rows("revision", 1))
+
+
+def test_run_benchmarks(tmp_path):
+    results = run_benchmarks(tmp_path, n_rows=100, repeat=1, tables=["pagelinks"])
+    assert list(results["results"]) == [
+        f"pagelinks{suffix} {case}" for suffix in (".sql", ".sql.gz") for case in CASES
+    ]
+    assert results["meta"]["rows"] == 100
+    result = results["results"]["pagelinks.sql.gz rows"]
+    assert result["rows_per_sec"] > 0 and result["mb_per_sec"] > 0
+    assert results["results"]["pagelinks.sql from_file"]["rows_per_sec"] is None
+
+    selected = run_benchmarks(tmp_path, n_rows=100, repeat=1, select="page.sql to_csv")
+    assert list(selected["results"]) == ["page.sql to_csv"]
+
+
+def test_compare():
+    baseline = {"results": {"a": {"seconds": 1.0}, "b": {"seconds": 1.0}}}
+    results = {
+        "results": {"a": {"seconds": 1.1}, "b": {"seconds": 1.3}, "c": {"seconds": 9}}
+    }
+    assert compare(results, baseline) == ["b"]
+    assert compare(results, baseline, tolerance=0.05) == ["a", "b"]
@@ -0,0 +1,106 @@
+import os
+from pathlib import Path
+
+from mwsql.cache import (
+    _cache_key,
+    _cache_path,
+    _evict,
+    _read_batches,
+    _read_cache,
+    _write_cache,
+)
+
+CURRENT_DIR = Path(__file__).parent
+DATA_DIR = CURRENT_DIR.parent / "data"
+FILEPATH_GZ = DATA_DIR / "testfile.sql.gz"
+
+rows = [
+    ["1", "mw-replace", ""],
+    ["2", "Über_Straße", "0"],
+    ["3", "with\0nul", "1"],
+    ["4", "", "2"],
+    ["5", "A),(B", "3"],
+]
+
+
+def test__cache_key(tmp_path):
+    file_path = tmp_path / "testfile.sql"
+    file_path.write_text("INSERT INTO `t` VALUES (1);\n")
+    key = _cache_key(file_path, "utf-8")
+    assert key == _cache_key(file_path, "utf-8")
+    assert key != _cache_key(file_path, "latin-1")
+    os.utime(file_path, ns=(0, 0))
+    assert key != _cache_key(file_path, "utf-8")
+
+
+def test__cache_path(tmp_path):
+    cache_path = _cache_path(tmp_path, FILEPATH_GZ, "utf-8")
+    assert cache_path.parent == tmp_path
+    assert cache_path.name.startswith("testfile.sql.gz-")
+    assert cache_path.suffix == ".mwcache"
+
+
+def test__write_cache_and__read_cache(tmp_path):
+    cache_path = tmp_path / "cache" / "testfile.mwcache"
+    assert _read_cache(cache_path) is None
+    batches = list(_write_cache(cache_path, iter(rows), 3, batch_size=2))
+    assert batches == [rows[:2], rows[2:4], rows[4:]]
+    assert list(_read_cache(cache_path)) == batches
+    assert os.listdir(cache_path.parent) == [cache_path.name]
+
+
+def test__write_cache_nulls(tmp_path):
+    cache_path = tmp_path / "testfile.mwcache"
+    null_rows = [["1", None, "x"], ["2", "", None], ["3", "a\0b", None]]
+    batches = list(_write_cache(cache_path, iter(null_rows), 3, null="\\N"))
+    assert batches == [[["1", "\\N", "x"], ["2", "", "\\N"], ["3", "a\0b", "\\N"]]]
+    assert list(_read_cache(cache_path, None)) == [null_rows]
+    assert list(_read_cache(cache_path)) == [
+        [["1", "", "x"], ["2", "", ""], ["3", "a\0b", ""]]
+    ]
+
+
+def test__write_cache_permissions(tmp_path):
+    cache_path = tmp_path / "testfile.mwcache"
+    umask = os.umask(0o022)
+    try:
+        list(_write_cache(cache_path, iter(rows), 3))
+    finally:
+        os.umask(umask)
+    assert cache_path.stat().st_mode & 0o777 == 0o644
+
+
+def test__write_cache_stopped_early(tmp_path):
+    cache_path = tmp_path / "testfile.mwcache"
+    batches = _write_cache(cache_path, iter(rows), 3, batch_size=2)
+    next(batches)
+    batches.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test__write_cache_wrong_length(tmp_path):
+    cache_path = tmp_path / "testfile.mwcache"
+    bad_rows = rows[:3] + [["6", "too short"]] + rows[3:]
+    batches = list(_write_cache(cache_path, iter(bad_rows), 3, batch_size=2))
+    assert [row for batch in batches for row in batch] == bad_rows
+    assert os.listdir(tmp_path) == []
+
+
+def test__read_batches_empty(tmp_path):
+    cache_path = tmp_path / "testfile.mwcache"
+    assert list(_write_cache(cache_path, iter([]), 3)) == []
+    with open(cache_path, "rb") as infile:
+        assert list(_read_batches(infile)) == []
+
+
+def test__evict(tmp_path):
+    for i, name in enumerate(["a", "b", "c"]):
+        path = tmp_path / f"{name}.mwcache"
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (i, i))
+    (tmp_path / "other.txt").write_bytes(b"x" * 1000)
+
+    _evict(tmp_path, 250)
+    assert sorted(os.listdir(tmp_path)) == ["b.mwcache", "c.mwcache", "other.txt"]
+    _evict(tmp_path, 0)
+    assert os.listdir(tmp_path) == ["other.txt"]
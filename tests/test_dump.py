@@ -1,11 +1,19 @@
+import asyncio
+import bz2
+import gzip
+import lzma
 import os
+import shutil
+import warnings
+from itertools import islice
 from pathlib import Path
 
 import pytest
+import requests
 
 from mwsql import Dump
 
-from .helpers import Capturing
+from .helpers import Capturing, FileServer, split_inserts
 
 CURRENT_DIR = Path(__file__).parent
 DATA_DIR = CURRENT_DIR.parent / "data"
@@ -29,6 +37,22 @@ def dump_unzipped_with_null_values():
     return Dump.from_file(FILEPATH_UNZIPPED_WITH_NULL_VALUES)
 
 
+@pytest.fixture
+def dump_multi_insert(tmp_path):
+    file_path = tmp_path / "testfile-multi-insert.sql"
+    split_inserts(FILEPATH_UNZIPPED, file_path, 7)
+    return Dump.from_file(file_path)
+
+
+@pytest.fixture
+def dump_multi_insert_gz(tmp_path):
+    file_path = tmp_path / "testfile-multi-insert.sql"
+    split_inserts(FILEPATH_UNZIPPED, file_path, 7)
+    with open(file_path, "rb") as infile, gzip.open(f"{file_path}.gz", "wb") as out:
+        shutil.copyfileobj(infile, out)
+    return Dump.from_file(f"{file_path}.gz")
+
+
 def test_from_file_gz(dump_gz):
     assert dump_gz.db == "simplewiki"
     assert dump_gz.name == "change_tag_def"
@@ -68,6 +92,24 @@ def test_from_file_unzipped(dump_unzipped):
     assert dump_unzipped._encoding == "utf-8"
 
 
+def test_save_schema(monkeypatch, tmp_path):
+    file_path = tmp_path / "testfile.sql.gz"
+    shutil.copy(FILEPATH_GZ, file_path)
+    dump = Dump.from_file(file_path)
+    assert dump.save_schema() == tmp_path / "testfile.sql.gz.schema.json"
+
+    def fail(*args, **kwargs):
+        raise AssertionError("read the dump file header")
+
+    monkeypatch.setattr("mwsql.dump._read_header", fail)
+    from_schema = Dump.from_file(file_path)
+    assert from_schema.db == dump.db
+    assert from_schema.name == dump.name
+    assert from_schema.col_names == dump.col_names
+    assert from_schema.sql_dtypes == dump.sql_dtypes
+    assert from_schema.primary_key == dump.primary_key
+
+
 def test_encoding(dump_gz):
     assert dump_gz.encoding == dump_gz._encoding == "utf-8"
     dump_gz.encoding = "latin-1"
@@ -99,6 +141,13 @@ def test_rows_converted(dump_gz):
     assert second == [2, "visualeditor", 0, 305860]
 
 
+def test_converter_cached(dump_gz):
+    assert dump_gz._converter(False) is dump_gz._converter(False)
+    assert dump_gz._converter(True) is not dump_gz._converter(False)
+    rows = [["1", "mw-replace", "0", "10200"]]
+    assert dump_gz._converter(False)(rows) == [[1, "mw-replace", 0, 10200]]
+
+
 def test_rows_unconverted_with_null_values(dump_unzipped_with_null_values):
     rows = dump_unzipped_with_null_values.rows(convert_dtypes=False)
     first = next(rows)
@@ -123,6 +172,600 @@ def test_rows_converted_with_null_values(dump_unzipped_with_null_values):
     assert fourth == [4, "mw-rollback", 0, ""]
 
 
+def test_rows_engines_agree(dump_gz, dump_unzipped_with_null_values):
+    for dump in (dump_gz, dump_unzipped_with_null_values):
+        assert list(dump.rows(engine="tokenizer")) == list(dump.rows(engine="csv"))
+
+
+@pytest.mark.parametrize("engine", ["tokenizer", "csv"])
+def test_rows_columns(dump_gz, dump_unzipped_with_null_values, engine):
+    for dump in (dump_gz, dump_unzipped_with_null_values):
+        columns = ["ctd_count", "ctd_id"]
+        expected = [[row[3], row[0]] for row in dump.rows(convert_dtypes=True)]
+        rows = dump.rows(convert_dtypes=True, columns=columns, engine=engine)
+        assert list(rows) == expected
+    rows = dump_gz.rows(columns=["ctd_name"], raw=True)
+    assert next(rows) == [b"mw-replace"]
+
+
+def test_rows_columns_parallel_and_cached(monkeypatch, tmp_path, dump_multi_insert):
+    monkeypatch.setattr("mwsql.dump._CHUNK_SIZE", 256)
+    columns = ["ctd_name", "ctd_id"]
+    expected = [[row[1], row[0]] for row in dump_multi_insert.rows()]
+    assert list(dump_multi_insert.rows(columns=columns, workers=3)) == expected
+    dump = Dump.from_file(dump_multi_insert._source_file, cache_dir=tmp_path)
+    for _ in range(2):
+        assert list(dump.rows(columns=columns)) == expected
+
+
+@pytest.mark.parametrize("row_type", ["tuple", "record"])
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"convert_dtypes": True},
+        {"engine": "csv", "convert_dtypes": True},
+        {"raw": True},
+        {"columns": ["ctd_name", "ctd_id"], "convert_dtypes": True},
+        {"columns": ["ctd_id", "ctd_count"], "where": {"ctd_user_defined": 0}},
+        {"workers": 3, "convert_dtypes": True},
+        {"workers": 2, "pipeline": True},
+    ],
+)
+def test_rows_row_type(monkeypatch, dump_multi_insert, row_type, kwargs):
+    monkeypatch.setattr("mwsql.dump._CHUNK_SIZE", 256)
+    expected = list(dump_multi_insert.rows(**kwargs))
+    rows = list(dump_multi_insert.rows(row_type=row_type, **kwargs))
+    assert rows == [tuple(row) for row in expected]
+    assert len({type(row) for row in rows}) == 1
+    if row_type == "record":
+        names = kwargs.get("columns", dump_multi_insert.col_names)
+        assert list(rows[0]._fields) == names
+        assert getattr(rows[0], names[0]) == expected[0][0]
+    else:
+        assert type(rows[0]) is tuple
+
+
+def test_rows_row_type_cached(tmp_path, dump_multi_insert):
+    dump = Dump.from_file(dump_multi_insert._source_file, cache_dir=tmp_path)
+    expected = [tuple(row) for row in dump.rows(convert_dtypes=True)]
+    for convert_dtypes in (True, False):
+        rows = list(dump.rows(convert_dtypes=convert_dtypes, row_type="record"))
+        assert rows[0].ctd_name == "mw-replace"
+        if convert_dtypes:
+            assert rows == expected
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"convert_dtypes": True, "row_type": "record"},
+        {"raw": True},
+        {"columns": ["ctd_user_defined", "ctd_name"]},
+        {"workers": 3},
+        {"workers": 2, "pipeline": True, "row_type": "tuple"},
+    ],
+)
+def test_rows_dictionary_encode(monkeypatch, dump_multi_insert, kwargs):
+    monkeypatch.setattr("mwsql.dump._CHUNK_SIZE", 256)
+    expected = list(dump_multi_insert.rows(**kwargs))
+    names = kwargs.get("columns", dump_multi_insert.col_names)
+    i = names.index("ctd_name")
+    for _ in range(2):
+        rows = list(dump_multi_insert.rows(dictionary_encode=["ctd_name"], **kwargs))
+        dictionary = dump_multi_insert.dictionary(
+            "ctd_name", raw=kwargs.get("raw", False)
+        )
+        assert len(dictionary) == len(rows)
+        assert all(isinstance(row[i], int) for row in rows)
+        decoded = [
+            [dictionary[v] if j == i else v for j, v in enumerate(row)] for row in rows
+        ]
+        assert decoded == [list(row) for row in expected]
+
+
+def test_rows_intern(dump_multi_insert):
+    expected = list(dump_multi_insert.rows())
+    rows = list(dump_multi_insert.rows(intern=True))
+    assert rows == expected
+    assert dump_multi_insert._probe_columns() == ["ctd_user_defined"]
+    first = {row[2]: row[2] for row in reversed(rows)}
+    assert all(row[2] is first[row[2]] for row in rows)
+    # Converted numerical columns are not probed
+    rows = list(dump_multi_insert.rows(convert_dtypes=True, dictionary_encode=True))
+    assert rows == list(dump_multi_insert.rows(convert_dtypes=True))
+    assert dump_multi_insert.dictionary("ctd_user_defined") == []
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"intern": ["unknown"]},
+        {"intern": "ctd_name"},
+        {"dictionary_encode": ["ctd_id"], "columns": ["ctd_name"]},
+        {"dictionary_encode": ["ctd_id"], "convert_dtypes": True},
+    ],
+)
+def test_rows_intern_raise_value_error(dump_gz, kwargs):
+    with pytest.raises(ValueError):
+        next(dump_gz.rows(**kwargs))
+    with pytest.raises(ValueError):
+        dump_gz.dictionary("unknown")
+
+
+def test_rows_raise_value_error_unknown_row_type(dump_gz):
+    with pytest.raises(ValueError):
+        next(dump_gz.rows(row_type="dict"))
+
+
+@pytest.mark.parametrize(
+    "columns", [["ctd_id", "unknown"], ["ctd_id", "ctd_id"], "ctd_id"]
+)
+def test_rows_columns_raise_value_error(dump_gz, columns):
+    with pytest.raises(ValueError):
+        next(dump_gz.rows(columns=columns))
+
+
+def _is_large(val):
+    return val > 100000
+
+
+@pytest.mark.parametrize(
+    "where,keep",
+    [
+        (
+            {"ctd_user_defined": 0, "ctd_name": ["mw-undo", "visualeditor", "x"]},
+            lambda row: row[2] == 0 and row[1] in ("mw-undo", "visualeditor"),
+        ),
+        ({"ctd_count": _is_large}, lambda row: row[3] > 100000),
+        ({"ctd_id": "3"}, lambda row: row[0] == 3),
+    ],
+)
+def test_rows_where(monkeypatch, tmp_path, dump_multi_insert, where, keep):
+    monkeypatch.setattr("mwsql.dump._CHUNK_SIZE", 256)
+    expected = [row for row in dump_multi_insert.rows(convert_dtypes=True) if keep(row)]
+    assert 0 < len(expected) < 84
+    cached = Dump.from_file(dump_multi_insert._source_file, cache_dir=tmp_path)
+    for dump, kwargs in [
+        (dump_multi_insert, {}),
+        (dump_multi_insert, {"engine": "csv"}),
+        (dump_multi_insert, {"workers": 3}),
+        (cached, {}),
+        (cached, {}),
+    ]:
+        assert list(dump.rows(convert_dtypes=True, where=where, **kwargs)) == expected
+    raw = dump_multi_insert.rows(where=where, columns=["ctd_name"], raw=True)
+    assert list(raw) == [[row[1].encode()] for row in expected]
+
+
+def test_rows_where_null(dump_unzipped_with_null_values):
+    dump = dump_unzipped_with_null_values
+    expected = [["", "mw-replace?NULL", "0", "10200"]]
+    assert list(dump.rows(where={"ctd_id": None})) == expected
+    assert list(dump.rows(where={"ctd_id": None}, raw=True)) == [
+        [val.encode() for val in expected[0]]
+    ]
+    assert len(list(dump.rows(where={"ctd_count": [None, 10200]}))) == 2
+
+
+def test_rows_where_raise_value_error_unknown_column(dump_gz):
+    with pytest.raises(ValueError):
+        next(dump_gz.rows(where={"unknown": 0}))
+
+
+def test_rows_raise_value_error_unknown_engine(dump_gz):
+    with pytest.raises(ValueError):
+        next(dump_gz.rows(engine="unknown"))
+
+
+def test_rows_fmtparams_use_csv_engine(dump_gz):
+    expected = list(dump_gz.rows(engine="csv"))
+    assert list(dump_gz.rows(delimiter=",")) == expected
+
+
+def test_rows_raise_value_error_fmtparams_with_tokenizer(dump_gz):
+    with pytest.raises(ValueError):
+        next(dump_gz.rows(engine="tokenizer", delimiter=";"))
+
+
+@pytest.mark.parametrize("convert_dtypes", [False, True])
+def test_rows_parallel_ordered(monkeypatch, dump_multi_insert, convert_dtypes):
+    monkeypatch.setattr("mwsql.dump._CHUNK_SIZE", 256)
+    serial = list(dump_multi_insert.rows(convert_dtypes=convert_dtypes))
+    parallel = list(dump_multi_insert.rows(convert_dtypes=convert_dtypes, workers=3))
+    assert len(serial) == 84
+    assert parallel == serial
+
+
+def test_rows_parallel_unordered(monkeypatch, dump_multi_insert):
+    monkeypatch.setattr("mwsql.dump._CHUNK_SIZE", 256)
+    serial = list(dump_multi_insert.rows())
+    parallel = list(dump_multi_insert.rows(workers=3, ordered=False))
+    assert sorted(parallel) == sorted(serial)
+
+
+def test_rows_parallel_raw(monkeypatch, dump_multi_insert):
+    monkeypatch.setattr("mwsql.dump._CHUNK_SIZE", 256)
+    serial = list(dump_multi_insert.rows(raw=True))
+    assert list(dump_multi_insert.rows(raw=True, workers=3)) == serial
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"convert_dtypes": True},
+        {"raw": True},
+        {"engine": "csv"},
+        {"columns": ["ctd_count", "ctd_name"], "where": {"ctd_user_defined": 0}},
+        {"workers": 1},
+    ],
+)
+def test_rows_pipeline(monkeypatch, dump_multi_insert_gz, kwargs):
+    monkeypatch.setattr("mwsql.dump._CHUNK_SIZE", 256)
+    serial = list(dump_multi_insert_gz.rows(**kwargs))
+    pipelined = dump_multi_insert_gz.rows(pipeline=True, **{"workers": 3, **kwargs})
+    assert len(serial) > 0
+    assert list(pipelined) == serial
+
+
+def test_rows_pipeline_unordered(monkeypatch, dump_multi_insert_gz):
+    monkeypatch.setattr("mwsql.dump._CHUNK_SIZE", 256)
+    serial = list(dump_multi_insert_gz.rows())
+    pipelined = dump_multi_insert_gz.rows(pipeline=True, workers=3, ordered=False)
+    assert sorted(pipelined) == sorted(serial)
+
+
+def test_rows_pipeline_stop_early(monkeypatch, dump_multi_insert_gz):
+    monkeypatch.setattr("mwsql.dump._CHUNK_SIZE", 256)
+    rows = dump_multi_insert_gz.rows(pipeline=True, workers=2)
+    assert next(rows) == next(dump_multi_insert_gz.rows())
+    rows.close()
+
+
+def test_rows_raw(dump_gz, dump_unzipped_with_null_values):
+    for dump in (dump_gz, dump_unzipped_with_null_values):
+        raw = [[val.decode("utf-8") for val in row] for row in dump.rows(raw=True)]
+        assert raw == list(dump.rows())
+    assert next(dump_gz.rows(raw=True, convert_dtypes=True)) == [
+        1,
+        b"mw-replace",
+        0,
+        10200,
+    ]
+
+
+def test_rows_raw_raise_value_error_csv_engine(dump_gz):
+    with pytest.raises(ValueError):
+        next(dump_gz.rows(engine="csv", raw=True))
+
+
+def test_rows_parallel_raise_value_error_gz(dump_gz):
+    with pytest.raises(ValueError):
+        next(dump_gz.rows(workers=2))
+
+
+@pytest.fixture
+def file_server():
+    files = {path.name: path.read_bytes() for path in (FILEPATH_GZ, FILEPATH_UNZIPPED)}
+    with FileServer(files) as server:
+        yield server
+
+
+@pytest.mark.parametrize("file_path", [FILEPATH_GZ, FILEPATH_UNZIPPED])
+def test_from_url(file_server, file_path):
+    dump = Dump.from_url(file_server.url(file_path.name))
+    expected = Dump.from_file(file_path)
+    assert (dump.db, dump.name, dump.col_names, dump.primary_key) == (
+        expected.db,
+        expected.name,
+        expected.col_names,
+        expected.primary_key,
+    )
+    assert dump.size is None
+    assert list(dump.rows(convert_dtypes=True)) == list(
+        expected.rows(convert_dtypes=True)
+    )
+    assert list(dump.rows(raw=True)) == list(expected.rows(raw=True))
+    assert list(dump.rows(engine="csv")) == list(expected.rows(engine="csv"))
+    assert list(dump.rows(pipeline=True, workers=2)) == list(expected.rows())
+    with pytest.raises(ValueError):
+        list(dump.rows(workers=2))
+
+
+def test_from_url_file_path(monkeypatch, tmp_path, file_server):
+    # A dump that is too large to be downloaded by the first read
+    monkeypatch.setattr("mwsql.utils._DOWNLOAD_BLOCK_SIZE", 64 * 1024)
+    header, _, _ = FILEPATH_UNZIPPED.read_text().partition("INSERT INTO")
+    content = header
+    for start in range(0, 5000, 100):
+        values = ",".join(
+            f"({i},'{os.urandom(8).hex()}',0,{i})" for i in range(start, start + 100)
+        )
+        content += f"INSERT INTO `change_tag_def` VALUES {values};\n"
+    file_server.files["large.sql"] = content.encode("utf-8")
+    (tmp_path / "source").mkdir()
+    (tmp_path / "source" / "large.sql").write_text(content)
+    expected = list(Dump.from_file(tmp_path / "source" / "large.sql").rows())
+
+    file_path = tmp_path / "saved" / "large.sql"
+    file_path.parent.mkdir()
+    dump = Dump.from_url(file_server.url("large.sql"), file_path=file_path)
+
+    # The file is only saved by a pass that reads it to the end
+    rows = dump.rows()
+    next(rows)
+    rows.close()
+    assert os.listdir(file_path.parent) == []
+    with pytest.raises(ValueError):
+        dump.save_schema()
+
+    assert list(dump.rows()) == expected
+    assert file_path.read_bytes() == file_server.files["large.sql"]
+    assert dump.size == file_path.stat().st_size
+
+    # Later passes read the saved file
+    file_server.requests.clear()
+    assert list(dump.rows()) == expected
+    assert file_server.requests == []
+    assert dump.save_schema().exists()
+
+
+def test_from_url_raise_http_error(file_server):
+    with pytest.raises(requests.exceptions.HTTPError):
+        Dump.from_url(file_server.url("nonexistent.sql.gz"))
+
+
+@pytest.mark.parametrize("compress", [bz2.compress, lzma.compress])
+@pytest.mark.parametrize("decompression_thread", [False, True])
+def test_rows_compressed(tmp_path, dump_unzipped, compress, decompression_thread):
+    file_path = tmp_path / "testfile.sql.compressed"
+    file_path.write_bytes(compress(FILEPATH_UNZIPPED.read_bytes()))
+    dump = Dump.from_file(file_path, decompression_thread=decompression_thread)
+    assert dump.col_names == dump_unzipped.col_names
+    for kwargs in ({}, {"raw": True}, {"engine": "csv"}):
+        assert list(dump.rows(**kwargs)) == list(dump_unzipped.rows(**kwargs))
+    with pytest.raises(ValueError):
+        dump.build_gzip_index()
+    with pytest.raises(ValueError):
+        list(dump.rows(workers=2))
+
+
+def test_build_gzip_index(dump_multi_insert_gz):
+    pytest.importorskip("indexed_gzip")
+    index_path = dump_multi_insert_gz.build_gzip_index(spacing=64 * 1024)
+    assert index_path == Path(f"{dump_multi_insert_gz._source_file}.gzidx")
+    assert index_path.exists()
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_get_and_range(dump_multi_insert, dump_multi_insert_gz, compressed):
+    dump = dump_multi_insert_gz if compressed else dump_multi_insert
+    rows = list(dump.rows())
+    ids = [int(row[0]) for row in rows]
+    index_path = dump.build_index()
+    assert index_path == Path(f"{dump._source_file}.pkidx")
+    assert dump.get(ids[29]) == rows[29]
+    assert dump.get(str(ids[29]), convert_dtypes=True) == list(dump.rows(True))[29]
+    assert dump.get(max(ids) + 1) is None
+    assert list(dump.range(ids[6], ids[14])) == rows[6:14]
+    assert list(dump.range(ids[80])) == rows[80:]
+    assert list(dump.range(hi=3, convert_dtypes=True)) == [
+        [1, "mw-replace", 0, 10200],
+        [2, "visualeditor", 0, 305860],
+    ]
+
+
+def test_get_raise_value_error_without_index(dump_multi_insert):
+    with pytest.raises(ValueError):
+        dump_multi_insert.get(1)
+    dump_multi_insert.build_index()
+    with pytest.raises(ValueError):
+        dump_multi_insert.get((1, 2))
+    with open(dump_multi_insert._source_file, "a") as outfile:
+        outfile.write("INSERT INTO `change_tag_def` VALUES (200,'new',0,1);\n")
+    with pytest.raises(ValueError):
+        next(dump_multi_insert.range(1, 2))
+
+
+@pytest.mark.parametrize("collisions", [False, True])
+def test_create_index_and_lookup(monkeypatch, dump_multi_insert, collisions):
+    if collisions:
+        monkeypatch.setattr("mwsql.index._hash_key", lambda key: 0)
+    rows = list(dump_multi_insert.rows())
+    index_path = dump_multi_insert.create_index("ctd_user_defined")
+    assert index_path.name == "testfile-multi-insert.sql.ctd_user_defined.idx"
+    expected = [row for row in rows if row[2] == "1"]
+    assert expected
+    assert list(dump_multi_insert.lookup("ctd_user_defined", 1)) == expected
+    assert list(dump_multi_insert.lookup("ctd_user_defined", 2)) == []
+
+    columns = ["ctd_user_defined", "ctd_name"]
+    dump_multi_insert.create_index(columns)
+    rows = dump_multi_insert.lookup(columns, (0, "mw-undo"), convert_dtypes=True)
+    assert list(rows) == [[3, "mw-undo", 0, 58220]]
+
+
+def test_lookup_interleaved_gz(dump_multi_insert_gz):
+    pytest.importorskip("indexed_gzip")
+    dump_multi_insert_gz.build_gzip_index()
+    dump_multi_insert_gz.create_index("ctd_user_defined")
+    expected = list(dump_multi_insert_gz.lookup("ctd_user_defined", 0))
+    assert len(expected) > 20
+
+    # Both lookups read from the same gzip file object, at different
+    # offsets
+    first = dump_multi_insert_gz.lookup("ctd_user_defined", 0)
+    second = dump_multi_insert_gz.lookup("ctd_user_defined", 0)
+    rows = (list(islice(first, 20)), [])
+    for row in second:
+        rows[1].append(row)
+        rows[0].extend(islice(first, 1))
+    assert rows == (expected, expected)
+
+
+def test_lookup_raise_value_error(dump_multi_insert):
+    with pytest.raises(ValueError):
+        next(dump_multi_insert.lookup("ctd_name", "mw-undo"))
+    with pytest.raises(ValueError):
+        dump_multi_insert.create_index(["ctd_name", "unknown"])
+    dump_multi_insert.create_index(["ctd_name", "ctd_id"])
+    with pytest.raises(ValueError):
+        next(dump_multi_insert.lookup(["ctd_name", "ctd_id"], "mw-undo"))
+
+
+def test_build_gzip_index_raise_value_error_unzipped(dump_unzipped):
+    with pytest.raises(ValueError):
+        dump_unzipped.build_gzip_index()
+
+
+def test_rows_parallel_gz(monkeypatch, dump_multi_insert_gz):
+    pytest.importorskip("indexed_gzip")
+    monkeypatch.setattr("mwsql.dump._CHUNK_SIZE", 256)
+    dump_multi_insert_gz.build_gzip_index(spacing=64 * 1024)
+    serial = list(dump_multi_insert_gz.rows(convert_dtypes=True))
+    parallel = list(dump_multi_insert_gz.rows(convert_dtypes=True, workers=3))
+    assert len(serial) == 84
+    assert parallel == serial
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_rows_cached(monkeypatch, tmp_path, dump_multi_insert, workers):
+    monkeypatch.setattr("mwsql.dump._CHUNK_SIZE", 256)
+    cache_dir = tmp_path / "cache"
+    dump = Dump.from_file(dump_multi_insert._source_file, cache_dir=cache_dir)
+    expected = list(dump_multi_insert.rows(convert_dtypes=True))
+    unconverted = list(dump_multi_insert.rows())
+    assert list(dump.rows(convert_dtypes=True, workers=workers)) == expected
+    assert len(list(cache_dir.glob("*.mwcache"))) == 1
+
+    # Later calls read the rows from the cache without parsing
+    def fail(*args, **kwargs):
+        raise AssertionError("parsed the dump file")
+
+    monkeypatch.setattr("mwsql.dump._parse_lines", fail)
+    monkeypatch.setattr("mwsql.dump._parse_chunk", fail)
+    assert list(dump.rows(convert_dtypes=True)) == expected
+    assert list(dump.rows(workers=workers)) == unconverted
+
+
+def _collect(rows, n_rows=None):
+    async def collect():
+        collected = []
+        async for row in rows:
+            collected.append(row)
+            if len(collected) == n_rows:
+                break
+        return collected
+
+    return collect()
+
+
+@pytest.mark.parametrize("batch_size, prefetch", [(1, 1), (5, 2), (1024, 4)])
+def test_arows(dump_multi_insert, batch_size, prefetch):
+    expected = list(dump_multi_insert.rows(convert_dtypes=True, columns=["ctd_name"]))
+    rows = dump_multi_insert.arows(
+        batch_size, prefetch, convert_dtypes=True, columns=["ctd_name"]
+    )
+    assert asyncio.run(_collect(rows)) == expected
+
+
+def test_arows_concurrently(dump_gz, dump_multi_insert):
+    async def collect_both():
+        return await asyncio.gather(
+            _collect(dump_gz.arows(batch_size=3)),
+            _collect(dump_multi_insert.arows(batch_size=5, prefetch=1)),
+        )
+
+    first, second = asyncio.run(collect_both())
+    assert first == list(dump_gz.rows())
+    assert second == list(dump_multi_insert.rows())
+
+
+def test_arows_stop_early(dump_multi_insert):
+    async def stop_early():
+        rows = dump_multi_insert.arows(batch_size=2, prefetch=1)
+        collected = await _collect(rows, 3)
+        await rows.aclose()
+        return collected
+
+    assert asyncio.run(stop_early()) == list(dump_multi_insert.rows())[:3]
+
+
+def test_arows_raise_value_error(dump_gz):
+    with pytest.raises(ValueError):
+        asyncio.run(_collect(dump_gz.arows(columns=["nonexistent"])))
+    with pytest.raises(ValueError):
+        asyncio.run(_collect(dump_gz.arows(prefetch=0)))
+
+
+class _Abort(BaseException):
+    pass
+
+
+def _abort(val):
+    raise _Abort()
+
+
+def test_arows_raise_base_exception(dump_gz):
+    # Would hang if the error didn't reach the consumer
+    with pytest.raises(_Abort):
+        asyncio.run(_collect(dump_gz.arows(where={"ctd_count": _abort})))
+
+
+def test_batches(dump_unzipped_with_null_values):
+    batches = list(dump_unzipped_with_null_values.batches(batch_size=50))
+    assert [len(batch) for batch in batches] == [50, 34]
+    first = batches[0].to_pydict()
+    assert list(first) == dump_unzipped_with_null_values.col_names
+    assert first["ctd_id"][:4] == [None, 2, 3, 4]
+    assert first["ctd_name"][:4] == ["mw-replace?NULL", None, "mw-undo", "mw-rollback"]
+    assert first["ctd_user_defined"][:4] == [0, 0, None, 0]
+    assert first["ctd_count"][:4] == [10200, 305860, 58220, None]
+
+
+def test_batches_same_as_rows(dump_gz):
+    rows = list(dump_gz.rows(convert_dtypes=True))
+    columns = {name: [] for name in dump_gz.col_names}
+    for batch in dump_gz.batches(batch_size=10):
+        for name, values in batch.to_pydict().items():
+            columns[name].extend(values)
+    assert list(zip(*columns.values())) == [tuple(row) for row in rows]
+
+
+def test_to_parquet(tmp_path, dump_unzipped_with_null_values):
+    pq = pytest.importorskip("pyarrow.parquet")
+    parquet_filepath = tmp_path / "testfile.parquet"
+    dump_unzipped_with_null_values.to_parquet(
+        parquet_filepath, row_group_size=50, compression="zstd"
+    )
+    parquet_file = pq.ParquetFile(parquet_filepath)
+    assert parquet_file.metadata.num_row_groups == 2
+    assert parquet_file.metadata.row_group(0).column(0).compression == "ZSTD"
+    table = parquet_file.read()
+    assert table.column_names == dump_unzipped_with_null_values.col_names
+    assert str(table.schema.field("ctd_id").type) == "int64"
+    columns = {name: [] for name in dump_unzipped_with_null_values.col_names}
+    for batch in dump_unzipped_with_null_values.batches():
+        for name, values in batch.to_pydict().items():
+            columns[name].extend(values)
+    assert table.to_pydict() == columns
+
+
+def test_to_parquet_use_dictionary(tmp_path, dump_gz):
+    pq = pytest.importorskip("pyarrow.parquet")
+    parquet_filepath = tmp_path / "testfile.parquet"
+    dump_gz.to_parquet(parquet_filepath, use_dictionary=["ctd_user_defined"])
+    row_group = pq.ParquetFile(parquet_filepath).metadata.row_group(0)
+    assert "RLE_DICTIONARY" in row_group.column(2).encodings
+    assert "RLE_DICTIONARY" not in row_group.column(1).encodings
+
+
+def test_to_parquet_raise_value_error_unknown_column(tmp_path, dump_gz):
+    with pytest.raises(ValueError):
+        dump_gz.to_parquet(tmp_path / "testfile.parquet", use_dictionary=["foo"])
+
+
 expected_out_unconverted = [
     "['ctd_id', 'ctd_name', 'ctd_user_defined', 'ctd_count']",
     "['1', 'mw-replace', '0', '10200']",
@@ -183,3 +826,64 @@ def test_to_csv(dump_gz):
     assert content[50] == "83,repeated xwiki CoI abuse,0,48\n"
     assert content[-1] == "125,discussiontools-source-enhanced,0,341\n"
     os.remove(csv_filepath)
+
+
+def test_to_csv_null_and_convert_dtypes(tmp_path, dump_unzipped_with_null_values):
+    csv_filepath = tmp_path / "testfile.csv"
+    dump_unzipped_with_null_values.to_csv(csv_filepath, null="\\N")
+    with open(csv_filepath) as infile:
+        unconverted = infile.readlines()
+    assert unconverted[1] == "\\N,mw-replace?NULL,0,10200\n"
+    assert unconverted[2] == "2,\\N,0,305860\n"
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        dump_unzipped_with_null_values.to_csv(
+            csv_filepath, convert_dtypes=True, null="\\N"
+        )
+    with open(csv_filepath) as infile:
+        assert infile.readlines() == unconverted
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batches_and_to_csv_cached(monkeypatch, tmp_path, workers):
+    dump = Dump.from_file(FILEPATH_UNZIPPED_WITH_NULL_VALUES)
+    cached = Dump.from_file(FILEPATH_UNZIPPED_WITH_NULL_VALUES, cache_dir=tmp_path)
+    expected_batches = [batch.to_pydict() for batch in dump.batches(batch_size=50)]
+    expected_csv = {}
+    for convert_dtypes in (False, True):
+        dump.to_csv(tmp_path / "expected.csv", convert_dtypes, null="\\N")
+        expected_csv[convert_dtypes] = (tmp_path / "expected.csv").read_bytes()
+    expected_rows = list(dump.rows())
+    assert list(cached.rows(workers=workers)) == expected_rows
+    assert len(list(tmp_path.glob("*.mwcache"))) == 1
+
+    # NULL is cached as such, and later calls read it from the cache
+    def fail(*args, **kwargs):
+        raise AssertionError("parsed the dump file")
+
+    monkeypatch.setattr(Dump, "_parse_file", fail)
+    batches = [batch.to_pydict() for batch in cached.batches(batch_size=50)]
+    assert batches == expected_batches
+    for convert_dtypes in (False, True):
+        cached.to_csv(tmp_path / "cached.csv", convert_dtypes, null="\\N")
+        assert (tmp_path / "cached.csv").read_bytes() == expected_csv[convert_dtypes]
+    assert list(cached.rows()) == expected_rows
+
+
+def test_to_csv_gz(tmp_path, dump_gz):
+    csv_filepath = tmp_path / "testfile.csv"
+    dump_gz.to_csv(csv_filepath)
+    dump_gz.to_csv(tmp_path / "testfile.csv.gz", compression_threads=2)
+    with gzip.open(tmp_path / "testfile.csv.gz", "rb") as infile:
+        assert infile.read() == csv_filepath.read_bytes()
+
+
+def test_to_csv_zstd(tmp_path, dump_gz):
+    zstandard = pytest.importorskip("zstandard")
+    csv_filepath = tmp_path / "testfile.csv"
+    dump_gz.to_csv(csv_filepath)
+    dump_gz.to_csv(tmp_path / "testfile.csv.zst")
+    with open(tmp_path / "testfile.csv.zst", "rb") as infile:
+        content = zstandard.ZstdDecompressor().stream_reader(infile).read()
+    assert content == csv_filepath.read_bytes()
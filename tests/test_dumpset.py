@@ -0,0 +1,153 @@
+import csv
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pytest
+
+import mwsql.dumpset
+from mwsql import Dump, DumpSet
+from mwsql.dump import _START_METHOD
+
+from .helpers import split_inserts
+
+CURRENT_DIR = Path(__file__).parent
+DATA_DIR = CURRENT_DIR.parent / "data"
+FILEPATH_UNZIPPED = DATA_DIR / "testfile.sql"
+FILEPATH_UNZIPPED_WITH_NULL_VALUES = DATA_DIR / "testfile-with-null-values.sql"
+
+WIKIS = ["dewiki", "enwiki", "frwiki"]
+
+
+@pytest.fixture
+def dump_dir(tmp_path):
+    for db in WIKIS:
+        content = FILEPATH_UNZIPPED.read_text().replace("simplewiki", db)
+        (tmp_path / "source.sql").write_text(content)
+        split_inserts(tmp_path / "source.sql", tmp_path / f"{db}-page.sql", 5)
+    (tmp_path / "source.sql").unlink()
+    return tmp_path
+
+
+@pytest.fixture
+def dump_set(dump_dir):
+    return DumpSet.from_files(dump_dir / "*-page.sql")
+
+
+def _expected_rows(dump_dir, **kwargs):
+    return [
+        (db, row)
+        for db in WIKIS
+        for row in Dump.from_file(dump_dir / f"{db}-page.sql").rows(**kwargs)
+    ]
+
+
+class _UnpicklableError(Exception):
+    def __init__(self):
+        super().__init__("holds a lock")
+        self.lock = threading.Lock()
+
+
+def _raise_unpicklable_error(val):
+    raise _UnpicklableError()
+
+
+def _batch_rows(batch):
+    columns = batch.to_pydict()
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def test_from_files(dump_dir, dump_set):
+    assert [dump.db for dump in dump_set.dumps] == WIKIS
+    assert dump_set.name == "change_tag_def"
+    assert dump_set.col_names == Dump.from_file(FILEPATH_UNZIPPED).col_names
+    paths = [dump_dir / "enwiki-page.sql", FILEPATH_UNZIPPED]
+    assert len(DumpSet.from_files(paths)) == 2
+
+
+def test_from_files_raise_file_not_found_error(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        DumpSet.from_files(tmp_path / "*.sql.gz")
+
+
+def test_raise_value_error_incompatible_schemas(tmp_path):
+    content = FILEPATH_UNZIPPED.read_text().replace("ctd_count", "ctd_total")
+    (tmp_path / "other.sql").write_text(content)
+    with pytest.raises(ValueError):
+        DumpSet.from_files([FILEPATH_UNZIPPED, tmp_path / "other.sql"])
+    with pytest.raises(ValueError):
+        DumpSet([])
+
+
+def test_rows(dump_dir, dump_set):
+    assert list(dump_set.rows()) == _expected_rows(dump_dir)
+    assert list(dump_set) == _expected_rows(dump_dir)
+
+
+@pytest.mark.parametrize("prefetch", [1, 16])
+def test_rows_parallel(dump_dir, dump_set, prefetch):
+    kwargs = {"convert_dtypes": True, "where": {"ctd_user_defined": 0}}
+    rows = list(dump_set.rows(workers=2, batch_size=4, prefetch=prefetch, **kwargs))
+    # Rows of different dumps are interleaved, but each dump's are in order
+    assert sorted(rows, key=lambda row: row[0]) == _expected_rows(dump_dir, **kwargs)
+
+
+def test_rows_parallel_start_method(monkeypatch, dump_dir, dump_set):
+    contexts = []
+
+    class Executor(ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            contexts.append(kwargs.get("mp_context"))
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(mwsql.dumpset, "ProcessPoolExecutor", Executor)
+    rows = list(dump_set.rows(workers=2))
+    assert sorted(rows, key=lambda row: row[0]) == _expected_rows(dump_dir)
+    assert [context.get_start_method() for context in contexts] == [_START_METHOD]
+
+
+def test_rows_parallel_stop_early(dump_set):
+    rows = dump_set.rows(workers=2, batch_size=1, prefetch=1)
+    assert len([next(rows) for _ in range(3)]) == 3
+    rows.close()
+
+
+def test_rows_parallel_raise_value_error(dump_set):
+    with pytest.raises(ValueError):
+        list(dump_set.rows(workers=2, columns=["nonexistent"]))
+
+
+def test_rows_parallel_raise_unpicklable_error(dump_set):
+    where = {"ctd_count": _raise_unpicklable_error}
+    with pytest.raises(RuntimeError, match="_UnpicklableError"):
+        list(dump_set.rows(workers=2, where=where))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_to_csv(tmp_path, dump_dir, dump_set, workers):
+    file_path = tmp_path / "merged.csv"
+    dump_set.to_csv(file_path, workers=workers, null="\\N")
+    with open(file_path, newline="") as infile:
+        rows = list(csv.reader(infile))
+    assert rows[0] == ["db", *dump_set.col_names]
+    expected = [[db, *row] for db, row in _expected_rows(dump_dir)]
+    assert sorted(rows[1:], key=lambda row: row[0]) == expected
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_to_parquet(tmp_path, dump_dir, workers):
+    pq = pytest.importorskip("pyarrow.parquet")
+    dump_set = DumpSet.from_files(
+        [dump_dir / "enwiki-page.sql", FILEPATH_UNZIPPED_WITH_NULL_VALUES]
+    )
+    file_path = tmp_path / "merged.parquet"
+    dump_set.to_parquet(file_path, workers=workers)
+    table = pq.read_table(file_path).sort_by("db")
+    assert table.column_names == ["db", *dump_set.col_names]
+    expected = [
+        {"db": dump.db, **row}
+        for dump in dump_set.dumps
+        for batch in dump.batches()
+        for row in _batch_rows(batch)
+    ]
+    assert table.to_pylist() == sorted(expected, key=lambda row: row["db"])
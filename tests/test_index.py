@@ -0,0 +1,120 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from mwsql.index import (
+    _build_column_index,
+    _build_index,
+    _column_index_path,
+    _encode_key,
+    _index_path,
+    _KeyIndex,
+    _read_column_index,
+    _read_index,
+)
+
+statements = [
+    (0, 10, (1, 5), (1, 9)),
+    (10, 20, (1, 9), (3, 2)),
+    (20, 30, (4, 0), (4, 7)),
+    (35, 40, (5, 1), (6, 0)),
+]
+
+
+def test__key_index_find():
+    index = _KeyIndex(["pl_from", "pl_target_id"], statements)
+    assert index.is_sorted
+    assert len(index) == 4
+    assert index.find((1, 9), (1, 9), inclusive=True) == [(0, 20)]
+    assert index.find((2,), (3,)) == [(10, 20)]
+    assert index.find((3, 5), (5, 1)) == [(20, 30)]
+    assert index.find((3, 5), (5, 1), inclusive=True) == [(20, 30), (35, 40)]
+    assert index.find(None, (1, 7)) == [(0, 10)]
+    assert index.find((6, 1), None) == []
+    assert index.find(None, None) == [(0, 30), (35, 40)]
+
+
+def test__key_index_find_unsorted():
+    index = _KeyIndex(["pl_from", "pl_target_id"], statements[::-1])
+    assert not index.is_sorted
+    assert index.find((2,), (3,)) == [(10, 20)]
+    assert index.find((4, 3), (4, 3), inclusive=True) == [(20, 30)]
+
+
+def test__build_index(tmp_path):
+    file_path = tmp_path / "pagelinks.sql"
+    lines = [
+        "-- Database: enwiki\n",
+        "INSERT INTO `pagelinks` VALUES (1,'b',0),(1,'a',0);\n",
+        "INSERT INTO `pagelinks` VALUES (2,'It\\'s',14);\n",
+    ]
+    file_path.write_text("".join(lines))
+    col_names = ["pl_from", "pl_title", "pl_namespace"]
+    dtypes = {"pl_from": int, "pl_title": str, "pl_namespace": int}
+    index_path = _build_index(
+        file_path, "utf-8", col_names, dtypes, ["pl_from", "pl_title"]
+    )
+    assert index_path == _index_path(file_path)
+
+    index = _read_index(file_path, "utf-8")
+    assert index.columns == ["pl_from", "pl_title"]
+    start = len(lines[0])
+    end = start + len(lines[1])
+    assert index.statements == [
+        (start, end, (1, "a"), (1, "b")),
+        (end, end + len(lines[2]), (2, "It's"), (2, "It's")),
+    ]
+    assert _read_index(file_path, "latin-1") is None
+    os.utime(file_path, ns=(0, 0))
+    assert _read_index(file_path, "utf-8") is None
+
+
+def test__read_index_missing(tmp_path):
+    assert _read_index(Path(tmp_path, "missing.sql"), "utf-8") is None
+
+
+def test__encode_key():
+    dtypes = [int, str, float]
+    key = _encode_key([b"12", "Straße".encode(), b"0.50"], dtypes, "utf-8")
+    assert key == _encode_key([12, "Straße", 0.5], dtypes, "utf-8")
+    assert key == _encode_key(["12", b"Stra\xc3\x9fe", "0.5"], dtypes, "utf-8")
+    assert key != _encode_key([12, "Strasse", 0.5], dtypes, "utf-8")
+    assert _encode_key([b""], [int], "utf-8") == b""
+
+
+@pytest.mark.parametrize("run_size", [2, 1000])
+def test__build_column_index(tmp_path, run_size):
+    file_path = tmp_path / "categorylinks.sql"
+    lines = [
+        "-- Database: enwiki\n",
+        "INSERT INTO `categorylinks` VALUES (1,'A',0),(2,'B',0),(3,'A',14);\n",
+        "INSERT INTO `categorylinks` VALUES (4,'C',0),(5,NULL,0);\n",
+        "INSERT INTO `categorylinks` VALUES (6,'A',0);\n",
+    ]
+    file_path.write_text("".join(lines))
+    offsets = [sum(map(len, lines[:i])) for i in range(1, len(lines) + 1)]
+    col_names = ["cl_from", "cl_to", "cl_namespace"]
+    dtypes = {"cl_from": int, "cl_to": str, "cl_namespace": int}
+
+    index_path = _build_column_index(
+        file_path, "utf-8", col_names, dtypes, ["cl_to"], run_size
+    )
+    assert index_path == _column_index_path(file_path, ["cl_to"])
+    index = _read_column_index(file_path, "utf-8", ["cl_to"])
+    assert len(index) == 4
+    assert index.find(b"A") == [(offsets[0], offsets[1]), (offsets[2], offsets[3])]
+    assert index.find(b"C") == [(offsets[1], offsets[2])]
+    assert index.find(b"D") == []
+    index.close()
+
+    columns = ["cl_namespace", "cl_to"]
+    _build_column_index(file_path, "utf-8", col_names, dtypes, columns, run_size)
+    index = _read_column_index(file_path, "utf-8", columns)
+    key = _encode_key([14, "A"], [int, str], "utf-8")
+    assert index.find(key) == [(offsets[0], offsets[1])]
+    index.close()
+
+    assert _read_column_index(file_path, "utf-8", ["cl_from"]) is None
+    os.utime(file_path, ns=(0, 0))
+    assert _read_column_index(file_path, "utf-8", ["cl_to"]) is None
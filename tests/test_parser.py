@@ -1,12 +1,30 @@
+import pickle
+
 import pytest
 
 from mwsql.parser import (
+    _compile_converter,
+    _compile_filter,
+    _compile_filters,
     _convert,
+    _convert_rows,
+    _Dictionary,
     _get_sql_attribute,
     _has_sql_attribute,
+    _Interned,
     _map_dtypes,
+    _match_records,
     _parse,
+    _parse_buffer,
+    _parse_byte_lines,
+    _parse_header,
+    _record_class,
+    _split_records,
     _split_tuples,
+    _tokenize,
+    _tokenize_bytes,
+    _unescape,
+    _unescape_bytes,
 )
 
 metadata = {
@@ -55,6 +73,46 @@ metadata = {
 }
 
 
+def test__parse_header():
+    header = "\n".join(metadata[i] for i in range(41)) + "\n"
+    assert _parse_header(header) == {
+        "database": "simplewiki",
+        "table_name": "change_tag_def",
+        "col_names": ["ctd_id", "ctd_name", "ctd_user_defined", "ctd_count"],
+        "sql_dtypes": {
+            "ctd_id": "int(10) unsigned NOT NULL AUTO_INCREMENT",
+            "ctd_name": "varbinary(255) NOT NULL",
+            "ctd_user_defined": "tinyint(1) NOT NULL",
+            "ctd_count": "bigint(20) unsigned NOT NULL DEFAULT 0",
+        },
+        "primary_key": ["ctd_id"],
+    }
+
+
+def test__parse_header_composite_key():
+    header = (
+        "CREATE TABLE `pagelinks` (\n"
+        "  `pl_from` int(8) unsigned NOT NULL DEFAULT 0,\n"
+        "  `pl_target_id` bigint(20) unsigned NOT NULL\n"
+        "  PRIMARY KEY (`pl_from`,`pl_target_id`)\n"
+        ") ENGINE=InnoDB DEFAULT CHARSET=binary;\n"
+    )
+    parsed = _parse_header(header)
+    assert parsed["col_names"] == ["pl_from", "pl_target_id"]
+    assert parsed["sql_dtypes"]["pl_target_id"] == "bigint(20) unsigned NOT NULL"
+    assert parsed["primary_key"] == ["pl_from", "pl_target_id"]
+
+
+def test__parse_header_missing():
+    assert _parse_header(metadata[0] + "\n") == {
+        "database": None,
+        "table_name": None,
+        "col_names": [],
+        "sql_dtypes": {},
+        "primary_key": None,
+    }
+
+
 @pytest.mark.parametrize(
     "line,attr,expected",
     [
@@ -219,6 +277,137 @@ def test__convert_raise_value_error_wrong_length():
         _convert(convert_testdata[2], conv_dtypes, strict=True)
 
 
+def test__convert_rows_non_strict():
+    rows = [convert_testdata[0], convert_testdata[2], convert_testdata[0]]
+    expected = [expected_output[0], expected_output[2], expected_output[0]]
+    assert _convert_rows(rows, conv_dtypes, strict=False) == expected
+
+
+def test__convert_rows_same_as__convert():
+    rows = [convert_testdata[0], convert_testdata[1]]
+    with pytest.warns(UserWarning):
+        converted = _convert_rows(rows, conv_dtypes, strict=False)
+    with pytest.warns(UserWarning):
+        assert converted == [_convert(row, conv_dtypes) for row in rows]
+
+
+@pytest.mark.parametrize(
+    "rows,expected",
+    [
+        ([["1", "2"], ["3", "4"]], [[1, 2.0], [3, 4.0]]),
+        ([["1", ""], ["", "4"]], [[1, ""], ["", 4.0]]),
+        ([], []),
+    ],
+)
+def test__convert_rows_numerical(rows, expected):
+    assert _convert_rows(rows, [int, float]) == expected
+
+
+def test__convert_rows_raise_value_error_wrong_dtype():
+    with pytest.raises(ValueError):
+        _convert_rows(
+            [convert_testdata[0], convert_testdata[1]], conv_dtypes, strict=True
+        )
+
+
+def test__convert_rows_raise_value_error_wrong_length():
+    with pytest.raises(ValueError):
+        _convert_rows(
+            [convert_testdata[0], convert_testdata[2]], conv_dtypes, strict=True
+        )
+
+
+def test__compile_converter_keeps_none():
+    convert_rows = _compile_converter([int, str, float], strict=True)
+    rows = [["1", None, None], [None, "a", "0.5"]]
+    assert convert_rows(rows) == [[1, None, None], [None, "a", 0.5]]
+
+
+def test__compile_converter():
+    convert_rows = _compile_converter(conv_dtypes)
+    rows = [convert_testdata[0], convert_testdata[0]]
+    assert convert_rows(rows) == [expected_output[0], expected_output[0]]
+
+
+def test__compile_converter_same_as__convert():
+    convert_rows = _compile_converter(conv_dtypes)
+    rows = [convert_testdata[0], convert_testdata[1], convert_testdata[2]]
+    with pytest.warns(UserWarning):
+        converted = convert_rows(rows)
+    with pytest.warns(UserWarning):
+        assert converted == [_convert(row, conv_dtypes) for row in rows]
+
+
+@pytest.mark.parametrize(
+    "dtypes,rows,expected",
+    [
+        ([int], [["1"], ["2"]], [[1], [2]]),
+        ([float, int], [["1", ""], ["0.5", "2"]], [[1.0, ""], [0.5, 2]]),
+        ([int, int], [], []),
+    ],
+)
+def test__compile_converter_numerical(dtypes, rows, expected):
+    assert _compile_converter(dtypes)(rows) == expected
+
+
+def test__compile_converter_str_passthrough():
+    rows = [["a", "b"], ["c"]]
+    assert _compile_converter([str, str])(rows) is rows
+    with pytest.raises(ValueError):
+        _compile_converter([str, str], strict=True)(rows)
+
+
+@pytest.mark.parametrize("row_type", [tuple, _record_class("t", ("a", "b", "c"))])
+def test__compile_converter_row_type(row_type):
+    rows = [convert_testdata[0], convert_testdata[0]]
+    converted = _compile_converter(conv_dtypes, row_type=row_type)(rows)
+    assert all(type(row) is row_type for row in converted)
+    assert converted == [tuple(expected_output[0])] * 2
+    with pytest.warns(UserWarning):
+        converted = _compile_converter(conv_dtypes, row_type=row_type)(
+            [convert_testdata[1]]
+        )
+    assert type(converted[0]) is row_type
+    converted = _compile_converter([str, str], row_type=row_type)([["a", "b"]])
+    assert converted == [("a", "b")] and type(converted[0]) is row_type
+
+
+def test__compile_converter_lookups():
+    dictionary, interned = _Dictionary(), _Interned()
+    convert_rows = _compile_converter(
+        [int, str, str], row_type=tuple, lookups={1: dictionary, 2: interned}
+    )
+    rows = [["1", "a", "x" * 10], ["2", "b", "x" * 10], ["3", "a", "y"]]
+    converted = convert_rows(rows)
+    assert converted == [(1, 0, "x" * 10), (2, 1, "x" * 10), (3, 0, "y")]
+    assert converted[0][2] is converted[1][2]
+    assert dictionary.by_code == ["a", "b"]
+    # Rows of the wrong length are looked up by _lookup_rows
+    with pytest.warns(UserWarning):
+        assert convert_rows([["x", "c", "y"], ["4", "a"]]) == [("x", 2, "y"), ("4", 0)]
+    assert dictionary.by_code == ["a", "b", "c"]
+
+
+def test__record_class():
+    record_class = _record_class("change_tag_def", ("ctd_id", "ctd_name", "class"))
+    assert record_class is _record_class(
+        "change_tag_def", ("ctd_id", "ctd_name", "class")
+    )
+    row = record_class(1, "mw-replace", "x")
+    assert row == (1, "mw-replace", "x")
+    assert (row.ctd_id, row._2) == (1, "x")
+    assert repr(row).startswith("ChangeTagDef(ctd_id=1")
+    assert not hasattr(row, "__dict__")
+    unpickled = pickle.loads(pickle.dumps(row))
+    assert unpickled == row and type(unpickled) is record_class
+
+
+def test__compile_converter_raise_value_error_wrong_dtype():
+    convert_rows = _compile_converter(conv_dtypes, strict=True)
+    with pytest.raises(ValueError):
+        convert_rows([convert_testdata[0], convert_testdata[1]])
+
+
 tuples_testdata = [
     "INSERT INTO `page` VALUES (10,0,'AccessibleComputing','',1,0,0.33167112649574004,'20210607122734','20210606191631',1002250816,111,'wikitext',NULL),(12,0,'Anarchism','',0,0,0.786172332974311,'20210701093040','20210701093138',1030472204,96584,'wikitext',NULL)",
     "INSERT INTO `page` VALUES (289,0,'ActresseS','',1,0,0.8987093492399061,'20210607122734','20210606191634',907518426,109,'wikitext',NULL),(290,0,'A','',0,0,0.854180265082214,'20210629155037','20210629155404',1031061699,28174,'wikitext',NULL),(291,0,'AnarchoCapitalism','',1,0,0.574773308424999,'20210621014117','20210606191634',783865104,86,'wikitext',NULL);",
@@ -290,3 +479,272 @@ def test__split_tuples(tuples_testdata, expected_split):
 )
 def test__parse(tuples_testdata, expected_parse):
     assert next(_parse(tuples_testdata)) == expected_parse
+
+
+@pytest.mark.parametrize(
+    "tuples_testdata,expected_parse",
+    [
+        (tuples_testdata[0], expected_parse[0]),
+        (tuples_testdata[1], expected_parse[1]),
+    ],
+)
+def test__tokenize(tuples_testdata, expected_parse):
+    assert next(_tokenize(tuples_testdata)) == expected_parse
+
+
+def test__tokenize_same_as__parse():
+    for line in tuples_testdata:
+        assert list(_tokenize(line)) == list(_parse(line))
+
+
+def test__tokenize_quoted_record_separator():
+    line = "INSERT INTO `page` VALUES (1,'A),(B',0),(2,'C',1);"
+    assert list(_tokenize(line)) == [["1", "A),(B", "0"], ["2", "C", "1"]]
+
+
+def test__tokenize_null():
+    line = "INSERT INTO `page` VALUES (NULL,'NULL',''),(2,NULL,'x');"
+    assert list(_tokenize(line)) == [["", "NULL", ""], ["2", "", "x"]]
+    assert list(_tokenize(line, null=None)) == [[None, "NULL", ""], ["2", None, "x"]]
+
+
+def test__tokenize_without_strings():
+    line = "INSERT INTO `pagelinks` VALUES (1,0,10),(2,NULL,-3),(3,1,1.5e-05);"
+    assert list(_tokenize(line, null=None)) == [
+        ["1", "0", "10"],
+        ["2", None, "-3"],
+        ["3", "1", "1.5e-05"],
+    ]
+
+
+def test__tokenize_escapes():
+    line = r"INSERT INTO `page` VALUES (1,'It\'s','a\nb','c\\'),(2,'\%','\\','');"
+    assert list(_tokenize(line)) == [
+        ["1", "It's", "a\nb", "c\\"],
+        ["2", "\\%", "\\", ""],
+    ]
+
+
+def test__tokenize_columns():
+    line = r"INSERT INTO `page` VALUES (1,'It\'s',NULL,'x'),(2,'a,b',0,NULL);"
+    assert list(_tokenize(line, null=None, columns=[0, 2])) == [
+        ["1", None],
+        ["2", "0"],
+    ]
+    assert list(_tokenize(line, columns=[1, 3])) == [["It's", "x"], ["a,b", ""]]
+    line = "INSERT INTO `pagelinks` VALUES (1,0,10),(2,NULL,-3);"
+    assert list(_tokenize(line, null=None, columns=[1])) == [["0"], [None]]
+    assert list(_tokenize_bytes(line.encode(), columns=[0, 2])) == [
+        [b"1", b"10"],
+        [b"2", b"-3"],
+    ]
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "INSERT INTO `page` VALUES (1,'a',0),(2,'b',1);",
+        "INSERT INTO `pagelinks` VALUES (1,0),(2,1);",
+    ],
+)
+def test__tokenize_columns_raise_value_error_out_of_range(line):
+    with pytest.raises(ValueError):
+        list(_tokenize(line, columns=[0, 3]))
+
+
+@pytest.mark.parametrize(
+    "dtype,condition,binary,kept,rejected",
+    [
+        (int, 0, False, ["0"], ["1", "", "00"]),
+        (int, [0, "14"], True, [b"0", b"14"], [b"1", b""]),
+        (float, 0.5, False, ["0.5", "0.50"], ["1", ""]),
+        (str, {"a", "b"}, False, ["a", "b"], ["c", ""]),
+        (str, "Straße", True, ["Straße".encode()], [b"Strasse"]),
+        (int, None, False, [""], ["0", "None"]),
+        (int, [None, 1], True, [b"", b"1"], [b"0", b"None"]),
+        (float, [None, 0.5], False, ["", "0.5"], ["1", "None", "nan"]),
+        (str, None, False, [""], ["None", "a"]),
+        (int, lambda val: val > 1, False, ["2"], ["1", ""]),
+        (str, str.isupper, False, ["AB"], ["ab"]),
+    ],
+)
+def test__compile_filter(dtype, condition, binary, kept, rejected):
+    test = _compile_filter(dtype, condition, binary)
+    assert all(test(val) for val in kept)
+    assert not any(test(val) for val in rejected)
+
+
+def test__tokenize_filters():
+    filters = _compile_filters([(2, int, 0), (1, str, ["a", "It's", "c"])])
+    line = r"INSERT INTO `t` VALUES (1,'It\'s',0),(2,'b',0),(3,'c',1),(4,'a',NULL);"
+    assert list(_tokenize(line, filters=filters)) == [["1", "It's", "0"]]
+    assert list(_tokenize(line, columns=[0], filters=filters)) == [["1"]]
+    filters = _compile_filters([(1, int, [0, 1])], binary=True)
+    line = b"INSERT INTO `t` VALUES (1,0,10),(2,NULL,-3),(3,1,1.5e-05);"
+    assert list(_tokenize_bytes(line, filters=filters, columns=[0, 2])) == [
+        [b"1", b"10"],
+        [b"3", b"1.5e-05"],
+    ]
+
+
+def test__tokenize_filters_null():
+    filters = _compile_filters([(1, int, None)])
+    line = "INSERT INTO `t` VALUES (1,0),(2,NULL),(3,1),(4,NULL);"
+    assert list(_tokenize(line, columns=[0], filters=filters)) == [["2"], ["4"]]
+
+
+def test__tokenize_filters_uneven_records():
+    filters = _compile_filters([(0, int, 2)])
+    line = "INSERT INTO `t` VALUES (1,0),(2,NULL,3);"
+    assert list(_tokenize(line, filters=filters)) == [["2", "", "3"]]
+    with pytest.raises(ValueError):
+        list(_tokenize(line, filters=_compile_filters([(2, int, 3)])))
+
+
+@pytest.mark.parametrize("binary", [False, True])
+@pytest.mark.parametrize(
+    "values",
+    [
+        "(1,'A),(B',0),(2,'C',1)",
+        "(1,'',''),(2,'x','')",
+        r"(1,'It\'s','a\nb','c\\'),(2,'\%','\\\'','')",
+        "(1,'Über_Straße',-1.5),(2,'\\0',0)",
+        r"(1,'\"a\"\\\\n','\q\\'),(2,'\_\Z','\\\\\'')",
+    ],
+)
+def test__split_records_same_as__match_records(values, binary):
+    if binary:
+        values = values.encode("utf-8")
+    expected = list(_match_records(values, binary, None))
+    assert list(_split_records(values, binary)) == expected
+    filters = _compile_filters([(0, int, [1])], binary=binary)
+    expected = list(_match_records(values, binary, None, [1], filters))
+    assert list(_split_records(values, binary, [1], filters)) == expected
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test__split_records_few_escapes(binary):
+    records = [f"({i},'title_{i}')" for i in range(2000)]
+    records[0] = r"(0,'It\'s')"
+    records[700] = r"(700,'a\\b\nc')"
+    records[-1] = r"(1999,'end\"')"
+    values = ",".join(records)
+    if binary:
+        values = values.encode("utf-8")
+    rows = list(_split_records(values, binary))
+    assert rows == list(_match_records(values, binary, None))
+    if binary:
+        rows = [[val.decode("utf-8") for val in row] for row in rows]
+    assert rows[0] == ["0", "It's"]
+    assert rows[700] == ["700", "a\\b\nc"]
+    assert rows[-1] == ["1999", 'end"']
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        "(1,'a\x01b')",
+        "(1,'a\x03b')",
+        "(1,'a\x00b')",
+        "(1,'a'b)",
+        "(1,'a'),(2)",
+        "(1,'a)",
+        "(1,'a'),('b',2)",
+        "(1,'a'),(2,NULL)",
+    ],
+)
+def test__split_records_not_split(values):
+    assert _split_records(values, False) is None
+
+
+def test__tokenize_raise_value_error_malformed():
+    line = "INSERT INTO `page` VALUES (1,'a',0),(2,'b');"
+    with pytest.raises(ValueError):
+        list(_tokenize(line))
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        *tuples_testdata,
+        "INSERT INTO `page` VALUES (1,'A),(B',0),(2,'C',1);",
+        "INSERT INTO `page` VALUES (NULL,'NULL',''),(2,NULL,'x');",
+        "INSERT INTO `pagelinks` VALUES (1,0,10),(2,NULL,-3),(3,1,1.5e-05);",
+        r"INSERT INTO `page` VALUES (1,'It\'s','a\nb','c\\'),(2,'\%','\\','');",
+        "INSERT INTO `page` VALUES (1,'Über_Straße',0);",
+    ],
+)
+def test__tokenize_bytes_same_as__tokenize(line):
+    expected = [
+        [None if val is None else val.encode("utf-8") for val in row]
+        for row in _tokenize(line, null=None)
+    ]
+    assert list(_tokenize_bytes(line.encode("utf-8"), null=None)) == expected
+
+
+def test__tokenize_bytes_raise_value_error_malformed():
+    line = b"INSERT INTO `page` VALUES (1,'a',0),(2,'b');"
+    with pytest.raises(ValueError):
+        list(_tokenize_bytes(line))
+
+
+def test__unescape_bytes():
+    assert _unescape_bytes(rb"It\'s a\tb \%") == b"It's a\tb \\%"
+
+
+def test__parse_byte_lines():
+    lines = [
+        b"-- Host: localhost    Database: simplewiki\n",
+        b"INSERT INTO `t` VALUES (1,'a',NULL),(2,'b',0.5);\n",
+        b"INSERT INTO `t` VALUES (3,'',1.5);\n",
+    ]
+    assert list(_parse_byte_lines(lines)) == [
+        [b"1", b"a", b""],
+        [b"2", b"b", b"0.5"],
+        [b"3", b"", b"1.5"],
+    ]
+    converter = _compile_converter([int, str, float])
+    assert list(_parse_byte_lines(lines, converter)) == [
+        [1, b"a", b""],
+        [2, b"b", 0.5],
+        [3, b"", 1.5],
+    ]
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        ("no escapes", "no escapes"),
+        (r"It\'s", "It's"),
+        (r"tab\there", "tab\there"),
+        (r"\0", "\x00"),
+        (r"back\\slash", "back\\slash"),
+    ],
+)
+def test__unescape(value, expected):
+    assert _unescape(value) == expected
+
+
+def test__parse_buffer():
+    buffer = (
+        b"-- Host: localhost    Database: simplewiki\n"
+        b"-- INSERT INTO in a comment\n"
+        b"INSERT INTO `t` VALUES (1,'a',NULL),(2,'b\\'c',0.5);\n"
+        b"INSERT INTO `t` VALUES (3,'\xc3\xbc',1.5);"
+    )
+    assert list(_parse_buffer(buffer, null=b"")) == [
+        [b"1", b"a", b""],
+        [b"2", b"b'c", b"0.5"],
+        [b"3", "ü".encode("utf-8"), b"1.5"],
+    ]
+    assert list(_parse_buffer(buffer, encoding="utf-8", null=None)) == [
+        ["1", "a", None],
+        ["2", "b'c", "0.5"],
+        ["3", "ü", "1.5"],
+    ]
+    converter = _compile_converter([int, str, float])
+    second = buffer.index(b"INSERT INTO `t` VALUES (3")
+    assert list(_parse_buffer(buffer, converter, "utf-8", start=second)) == [
+        [3, "ü", 1.5]
+    ]
+    assert len(list(_parse_buffer(buffer, end=second))) == 2
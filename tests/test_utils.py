@@ -1,13 +1,43 @@
+import bz2
+import gzip
+import hashlib
+import io
+import lzma
 import os
+import random
+import shutil
 from pathlib import Path, PosixPath
 
 import pytest
 import requests
 
+import mwsql.utils
 from mwsql import head, load
-from mwsql.utils import _open_file
+from mwsql.utils import (
+    _build_gzip_index,
+    _compression,
+    _gzip_index_path,
+    _GzipWriter,
+    _has_gzip_index,
+    _mmap_file,
+    _open_binary,
+    _open_file,
+    _open_output,
+    _read_ahead,
+    _read_checksum,
+    _read_chunks,
+    _read_header,
+    _read_lines,
+    _read_schema,
+    _schema_path,
+    _split_file,
+    _ThreadedReader,
+    _write_schema,
+    download_file,
+    register_codec,
+)
 
-from .helpers import Capturing
+from .helpers import Capturing, FileServer, split_inserts
 
 # from urllib.error import HTTPError
 
@@ -50,6 +80,216 @@ def test_load_HTTPError():
         load("simplewiki", "non-existing-filename", "latest")
 
 
+@pytest.fixture
+def file_server():
+    data = random.Random(0).randbytes(10_000)
+    with FileServer({"page.sql.gz": data}) as server:
+        yield server
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_download_file(tmp_path, file_server, workers):
+    file_path = tmp_path / "page.sql.gz"
+    url = file_server.url("page.sql.gz")
+    assert download_file(url, str(file_path), workers, 1000) == file_path
+    assert file_path.read_bytes() == file_server.files["page.sql.gz"]
+    assert sorted(file_server.requests) == [
+        (i, i + 1000) for i in range(0, 10_000, 1000)
+    ]
+    assert os.listdir(tmp_path) == ["page.sql.gz"]
+
+
+def test_download_file_retries_dropped_connections(monkeypatch, tmp_path, file_server):
+    monkeypatch.setattr("mwsql.utils._DOWNLOAD_BLOCK_SIZE", 500)
+    file_path = tmp_path / "page.sql.gz"
+    file_server.drops = 3
+    download_file(file_server.url("page.sql.gz"), str(file_path), 1, 4000)
+    assert file_path.read_bytes() == file_server.files["page.sql.gz"]
+    # Each dropped request is resumed from the last byte received
+    assert file_server.requests[:4] == [
+        (0, 4000),
+        (2000, 4000),
+        (3000, 4000),
+        (3500, 4000),
+    ]
+
+
+def test_download_file_resume(monkeypatch, tmp_path, file_server):
+    monkeypatch.setattr("mwsql.utils._DOWNLOAD_RETRIES", 0)
+    file_path = tmp_path / "page.sql.gz"
+    url = file_server.url("page.sql.gz")
+    file_server.broken_from = 5000
+    with pytest.raises(RuntimeError):
+        download_file(url, str(file_path), 1, 1000)
+    assert not file_path.exists()
+
+    # Only the segments that are missing are downloaded again
+    file_server.broken_from = None
+    file_server.requests.clear()
+    download_file(url, str(file_path), 1, 1000)
+    assert file_path.read_bytes() == file_server.files["page.sql.gz"]
+    assert file_server.requests == [(i, i + 1000) for i in range(5000, 10_000, 1000)]
+    assert os.listdir(tmp_path) == ["page.sql.gz"]
+
+    # The partial file is not reused once the file changed on the server
+    file_server.broken_from = 5000
+    with pytest.raises(RuntimeError):
+        download_file(url, str(file_path), 1, 1000)
+    file_server.broken_from = None
+    file_server.etag = '"2"'
+    file_server.requests.clear()
+    download_file(url, str(file_path), 1, 1000)
+    assert len(file_server.requests) == 10
+
+
+def test_download_file_without_range_requests(tmp_path, file_server):
+    file_server.ranges = False
+    file_path = tmp_path / "page.sql.gz"
+    download_file(file_server.url("page.sql.gz"), str(file_path), 3, 1000)
+    assert file_path.read_bytes() == file_server.files["page.sql.gz"]
+    assert file_server.requests == [(0, 10_000)]
+
+
+def test_download_file_checksum(tmp_path, file_server):
+    file_path = tmp_path / "page.sql.gz"
+    url = file_server.url("page.sql.gz")
+    sha1 = hashlib.sha1(file_server.files["page.sql.gz"]).hexdigest()
+    download_file(url, str(file_path), checksum=sha1.upper())
+    assert file_path.exists()
+    os.remove(file_path)
+    with pytest.raises(RuntimeError):
+        download_file(url, str(file_path), checksum=hashlib.md5(b"").hexdigest())
+    assert os.listdir(tmp_path) == []
+
+
+def test__read_checksum(file_server):
+    file_server.files["sha1sums.txt"] = b"123abc  page.sql.gz\n456def  pages.sql.gz\n"
+    assert _read_checksum(file_server.url("sha1sums.txt"), "page.sql.gz") == "123abc"
+    with pytest.warns(UserWarning, match="site.sql.gz is not verified"):
+        assert _read_checksum(file_server.url("sha1sums.txt"), "site.sql.gz") is None
+    with pytest.warns(UserWarning, match="checksums could not be read"):
+        assert _read_checksum(file_server.url("md5sums.txt"), "page.sql.gz") is None
+    file_server.errors["sha1sums.txt"] = 503
+    with pytest.warns(UserWarning, match="checksums could not be read"):
+        assert _read_checksum(file_server.url("sha1sums.txt"), "page.sql.gz") is None
+
+
+def test__read_checksum_latest(file_server):
+    file_server.files["sha1sums.txt"] = (
+        b"123abc  enwiki-20240601-page.sql.gz\n"
+        b"456def  enwiki-20240601-pagelinks.sql.gz\n"
+    )
+    url = file_server.url("sha1sums.txt")
+    assert _read_checksum(url, "enwiki-latest-page.sql.gz") == "123abc"
+    assert _read_checksum(url, "enwiki-20240601-pagelinks.sql.gz") == "456def"
+    with pytest.warns(UserWarning):
+        assert _read_checksum(url, "enwiki-20240501-page.sql.gz") is None
+
+
+def _compress(data, codec):
+    if codec == "zstd":
+        zstandard = pytest.importorskip("zstandard")
+        # Two frames, as written by multi-threaded compressors
+        compressor = zstandard.ZstdCompressor()
+        half = len(data) // 2
+        return compressor.compress(data[:half]) + compressor.compress(data[half:])
+    return {"gzip": gzip, "bz2": bz2, "xz": lzma}[codec].compress(data)
+
+
+@pytest.mark.parametrize("codec", ["gzip", "bz2", "xz", "zstd"])
+@pytest.mark.parametrize("decompression_thread", [False, True])
+def test__open_binary_codecs(tmp_path, codec, decompression_thread):
+    data = FILEPATH_UNZIPPED.read_bytes()
+    # The format is detected from the content, not from the extension
+    file_path = tmp_path / "dump.sql"
+    file_path.write_bytes(_compress(data, codec))
+    assert _compression(file_path) == codec
+    with _open_binary(file_path, decompression_thread) as infile:
+        assert infile.read() == data
+    with _open_file(file_path, "utf-8", decompression_thread) as infile:
+        assert infile.readlines() == FILEPATH_UNZIPPED.read_text().splitlines(True)
+    assert _compression(FILEPATH_UNZIPPED) is None
+
+
+@pytest.mark.parametrize("module", ["gzip", "isal.igzip", "zlib_ng.gzip_ng"])
+def test__open_binary_gzip_modules(monkeypatch, module):
+    module = pytest.importorskip(module)
+    monkeypatch.setattr("mwsql.utils._gzip_module", lambda: module)
+    with _open_binary(FILEPATH_GZ) as infile:
+        assert infile.read() == FILEPATH_UNZIPPED.read_bytes()
+
+
+def test_register_codec(monkeypatch, tmp_path):
+    monkeypatch.setattr("mwsql.utils._CODECS", dict(mwsql.utils._CODECS))
+
+    def open_reversed(infile):
+        infile.read(len(b"REVERSED"))
+        return io.BytesIO(infile.read()[::-1])
+
+    register_codec("reversed", b"REVERSED", open_reversed)
+    file_path = tmp_path / "dump.sql"
+    file_path.write_bytes(b"REVERSED" + FILEPATH_UNZIPPED.read_bytes()[::-1])
+    with _open_binary(file_path) as infile:
+        assert infile.read() == FILEPATH_UNZIPPED.read_bytes()
+    with pytest.raises(ValueError):
+        register_codec("long", b"0123456789", open_reversed)
+
+
+def test__read_ahead():
+    assert list(_read_ahead(iter(range(100)), 3)) == list(range(100))
+
+    # Stops the thread and closes the items when closed early
+    closed = []
+
+    def numbers():
+        try:
+            yield from range(100)
+        finally:
+            closed.append(True)
+
+    items = _read_ahead(numbers(), 3)
+    assert next(items) == 0
+    items.close()
+    assert closed == [True]
+
+    def broken():
+        yield 1
+        raise OSError("broken")
+
+    items = _read_ahead(broken(), 3)
+    assert next(items) == 1
+    with pytest.raises(OSError):
+        next(items)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 10, 10_000])
+def test__read_chunks(chunk_size):
+    data = b"".join(b"line %d\n" % i for i in range(100)) + b"last"
+    chunks = list(_read_chunks(io.BytesIO(data), chunk_size))
+    assert b"".join(chunks) == data
+    assert all(chunk.endswith(b"\n") for chunk in chunks[:-1])
+
+
+def test__threaded_reader():
+    data = os.urandom(10_000)
+    with io.BufferedReader(_ThreadedReader(io.BytesIO(data), 100, 2)) as infile:
+        assert infile.read(150) == data[:150]
+        assert infile.read() == data[150:]
+        assert infile.read() == b""
+
+    # Stops reading ahead when closed early
+    reader = _ThreadedReader(io.BytesIO(data), 100, 2)
+    assert reader.read(10) == data[:10]
+    reader.close()
+
+    class Broken(io.BytesIO):
+        def read(self, size=-1):
+            raise OSError("broken")
+
+    with pytest.raises(OSError):
+        _ThreadedReader(Broken()).read(10)
+
+
 def test__open_file_gz():
     with _open_file(FILEPATH_GZ) as infile:
         for line in infile:
@@ -94,3 +334,182 @@ def test_head_unzipped():
     with Capturing() as output:
         head(FILEPATH_UNZIPPED, 10)
     assert output == expected_out
+
+
+def test__split_file(tmp_path):
+    file_path = tmp_path / "testfile-multi-insert.sql"
+    split_inserts(FILEPATH_UNZIPPED, file_path, 7)
+    chunks = _split_file(file_path, 256)
+    assert len(chunks) > 1
+    assert chunks[0][0] == 0
+    assert chunks[-1][1] == file_path.stat().st_size
+    for (_, end), (start, _) in zip(chunks, chunks[1:]):
+        assert end == start
+    with open(file_path, "rb") as infile:
+        content = infile.read()
+    for start, _ in chunks[1:]:
+        assert content[start:].startswith(b"INSERT INTO")
+
+
+def test__split_file_single_chunk():
+    size = FILEPATH_UNZIPPED.stat().st_size
+    assert _split_file(FILEPATH_UNZIPPED, size) == [(0, size)]
+
+
+def test__read_lines():
+    with _open_file(FILEPATH_UNZIPPED) as infile:
+        expected = infile.readlines()
+    size = FILEPATH_UNZIPPED.stat().st_size
+    assert list(_read_lines(FILEPATH_UNZIPPED, 0, size, "utf-8")) == expected
+    assert list(_read_lines(FILEPATH_UNZIPPED, 0, 1, "utf-8")) == expected[:1]
+
+
+def test__gzip_index_path():
+    assert _gzip_index_path(FILEPATH_GZ) == DATA_DIR / "testfile.sql.gz.gzidx"
+
+
+def test__open_binary_gz():
+    with _open_binary(FILEPATH_GZ) as infile, open(FILEPATH_UNZIPPED, "rb") as raw:
+        assert infile.read() == raw.read()
+
+
+def test__build_gzip_index(tmp_path):
+    pytest.importorskip("indexed_gzip")
+    file_path = tmp_path / "testfile-multi-insert.sql"
+    split_inserts(FILEPATH_UNZIPPED, file_path, 7)
+    gz_path = tmp_path / "testfile-multi-insert.sql.gz"
+    with open(file_path, "rb") as infile, gzip.open(gz_path, "wb") as outfile:
+        shutil.copyfileobj(infile, outfile)
+
+    assert not _has_gzip_index(gz_path)
+    assert _build_gzip_index(gz_path, spacing=64 * 1024) == _gzip_index_path(gz_path)
+    assert _has_gzip_index(gz_path)
+
+    assert _split_file(gz_path, 256) == [(0, file_path.stat().st_size)]
+    size = file_path.stat().st_size
+    with open(file_path) as infile:
+        expected = infile.readlines()
+    assert list(_read_lines(gz_path, 0, size, "utf-8")) == expected
+
+    # An index older than the gzip file is ignored
+    os.utime(gz_path, (0, _gzip_index_path(gz_path).stat().st_mtime + 10))
+    assert not _has_gzip_index(gz_path)
+
+
+def test__read_lines_gz_replaced(tmp_path):
+    pytest.importorskip("indexed_gzip")
+    gz_path = tmp_path / "testfile.sql.gz"
+    for seed in (1, 2):
+        rng = random.Random(seed)
+        lines = [f"{rng.getrandbits(64):x}\n".encode() for _ in range(20000)]
+        content = b"".join(lines)
+        with gzip.open(gz_path, "wb") as outfile:
+            outfile.write(content)
+        _build_gzip_index(gz_path, spacing=64 * 1024)
+        start = content.index(lines[-100])
+        expected = [line.decode() for line in lines[-100:]]
+        assert list(_read_lines(gz_path, start, len(content), "utf-8")) == expected
+
+
+def test__split_file_gz_aligned_to_index(tmp_path):
+    pytest.importorskip("indexed_gzip")
+    rng = random.Random(0)
+    file_path = tmp_path / "testfile-random.sql"
+    with open(file_path, "w") as outfile:
+        outfile.write("-- Host: localhost    Database: testwiki\n")
+        for i in range(200):
+            values = ",".join(
+                f"({i * 100 + j},'{rng.getrandbits(64):x}',0,{rng.randrange(10**6)})"
+                for j in range(100)
+            )
+            outfile.write(f"INSERT INTO `change_tag_def` VALUES {values};\n")
+    gz_path = tmp_path / "testfile-random.sql.gz"
+    with open(file_path, "rb") as infile, gzip.open(gz_path, "wb") as outfile:
+        shutil.copyfileobj(infile, outfile)
+    _build_gzip_index(gz_path, spacing=64 * 1024)
+
+    chunks = _split_file(gz_path, 64 * 1024)
+    assert len(chunks) > 1
+    assert chunks[-1][1] == file_path.stat().st_size
+    with open(file_path, "rb") as infile:
+        content = infile.read()
+    for start, _ in chunks[1:]:
+        assert content[start:].startswith(b"INSERT INTO")
+
+    lines = []
+    for start, end in chunks:
+        lines.extend(_read_lines(gz_path, start, end, "utf-8"))
+    assert "".join(lines) == content.decode("utf-8")
+
+
+def test__gzip_writer_multiple_members(tmp_path):
+    gz_path = tmp_path / "testfile.txt.gz"
+    content = b"".join(b"%d,some text\n" % i for i in range(5000))
+    with _GzipWriter(open(gz_path, "wb"), threads=2, chunk_size=1000) as outfile:
+        for i in range(0, len(content), 300):
+            outfile.write(content[i : i + 300])
+    assert gzip.decompress(gz_path.read_bytes()) == content
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".csv.gz", ".csv.zst"])
+def test__open_output_infer(tmp_path, suffix):
+    if suffix == ".csv.zst":
+        zstandard = pytest.importorskip("zstandard")
+    file_path = tmp_path / f"testfile{suffix}"
+    with _open_output(file_path, buffer_size=16) as outfile:
+        outfile.write("a,b\r\n1,ä\r\n")
+
+    content = file_path.read_bytes()
+    if suffix == ".csv.gz":
+        content = gzip.decompress(content)
+    elif suffix == ".csv.zst":
+        content = zstandard.ZstdDecompressor().stream_reader(content).read()
+    assert content == "a,b\r\n1,ä\r\n".encode("utf-8")
+
+
+def test__open_output_raise_value_error_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        with _open_output(tmp_path / "testfile.csv", compression="lz4"):
+            pass
+
+
+def test__read_header():
+    with open(FILEPATH_UNZIPPED, "rb") as infile:
+        content = infile.read()
+    expected = content[: content.index(b"INSERT INTO")]
+    assert _read_header(FILEPATH_UNZIPPED) == expected
+    assert _read_header(FILEPATH_GZ) == expected
+
+
+def test__read_header_bounded(tmp_path):
+    file_path = tmp_path / "testfile.sql"
+    file_path.write_bytes(b"-- no INSERT INTO statement\n" * 10000)
+    header = _read_header(file_path, max_size=1000)
+    assert len(header) <= 1000
+    assert header.endswith(b"statement\n")
+
+    file_path.write_bytes(b"INSERT INTO `t` VALUES (1);\n")
+    assert _read_header(file_path) == b""
+
+
+def test__write_schema_and__read_schema(tmp_path):
+    file_path = tmp_path / "testfile.sql"
+    shutil.copy(FILEPATH_UNZIPPED, file_path)
+    schema = {"table_name": "change_tag_def", "col_names": ["ctd_id"]}
+    assert _read_schema(file_path, "utf-8") is None
+    assert _write_schema(file_path, "utf-8", schema) == _schema_path(file_path)
+    assert _read_schema(file_path, "utf-8") == schema
+    assert _read_schema(file_path, "latin-1") is None
+
+    # A schema file of an older version of the dump file is ignored
+    os.utime(file_path, ns=(0, 0))
+    assert _read_schema(file_path, "utf-8") is None
+
+
+def test__mmap_file(tmp_path):
+    with _mmap_file(FILEPATH_UNZIPPED) as buffer:
+        assert buffer[:] == FILEPATH_UNZIPPED.read_bytes()
+    empty = tmp_path / "empty.sql"
+    empty.write_bytes(b"")
+    with _mmap_file(empty) as buffer:
+        assert buffer == b""